@@ -0,0 +1,390 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import requests
+
+import indicators
+from market_calendar import NYSE
+
+logger = logging.getLogger(__name__)
+
+# סוג התראה -> כיוון החצייה (above = חציית סף כלפי מעלה, below = כלפי מטה)
+RULE_TYPES = {
+    'price_above': 'above',
+    'price_below': 'below',
+    'resistance_break': 'above',
+    'support_break': 'below',
+    'rsi_above': 'above',
+    'rsi_below': 'below'
+}
+
+
+def rsi_price_threshold(close, period, target):
+    """המחיר שבו ה-RSI של היום (הבר האחרון מוחלף במחיר החי) שווה ל-target.
+    ה-RSI עולה מונוטונית עם המחיר, ולכן חציית סף RSI היא בדיוק חציית המחיר הזה"""
+    if len(close) < period + 1:
+        return None
+    deltas = np.diff(close[-period - 1:-1].astype(np.float64))  # period-1 השינויים הקבועים
+    gains = float(deltas[deltas > 0].sum())
+    losses = float(-deltas[deltas < 0].sum())
+    prev = float(close[-2])
+    if gains + losses == 0:
+        return prev
+    t = target / 100
+    if target >= 100 * gains / (gains + losses):
+        return prev + (t * (gains + losses) - gains) / (1 - t)
+    return prev - (gains / t - gains - losses)
+
+
+class AlertStore:
+    """הכללים, ההתראות שנורו וה-lease של ה-poller ב-SQLite - משותף לכל ה-workers של gunicorn,
+    כך שכלל שנרשם ב-worker אחד נמחק, נורה ומגיע ל-stream בכל worker אחר"""
+
+    # כמה התראות אחרונות נשמרות (recent + השלמה ל-streams)
+    HISTORY = 100
+
+    def __init__(self, path='alerts.db'):
+        self.path = path
+        with self._connect() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS alert_rules (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, symbol TEXT NOT NULL, type TEXT NOT NULL,
+                value REAL, threshold REAL NOT NULL, created TEXT NOT NULL)""")
+            db.execute("""CREATE TABLE IF NOT EXISTS alert_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL)""")
+            db.execute("""CREATE TABLE IF NOT EXISTS alert_prices (
+                symbol TEXT PRIMARY KEY, price REAL NOT NULL)""")
+            db.execute("""CREATE TABLE IF NOT EXISTS alert_lease (
+                name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)""")
+
+    @contextmanager
+    def _connect(self):
+        """חיבור קצר לכל פעולה (בטוח בין threads ובין תהליכים); commit בסיום וסגירה תמיד"""
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def _rule(row):
+        return {"id": row[0], "symbol": row[1], "type": row[2], "value": row[3], "threshold": row[4], "created": row[5]}
+
+    def add(self, rule):
+        with self._connect() as db:
+            cursor = db.execute("INSERT INTO alert_rules (symbol, type, value, threshold, created) VALUES (?, ?, ?, ?, ?)",
+                                (rule["symbol"], rule["type"], rule["value"], rule["threshold"], rule["created"]))
+        return {**rule, "id": cursor.lastrowid}
+
+    def remove(self, rule_id):
+        """מחיקת כלל; True רק למי שמחק אותו בפועל (גם כשהכלל נורה - כך הוא לא נורה פעמיים)"""
+        with self._connect() as db:
+            return db.execute("DELETE FROM alert_rules WHERE id = ?", (rule_id,)).rowcount > 0
+
+    def rules(self, symbol=None):
+        with self._connect() as db:
+            if symbol is None:
+                rows = db.execute("SELECT * FROM alert_rules ORDER BY id").fetchall()
+            else:
+                rows = db.execute("SELECT * FROM alert_rules WHERE symbol = ? ORDER BY id", (symbol,)).fetchall()
+        return [self._rule(r) for r in rows]
+
+    def set_threshold(self, rule_id, threshold):
+        with self._connect() as db:
+            db.execute("UPDATE alert_rules SET threshold = ? WHERE id = ?", (threshold, rule_id))
+
+    def last_prices(self):
+        with self._connect() as db:
+            return dict(db.execute("SELECT symbol, price FROM alert_prices").fetchall())
+
+    def set_last_price(self, symbol, price):
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO alert_prices VALUES (?, ?)", (symbol, price))
+
+    def add_event(self, event):
+        with self._connect() as db:
+            cursor = db.execute("INSERT INTO alert_events (payload) VALUES (?)", (json.dumps(event),))
+            db.execute("DELETE FROM alert_events WHERE id <= ?", (cursor.lastrowid - self.HISTORY,))
+        return cursor.lastrowid
+
+    def events_after(self, event_id):
+        """ההתראות שנורו אחרי event_id: [(id, event)] לפי הסדר"""
+        with self._connect() as db:
+            rows = db.execute("SELECT id, payload FROM alert_events WHERE id > ? ORDER BY id", (event_id,)).fetchall()
+        return [(i, json.loads(payload)) for i, payload in rows]
+
+    def recent(self, limit=20):
+        with self._connect() as db:
+            rows = db.execute("SELECT payload FROM alert_events ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    def last_event_id(self):
+        with self._connect() as db:
+            return db.execute("SELECT COALESCE(MAX(id), 0) FROM alert_events").fetchone()[0]
+
+    def acquire(self, name, owner, ttl):
+        """lease לתפקיד (למשל ה-poller): מחזיר True אם owner מחזיק בו - חידוש, או השתלטות כשפג"""
+        now = time.time()
+        with self._connect() as db:
+            db.execute("""INSERT INTO alert_lease VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires
+                WHERE alert_lease.owner = excluded.owner OR alert_lease.expires < ?""", (name, owner, now + ttl, now))
+            return db.execute("SELECT owner FROM alert_lease WHERE name = ?", (name,)).fetchone()[0] == owner
+
+
+class AlertEngine:
+    """התראות מחיר/אינדיקטור בצד השרת. כל כלל מתורגם לסף מחיר, והספים נשמרים ברשימות ממוינות
+    לכל מניה - כל ציטוט חדש בודק בחיפוש בינארי רק את הכללים שהמחיר חצה מאז הציטוט הקודם.
+
+    הכללים וההתראות ב-AlertStore המשותף. רק worker אחד (מחזיק ה-lease) מושך ציטוטים ובודק
+    כללים - האינדקס בזיכרון קיים רק אצלו ומסונכרן מה-store בכל poll; ה-streams בכל worker
+    קוראים את ההתראות שנורו מה-store"""
+
+    def __init__(self, fetcher, candles, store, scheduler=None, poll_every=15, webhook=None, levels_every=300):
+        self.fetcher = fetcher
+        self.candles = candles
+        self.store = store
+        self.webhook = webhook or os.environ.get('ALERT_WEBHOOK_URL')
+        self.owner = f"{os.getpid()}:{id(self)}"
+        # ה-lease מתחדש בכל poll; worker שנפל משחרר אותו אחרי כמה מחזורים שהוחמצו
+        self.lease_ttl = max(4 * poll_every, 60)
+        self.leader = False
+        self._rules = {}        # rule id -> rule (רק אצל ה-poller)
+        self._index = {}        # symbol -> {'above': ([thresholds], [ids]), 'below': (...)}
+        self._last_price = {}   # symbol -> last quote seen
+        self._sources = {}      # symbol -> CompactCandles the dynamic thresholds were computed from
+        self._lock = threading.Lock()
+        self._delivery = ThreadPoolExecutor(max_workers=2)
+        if scheduler is not None:
+            # מחוץ לשעות המסחר המחיר הרגיל לא זז - ה-poll נדחה עד הפתיחה הבאה (לכל היותר שעה)
+            scheduler.add_job("alerts", self.poll, every=lambda: NYSE.refresh_interval(poll_every))
+            # הספים הדינמיים מתעדכנים ברקע - משיכת נרות (5y) לא קורית בתוך בקשת /api/price
+            scheduler.add_job("alert_levels", self.refresh_levels, every=lambda: NYSE.refresh_interval(levels_every))
+
+    def add_rule(self, symbol, type, value=None):
+        symbol = symbol.upper()
+        if type not in RULE_TYPES:
+            raise ValueError(f"Unknown alert type '{type}'. Use one of: {', '.join(RULE_TYPES)}")
+        if type.startswith('price') or type.startswith('rsi'):
+            if value is None:
+                raise ValueError(f"'{type}' needs a value")
+            value = float(value)
+            if type.startswith('rsi') and not 0 < value < 100:
+                raise ValueError("RSI threshold must be between 0 and 100")
+
+        rule = {
+            "symbol": symbol,
+            "type": type,
+            "value": value,
+            "threshold": None,
+            "created": datetime.now().isoformat()
+        }
+        candles = None if type.startswith('price') else self.candles.get(symbol)
+        rule["threshold"] = self._threshold(rule, candles)
+        if rule["threshold"] is None:
+            raise ValueError(f"Not enough price history to create '{type}' alert for {symbol}")
+        rule = self.store.add(rule)
+        if self.leader:
+            with self._lock:
+                self._add_local(rule, candles)
+        return dict(rule)
+
+    def remove_rule(self, rule_id):
+        removed = self.store.remove(rule_id)
+        with self._lock:
+            rule = self._rules.pop(rule_id, None)
+            if rule:
+                self._discard(rule)
+        return removed
+
+    def rules(self, symbol=None):
+        return self.store.rules(symbol.upper() if symbol else None)
+
+    def _threshold(self, rule, candles):
+        """סף המחיר של הכלל; לכללים דינמיים (תמיכה/התנגדות, RSI) הוא נגזר מהנרות האחרונים"""
+        type = rule["type"]
+        if type.startswith('price'):
+            return rule["value"]
+        if candles is None or len(candles) < 2:
+            return None
+        if type == 'resistance_break':
+            level = float(candles.column('resistance_level')[-1])
+        elif type == 'support_break':
+            level = float(candles.column('support_level')[-1])
+        else:
+            period = indicators.parameters(candles.params)['rsi_period']
+            level = rsi_price_threshold(candles.close, period, rule["value"])
+        return level if level is not None and np.isfinite(level) else None
+
+    def _add_local(self, rule, candles=None):
+        if candles is not None:
+            self._sources[rule["symbol"]] = candles
+        self._rules[rule["id"]] = rule
+        self._insert(rule)
+
+    def _insert(self, rule):
+        side = self._index.setdefault(rule["symbol"], {'above': ([], []), 'below': ([], [])})[RULE_TYPES[rule["type"]]]
+        thresholds, ids = side
+        pos = bisect_right(thresholds, rule["threshold"])
+        thresholds.insert(pos, rule["threshold"])
+        ids.insert(pos, rule["id"])
+
+    def _discard(self, rule):
+        thresholds, ids = self._index[rule["symbol"]][RULE_TYPES[rule["type"]]]
+        pos = bisect_left(thresholds, rule["threshold"])
+        while ids[pos] != rule["id"]:
+            pos += 1
+        del thresholds[pos], ids[pos]
+
+    def _sync(self):
+        """האינדקס בזיכרון לפי ה-store: כללים שנרשמו ב-workers אחרים נכנסים, כללים שנמחקו יוצאים"""
+        stored = {r["id"]: r for r in self.store.rules()}
+        with self._lock:
+            for rule_id in set(self._rules) - set(stored):
+                self._discard(self._rules.pop(rule_id))
+            for rule_id in set(stored) - set(self._rules):
+                self._add_local(stored[rule_id])
+
+    def _refresh_levels(self, symbol):
+        """חישוב מחדש של ספים דינמיים כשהנרות של המניה התעדכנו במטמון"""
+        dynamic = [r for r in list(self._rules.values()) if r["symbol"] == symbol and not r["type"].startswith('price')]
+        if not dynamic:
+            return
+        candles = self.candles.get(symbol)
+        if candles is None or candles is self._sources.get(symbol):
+            return
+        changed = []
+        with self._lock:
+            self._sources[symbol] = candles
+            for rule in dynamic:
+                if rule["id"] not in self._rules:
+                    continue
+                threshold = self._threshold(rule, candles)
+                if threshold is not None and threshold != rule["threshold"]:
+                    self._discard(rule)
+                    rule["threshold"] = threshold
+                    self._insert(rule)
+                    changed.append(rule)
+        for rule in changed:
+            self.store.set_threshold(rule["id"], rule["threshold"])
+
+    def refresh_levels(self):
+        """עבודת הרקע (רק ב-poller): עדכון הספים הדינמיים של כל המניות שיש להן כללים כאלה"""
+        if not self.leader:
+            return
+        symbols = sorted({r["symbol"] for r in list(self._rules.values()) if not r["type"].startswith('price')})
+        for symbol in symbols:
+            self._refresh_levels(symbol)
+
+    def on_quote(self, symbol, price):
+        """עיבוד ציטוט: הכללים שהסף שלהם בין המחיר הקודם לנוכחי נורים (ונמחקים).
+        ב-worker שאינו ה-poller האינדקס ריק - הציטוט לא עושה כלום"""
+        symbol = symbol.upper()
+        if not price:
+            return []
+        price = float(price)
+        if symbol not in self._index:
+            return []
+
+        with self._lock:
+            last = self._last_price.get(symbol)
+            self._last_price[symbol] = price
+            if last is None:
+                # הציטוט הראשון הוא נקודת הייחוס - אין חצייה להשוות אליה
+                rules = []
+            else:
+                above_t, above_ids = self._index[symbol]['above']
+                below_t, below_ids = self._index[symbol]['below']
+                fired = (above_ids[bisect_right(above_t, last):bisect_right(above_t, price)] +
+                         below_ids[bisect_left(below_t, price):bisect_left(below_t, last)])
+                rules = [self._rules.pop(i) for i in fired]
+                for rule in rules:
+                    self._discard(rule)
+        # המחיר האחרון נשמר גם ב-store - poller חדש ממשיך מאותה נקודת ייחוס
+        self.store.set_last_price(symbol, price)
+
+        # כלל שנמחק בינתיים ב-worker אחר לא נורה (remove מחזיר False)
+        events = [self._event(rule, price) for rule in rules if self.store.remove(rule["id"])]
+        for event in events:
+            self._deliver(event)
+        return events
+
+    def _event(self, rule, price):
+        event = {
+            "id": rule["id"],
+            "symbol": rule["symbol"],
+            "type": rule["type"],
+            "value": rule["value"],
+            "threshold": rule["threshold"],
+            "price": price,
+            "triggered": datetime.now().isoformat()
+        }
+        direction = "above" if RULE_TYPES[rule["type"]] == 'above' else "below"
+        if rule["type"].startswith('rsi'):
+            event["message"] = f"{rule['symbol']} RSI crossed {direction} {rule['value']:g} at ${price:.2f}"
+        elif rule["type"].startswith('price'):
+            event["message"] = f"{rule['symbol']} crossed {direction} ${rule['value']:.2f} (now ${price:.2f})"
+        else:
+            level = "resistance" if rule["type"] == 'resistance_break' else "support"
+            event["message"] = f"{rule['symbol']} broke {level} at ${rule['threshold']:.2f} (now ${price:.2f})"
+        return event
+
+    def _deliver(self, event):
+        logger.info("🔔 Alert: %s", event['message'])
+        self.store.add_event(event)
+        # רק ה-webhook של המפעיל (ALERT_WEBHOOK_URL) - לקוחות לא קובעים לאן השרת שולח בקשות
+        if self.webhook:
+            self._delivery.submit(self._post, self.webhook, event)
+
+    @staticmethod
+    def _post(url, event):
+        try:
+            requests.post(url, json=event, timeout=5)
+        except Exception as e:
+            logger.warning("⚠️ Alert webhook failed (%s): %s", url, e)
+
+    def poll(self):
+        """עבודת הרקע: רק ה-worker שמחזיק ב-lease מסנכרן את הכללים ומושך ציטוט מרוכז אחד לכולם"""
+        leader = self.store.acquire('poller', self.owner, self.lease_ttl)
+        if leader and not self.leader:
+            logger.info("🔔 Alerts poller: this worker (%s)", self.owner)
+            self._last_price = self.store.last_prices()
+        elif not leader and self.leader:
+            with self._lock:
+                self._rules, self._index, self._sources = {}, {}, {}
+        self.leader = leader
+        if not leader:
+            return
+        self._sync()
+        symbols = sorted({r["symbol"] for r in list(self._rules.values())})
+        if not symbols:
+            return
+        for q in self.fetcher.get_batch_quotes(symbols):
+            self.on_quote(q.get('symbol', ''), q.get('regularMarketPrice', q.get('price')))
+
+    def recent(self, limit=20):
+        return self.store.recent(limit)
+
+    def stream(self, heartbeat=15, every=1):
+        """גנרטור Server-Sent Events: ההתראות שנורו (בכל worker) נקראות מה-store כל every שניות"""
+        last = self.store.last_event_id()
+        yield ": connected\n\n"
+        idle = 0
+        while True:
+            time.sleep(every)
+            events = self.store.events_after(last)
+            for last, event in events:
+                yield f"event: alert\ndata: {json.dumps(event)}\n\n"
+            idle = 0 if events else idle + every
+            if idle >= heartbeat:
+                idle = 0
+                yield ": keep-alive\n\n"
@@ -0,0 +1,227 @@
+from collections import namedtuple
+from functools import lru_cache
+
+# המצב הבדיד שממנו נגזר כל הטקסט - מספר הצירופים קטן, ולכן אפשר לשמור כל תוצאה
+AnalysisState = namedtuple('AnalysisState', [
+    'trend', 'momentum', 'risk_level', 'fundamental', 'support', 'resistance'
+])
+
+# סף (באחוזים) שמתחתיו המחיר נחשב "קרוב" לרצפה/לתקרה
+NEAR_LEVEL_PCT = 3
+
+TEMPLATES = {
+    'he': {
+        'title': "### 🎯 ניתוח מומחה ותחזית עבור {symbol}",
+        'behavior': "**איך המניה מתנהגת?** ",
+        'trend_desc': {
+            "Strong Uptrend": "נמצאת בשיא של עוצמה, עם נטייה ברורה למעלה. הקונים שולטים בשוק.",
+            "Uptrend": "בכיוון חיובי, המחיר מטפס בהדרגה אך בעקביות.",
+            "Downtrend": "מראה סימני חולשה, הכיוון הכללי הוא כלפי מטה.",
+            "Strong Downtrend": "נמצאת בנפילה חופשית יחסית, המוכרים לוחצים על המחיר.",
+            "Neutral": "נעה הצידה ללא כיוון ברור, מחכה לחדשות או אירוע משמעותי."
+        },
+        'trend_desc_default': "במצב יציב יחסית.",
+        'chart_title': "#### 📊 מה הגרף מספר לנו?",
+        'support': "**רצפת המחיר (תמיכה):** הרמה שממנה המחיר נוטה 'לקפוץ' חזרה למעלה נמצאת ב-{sup_level:,.2f}$. המרחק מהרצפה הוא כ-{dist_sup:.1f}%. ",
+        'support_near': "אנחנו קרובים מאוד לרצפה, מה שמהווה לעיתים נקודת כניסה בטוחה יותר.",
+        'support_far': "המחיר כרגע מבוסס מעל הרצפה, מה שמעיד על ביטחון מסוים.",
+        'resistance': "**תקרת המחיר (התנגדות):** המחיר מתקשה לפרוץ את רמת ה-{res_level:,.2f}$. המרחק מהתקרה הוא כ-{dist_res:.1f}%. ",
+        'resistance_near': "המניה 'נוגחת' בתקרה כרגע. פריצה של הרמה הזו עשויה להוביל לזינוק חזק קדימה.",
+        'resistance_far': "יש למניה עוד 'מקום לעלות' עד שתפגוש שוב את התקרה הקרובה.",
+        'forecast_title': "#### 🔮 תחזית ודעת אנליסטים:",
+        'forecast_bullish': "התחזית לטווח הקרוב היא **חיובית מאוד**. השילוב של מגמה עולה ללא מצב של 'קניית יתר' מעיד על כך שיש עוד דלק לעליות. אם המחיר יפרוץ את התקרה (התנגדות), נראה כנראה שיאים חדשים.",
+        'forecast_rebound': "אנחנו נמצאים במצב מעניין - המניה נופלת, אבל היא כבר 'נמכרה מדי' (Oversold). זהו מצב שלרוב מוביל לקפיצה טכנית כלפי מעלה בימים הקרובים. זהירות נדרשת, אך ייתכן שיש כאן הזדמנות לסיבוב קצר.",
+        'forecast_overbought': "המניה כבר עלתה הרבה ומהר מאוד, והיא נמצאת כרגע ב'קניית יתר'. בדרך כלל, במצב כזה מגיע תיקון קל למטה או תקופה של יציבות לפני המשך עליות. מומלץ לא לרדוף אחרי המחיר בשיא.",
+        'forecast_neutral': "כרגע השוק מחפש כיוון. המלצת המערכת היא להמתין לפריצה של תקרת המחיר או הגעה לרצפה כדי לקבל החלטה מושכלת יותר.",
+        'pros_title': "#### ✅ למה כן? (Pros):",
+        'pro_trend': "מגמה חיובית ומומנטום חזק.",
+        'pro_fundamental': "נתונים כלכליים טובים - החברה נחשבת לרווחית ויציבה.",
+        'pro_oversold': "המניה זולה מדי טכנית ('נמכרה מדי'), פוטנציאל לקפיצה.",
+        'pros_empty': "* אין נקודות חוזק בולטות כרגע.",
+        'cons_title': "#### ⚠️ למה לא? (Cons):",
+        'con_trend': "מגמת ירידה חזקה - הכסף יוצא מהמניה.",
+        'con_overbought': "קניית יתר - המחיר גבוה מדי לנקודת זמן זו, סיכון לתיקון מטה.",
+        'con_risk': "תנודתיות גבוהה - המניה עלולה 'להשתולל' ולהפיל סטופ-לוסים.",
+        'cons_empty': "* אין נורות אזהרה בולטות כרגע.",
+        'summary': "**לסיכום:** המניה נמצאת במצב של **{trend_label}**. המלצתנו המקצועית: **{strategy_label}**.",
+        'trend_label': {
+            "Strong Uptrend": "עוצמה שורית", "Uptrend": "מגמה חיובית",
+            "Downtrend": "מגמה שלילית", "Strong Downtrend": "לחץ מכירות כבד",
+            "Neutral": "חיפוש כיוון"
+        },
+        'trend_label_default': "נייטרלי",
+        'strategy_long_term': "קנייה לטווח ארוך",
+        'strategy_watch': "מעקב הדוק",
+        # אסטרטגיית ההשקעה (RiskAssessor.analyze_investment_strategy)
+        'strategy_labels': {
+            "dca": "DCA (מנות קטנות)",
+            "lump_sum": "Lump Sum (סכום חד פעמי)",
+            "aggressive_dca": "Aggressive DCA"
+        },
+        'strategy_text': {
+            "dca": "בשל התנודתיות הגבוהה כרגע (גבוהה ב-{excess:.0f}% מהרגיל), מומלץ להימנע מכניסה בסכום חד פעמי. הצורה החכמה ביותר היא כניסה הדרגתית (DCA) לאורך 3-6 חודשים כדי למצע את מחיר הקנייה.",
+            "lump_sum": "המניה מציגה יציבות גבוהה ומגמה שורית חזקה מעל הממוצע ל-200 יום. בהתחשב ברמת הסיכון הנמוכה, ניתן לשקול כניסה משמעותית יותר (Lump Sum) במחיר הנוכחי.",
+            "aggressive_dca": "המניה נמצאת בשלב של חיפוש כיוון או תיקון מסוים. מומלץ לקנות את ה-Dips (ירידות חדות) במנות כפולות, אך לשמור על זהירות עד להיערכות מחדש של המגמה הטכנית."
+        },
+        'strategy_no_data': "אין מספיק נתונים לחישוב אסטרטגיה.",
+    },
+    'en': {
+        'title': "### 🎯 Expert analysis and outlook for {symbol}",
+        'behavior': "**How is the stock behaving?** ",
+        'trend_desc': {
+            "Strong Uptrend": "It is at peak strength with a clear upward bias. Buyers are in control.",
+            "Uptrend": "It is heading higher, climbing gradually but consistently.",
+            "Downtrend": "It is showing signs of weakness; the overall direction is down.",
+            "Strong Downtrend": "It is in a relatively steep decline, with sellers pressing the price.",
+            "Neutral": "It is moving sideways with no clear direction, waiting for news or a significant event."
+        },
+        'trend_desc_default': "It is relatively stable.",
+        'chart_title': "#### 📊 What is the chart telling us?",
+        'support': "**Price floor (support):** The level from which the price tends to bounce back up is at ${sup_level:,.2f}. The distance from the floor is about {dist_sup:.1f}%. ",
+        'support_near': "We are very close to the floor, which is often a safer entry point.",
+        'support_far': "The price is currently established above the floor, which signals some confidence.",
+        'resistance': "**Price ceiling (resistance):** The price is struggling to break through ${res_level:,.2f}. The distance to the ceiling is about {dist_res:.1f}%. ",
+        'resistance_near': "The stock is testing the ceiling right now. A breakout above this level could lead to a strong move higher.",
+        'resistance_far': "The stock still has room to rise before it meets the nearest ceiling again.",
+        'forecast_title': "#### 🔮 Outlook and analyst view:",
+        'forecast_bullish': "The short-term outlook is **very positive**. An uptrend without an overbought reading suggests there is still fuel for gains. If the price breaks the ceiling (resistance), we will likely see new highs.",
+        'forecast_rebound': "This is an interesting setup - the stock is falling, but it is already oversold. This often leads to a technical bounce in the coming days. Caution is required, but there may be an opportunity for a short trade.",
+        'forecast_overbought': "The stock has already risen a lot very quickly and is currently overbought. Usually this is followed by a mild pullback or a period of consolidation before further gains. It is better not to chase the price at the top.",
+        'forecast_neutral': "The market is currently looking for direction. The system recommends waiting for a breakout above the ceiling or a test of the floor before making a more informed decision.",
+        'pros_title': "#### ✅ Why yes? (Pros):",
+        'pro_trend': "Positive trend and strong momentum.",
+        'pro_fundamental': "Good financials - the company is considered profitable and stable.",
+        'pro_oversold': "The stock is technically too cheap (oversold), with bounce potential.",
+        'pros_empty': "* No notable strengths at the moment.",
+        'cons_title': "#### ⚠️ Why not? (Cons):",
+        'con_trend': "Strong downtrend - money is flowing out of the stock.",
+        'con_overbought': "Overbought - the price is too high for now, with a risk of a pullback.",
+        'con_risk': "High volatility - the stock may swing wildly and trigger stop-losses.",
+        'cons_empty': "* No notable warning signs at the moment.",
+        'summary': "**Bottom line:** The stock is in a state of **{trend_label}**. Our professional recommendation: **{strategy_label}**.",
+        'trend_label': {
+            "Strong Uptrend": "bullish strength", "Uptrend": "positive trend",
+            "Downtrend": "negative trend", "Strong Downtrend": "heavy selling pressure",
+            "Neutral": "searching for direction"
+        },
+        'trend_label_default': "neutral",
+        'strategy_long_term': "long-term buy",
+        'strategy_watch': "close monitoring",
+        'strategy_labels': {
+            "dca": "DCA (small installments)",
+            "lump_sum": "Lump Sum (one-time investment)",
+            "aggressive_dca": "Aggressive DCA"
+        },
+        'strategy_text': {
+            "dca": "Because volatility is high right now ({excess:.0f}% above normal), it is better to avoid investing a lump sum. The smartest approach is a gradual entry (DCA) over 3-6 months to average out the purchase price.",
+            "lump_sum": "The stock shows high stability and a strong bullish trend above its 200-day average. Given the low risk level, a more substantial entry (Lump Sum) at the current price can be considered.",
+            "aggressive_dca": "The stock is searching for direction or going through a correction. Buying the dips (sharp drops) in double installments is recommended, while staying cautious until the technical trend re-establishes itself."
+        },
+        'strategy_no_data': "Not enough data to calculate a strategy.",
+    }
+}
+
+DEFAULT_LANGUAGE = 'he'
+
+# הערה: השלד עובר str.format בכל רינדור, ולכן אסור להשתמש בסוגריים מסולסלים בטקסט עצמו
+
+
+def _level_bucket(distance_pct):
+    """מיפוי מרחק באחוזים לרמה בדידה: None (אין רמה), near או far"""
+    if distance_pct is None:
+        return None
+    return 'near' if distance_pct < NEAR_LEVEL_PCT else 'far'
+
+
+def _fundamental_bucket(score):
+    # הטקסט מבחין רק בין ציון שלילי/אפס, חיובי (>0) וחזק (>1)
+    if score > 1: return 2
+    if score > 0: return 1
+    return 0
+
+
+class AnalysisTemplates:
+    """מנוע תבניות לטקסט הניתוח: שלד הטקסט נבנה פעם אחת לכל (שפה, מצב) ונשמר,
+    ובכל בקשה רק מוצבים בו המספרים (סימול, רמות ומרחקים)"""
+
+    def __init__(self, templates=TEMPLATES, cache_size=4096):
+        self.templates = templates
+        self.skeleton = lru_cache(maxsize=cache_size)(self._compile)
+
+    @staticmethod
+    def make_state(trend, momentum, risk_level, fundamental_score, dist_sup, dist_res):
+        return AnalysisState(
+            trend, momentum, risk_level, _fundamental_bucket(fundamental_score),
+            _level_bucket(dist_sup), _level_bucket(dist_res)
+        )
+
+    def _compile(self, lang, state):
+        t = self.templates[lang]
+        trend, momentum = state.trend, state.momentum
+        bullish = trend in ["Strong Uptrend", "Uptrend"]
+        bearish = trend in ["Strong Downtrend", "Downtrend"]
+
+        support = ""
+        if state.support:
+            support = t['support'] + t['support_near' if state.support == 'near' else 'support_far']
+        resistance = ""
+        if state.resistance:
+            resistance = t['resistance'] + t['resistance_near' if state.resistance == 'near' else 'resistance_far']
+
+        if bullish and momentum != "Overbought":
+            forecast = t['forecast_bullish']
+        elif bearish and momentum == "Oversold":
+            forecast = t['forecast_rebound']
+        elif momentum == "Overbought":
+            forecast = t['forecast_overbought']
+        else:
+            forecast = t['forecast_neutral']
+
+        pros = []
+        cons = []
+        if bullish: pros.append(t['pro_trend'])
+        if state.fundamental > 0: pros.append(t['pro_fundamental'])
+        if momentum == "Oversold": pros.append(t['pro_oversold'])
+
+        if bearish: cons.append(t['con_trend'])
+        if momentum == "Overbought": cons.append(t['con_overbought'])
+        if state.risk_level == "High": cons.append(t['con_risk'])
+
+        # החלקים הקבועים (ללא placeholders) מוצבים כבר כאן; נשארים רק השדות המספריים
+        summary = t['summary'].format(
+            trend_label=t['trend_label'].get(trend, t['trend_label_default']),
+            strategy_label=t['strategy_long_term'] if state.fundamental > 1 else t['strategy_watch']
+        )
+
+        return "\n".join([
+            t['title'],
+            t['behavior'] + t['trend_desc'].get(trend, t['trend_desc_default']),
+            "",
+            t['chart_title'],
+            support,
+            "",
+            resistance,
+            "",
+            t['forecast_title'],
+            forecast,
+            "",
+            t['pros_title'],
+            "\n".join([f"* {p}" for p in pros]) if pros else t['pros_empty'],
+            "",
+            t['cons_title'],
+            "\n".join([f"* {c}" for c in cons]) if cons else t['cons_empty'],
+            "",
+            summary
+        ])
+
+    def render(self, state, lang=DEFAULT_LANGUAGE, **values):
+        if lang not in self.templates:
+            lang = DEFAULT_LANGUAGE
+        return self.skeleton(lang, state).format(**values)
+
+    def strategy(self, key, lang=DEFAULT_LANGUAGE, **values):
+        """(תווית, הסבר) של אסטרטגיית ההשקעה בשפה המבוקשת; key=None - אין מספיק נתונים"""
+        t = self.templates.get(lang, self.templates[DEFAULT_LANGUAGE])
+        if key is None:
+            return "N/A", t['strategy_no_data']
+        return t['strategy_labels'][key], t['strategy_text'][key].format(**values)
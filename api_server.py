@@ -1,17 +1,132 @@
 import logging
 import json
 import os
-import pandas as pd
+import threading
 from datetime import datetime
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, jsonify, request, Response, send_from_directory, g
 from flask_cors import CORS
-from stock_analyzer import StockAnalysisSystem
+from stock_analyzer import StockAnalysisSystem, SUPPORTED_INTERVALS, DAILY_INTERVALS, is_intraday
+from portfolio import PortfolioAnalyzer
+from screener import Screener, ScreenQueryError
+from similarity import SimilarityService
+from alerts import AlertEngine, AlertStore
+from watchlist import WatchlistStore, WatchlistService
+from singleflight import SingleFlight
+from market_overview import MarketOverview
+from analysis_text import TEMPLATES, DEFAULT_LANGUAGE
+import chart_payload
+import metrics
+import logging_config
+
+logging_config.setup_logging()
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__, static_folder='.', static_url_path='')
 CORS(app)  # אפשר גישה מ-frontend
 
-# יצירת מופע של מערכת הניתוח
-analyzer = StockAnalysisSystem()
+
+class LazyService:
+    """שירות שנבנה בגישה הראשונה ולא בזמן ה-import: import של המודול נשאר זול (ובטוח ל-preload
+    של gunicorn), ו-sessions / מטמונים / SQLite נוצרים רק בתהליך ה-worker שמשתמש בהם"""
+
+    def __init__(self, factory):
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_instance', None)
+        object.__setattr__(self, '_lock', threading.Lock())
+
+    def get(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    object.__setattr__(self, '_instance', self._factory())
+        return self._instance
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.get(), name, value)
+
+
+# מערכת הניתוח
+analyzer = LazyService(StockAnalysisSystem)
+# ניתוח תיק - משתמש באותו מטמון היסטוריה של המנתח
+portfolio = LazyService(lambda: PortfolioAnalyzer(analyzer.candles))
+# סינון מעל תוצאות הסריקה האחרונה
+screener = LazyService(lambda: Screener(analyzer.get()))
+# מניות דומות לפי קורלציית תשואות (מטריצה לכל חלון, מתעדכנת ברקע)
+similarity = LazyService(lambda: SimilarityService(analyzer.candles, scheduler=analyzer.scheduler))
+# התראות מחיר/אינדיקטור (SQLite משותף לכל ה-workers) - נבדקות על כל ציטוט (כאן וב-poll ברקע) ב-worker אחד
+alerts = LazyService(lambda: AlertEngine(analyzer.fetcher, analyzer.candles,
+                                         AlertStore(os.environ.get('ALERTS_DB', 'alerts.db')),
+                                         scheduler=analyzer.scheduler))
+# רשימות מעקב (SQLite מקומי) עם מטמון ציטוטים משותף
+watchlists = LazyService(lambda: WatchlistService(analyzer.fetcher, analyzer.candles,
+                                                  WatchlistStore(os.environ.get('WATCHLIST_DB', 'watchlists.db'))))
+# סקירת שוק (מדדים + סקטורים) - נבנית ברקע מהסריקה האחרונה
+market = LazyService(lambda: MarketOverview(analyzer.get(), analyzer.scheduler))
+# איחוד בקשות /api/analyze זהות שרצות במקביל (ו-5 שניות אחרי הסיום)
+analyses = SingleFlight('analyze')
+SERVICES = (analyzer, portfolio, screener, similarity, alerts, watchlists, market)
+
+
+def init_services():
+    """בניית כל השירותים מראש (post_fork של gunicorn) - הבקשה הראשונה לא משלמת על האתחול"""
+    for service in SERVICES:
+        service.get()
+
+
+# ?profile=1 מחזיר פרופיל cProfile של הבקשה - רק במצב debug או כשהופעל במפורש
+PROFILING_ENABLED = os.environ.get('ENABLE_PROFILING') == '1'
+
+
+@app.before_request
+def start_request_timing():
+    # מזהה הבקשה מה-proxy (X-Request-ID) או חדש - מופיע בכל שורת לוג של הבקשה ומוחזר בתשובה
+    g.request_id = logging_config.new_request_id(request.headers.get('X-Request-ID'))
+    g.request_id_token = logging_config.request_id.set(g.request_id)
+    g.timing = metrics.start_request()
+    if request.args.get('profile') == '1' and (app.debug or PROFILING_ENABLED):
+        g.profiler = metrics.RequestProfiler()
+
+
+@app.after_request
+def finish_request_timing(response):
+    """זמן הבקשה להיסטוגרמה, שלבי הניתוח ל-Server-Timing, והפרופיל אם התבקש"""
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    if 'timing' not in g:
+        return response
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    spans = metrics.finish_request(g.pop('timing'), endpoint, request.method, response.status_code)
+    if spans:
+        response.headers['Server-Timing'] = metrics.server_timing(spans)
+
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        report = profiler.report()
+        data = response.get_json(silent=True) if response.is_json and not response.is_streamed else None
+        if isinstance(data, dict):
+            data['_profile'] = {
+                "spans": [{"stage": stage, "ms": seconds * 1000} for stage, seconds in spans],
+                "stats": report
+            }
+            response.set_data(json.dumps(data))
+    return response
+
+
+@app.teardown_request
+def reset_request_id(exc=None):
+    token = g.pop('request_id_token', None)
+    if token is not None:
+        logging_config.request_id.reset(token)
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """מטריקות בפורמט Prometheus: זמני שלבים ובקשות (היסטוגרמות) ויחסי פגיעה במטמונים"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 
 def get_market_stocks(limit=50):
     """קבלת רשימת מניות מהשוק האמריקאי"""
@@ -38,22 +153,66 @@ def analyze_stock(symbol):
         symbol = symbol.upper()
         # אפשרות לבחירת טווח גרף (1d, 5d, 1mo, 6mo, 1y, 5y)
         chart_range = request.args.get('range', '3mo')
+        # אינטרוול נרות (1d כברירת מחדל, או מצב תוך-יומי: 1m/5m/15m)
+        interval = request.args.get('interval', '1d')
+        if interval not in SUPPORTED_INTERVALS:
+            return jsonify({"error": f"Unsupported interval: {interval}"}), 400
+        # שפת טקסט הניתוח (he כברירת מחדל, en)
+        lang = request.args.get('lang', DEFAULT_LANGUAGE)
+        if lang not in TEMPLATES:
+            return jsonify({"error": f"Unsupported lang: {lang}"}), 400
+        # פורמט הגרף (rows כברירת מחדל, או columnar - מערכים מקבילים) ו-max_points לדילול (רוחב הגרף)
+        try:
+            chart_opts = chart_payload.options(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        max_points = chart_opts["max_points"]
         
-        result = analyzer.analyze_stock(symbol)
-        
-        # אם ביקשו טווח ספציפי, נעדכן את הנתונים (מערכת ה-StockDataFetcher כבר תומכת בפרמטר range)
-        if chart_range != '5y': # 5y הוא הדיפולט של המנתח הפנימי
-            df = analyzer.fetcher.get_stock_data(symbol, range=chart_range)
-            if df is not None and not df.empty:
-                df = analyzer.technical.calculate_indicators(df)
-                result['chart_data'] = analyzer._prepare_chart_data(df)
+        def analyze():
+            result = analyzer.analyze_stock(symbol, interval=interval, lang=lang, max_points=max_points)
+            # אם ביקשו טווח ספציפי - חיתוך של הסדרה השמורה (5y הוא הדיפולט של המנתח הפנימי)
+            # במצב תוך-יומי הגרף כבר מגיע מהחוצץ המעגלי
+            if chart_range != '5y' and not is_intraday(interval) and "error" not in result:
+                chart = analyzer.chart_data(symbol, chart_range, interval, max_points)
+                if chart is not None:
+                    result['chart_data'] = chart
+            return result
+
+        # בקשות זהות במקביל (מניה חמה) חולקות ניתוח אחד ואת התוצאה שלו
+        result = analyses.do((symbol, chart_range, interval, lang, max_points), analyze)
         
         if "error" in result:
             return jsonify({"error": result["error"]}), 404
+        if chart_opts["format"] != 'rows':
+            # התוצאה משותפת לבקשות אחרות - dict חדש במקום לשנות אותה
+            result = {**result, "chart_data": chart_payload.render(result.get("chart_data"), interval, chart_opts)}
         
         return jsonify(result)
     except Exception as e:
-        print(f"Error in analyze_stock: {e}") 
+        logger.exception("Error in analyze_stock: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/chart/<symbol>')
+def get_chart(symbol):
+    """נתוני גרף בלבד לטווח/אינטרוול (החלפת טווח בגרף בלי להריץ את כל הניתוח)"""
+    try:
+        symbol = symbol.upper()
+        chart_range = request.args.get('range', '3mo')
+        interval = request.args.get('interval', '1d')
+        # הגרף לפי טווח נחתך מהסדרה היומית השמורה - תוך-יומי מגיע רק דרך /api/analyze
+        if interval not in DAILY_INTERVALS:
+            return jsonify({"error": f"Unsupported interval: {interval}"}), 400
+        try:
+            chart_opts = chart_payload.options(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        chart = analyzer.chart_data(symbol, chart_range, interval, chart_opts["max_points"])
+        if chart is None:
+            return jsonify({"error": f"Could not fetch data for {symbol}"}), 404
+        return jsonify(analyzer._clean_data({"symbol": symbol, "range": chart_range, "interval": interval,
+                                             "chart_data": chart_payload.render(chart, interval, chart_opts)}))
+    except Exception as e:
+        logger.exception("Error in chart for %s: %s", symbol, e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/price/<symbol>')
@@ -71,6 +230,7 @@ def get_live_price(symbol):
         
         change = current_price - prev_close
         change_percent = (change / prev_close) * 100 if prev_close else 0
+        alerts.on_quote(symbol, current_price)
         
         return jsonify({
             "symbol": symbol,
@@ -80,7 +240,19 @@ def get_live_price(symbol):
             "timestamp": datetime.now().isoformat()
         })
     except Exception as e:
-        print(f"Error fetching live price for {symbol}: {e}")
+        logger.warning("Error fetching live price for %s: %s", symbol, e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/news/<symbol>')
+def get_news(symbol):
+    """חדשות למניה מתוך האינדקס המקומי (עם עימוד)"""
+    try:
+        symbol = symbol.upper()
+        page = max(1, request.args.get('page', 1, type=int))
+        per_page = min(50, max(1, request.args.get('per_page', 10, type=int)))
+        return jsonify(analyzer.news.page(symbol, page, per_page))
+    except Exception as e:
+        logger.warning("Error fetching news for %s: %s", symbol, e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/compare', methods=['POST'])
@@ -116,6 +288,183 @@ def compare_stocks():
         return jsonify({"error": str(e)}), 500
 
 
+# חלון התשואות (בימי מסחר) של /api/portfolio ו-/api/similar
+MIN_WINDOW, MAX_WINDOW = 20, 1000
+
+
+def _window_error(window):
+    """תשובת 400 לחלון מחוץ לטווח (או None אם הוא תקין)"""
+    if not MIN_WINDOW <= window <= MAX_WINDOW:
+        return jsonify({"error": f"window must be between {MIN_WINDOW} and {MAX_WINDOW} trading days"}), 400
+    return None
+
+
+@app.route('/api/portfolio', methods=['POST'])
+def analyze_portfolio():
+    """ניתוח סיכון לתיק: תנודתיות, קורלציות, בטא מול מדד ו-VaR"""
+    try:
+        data = request.get_json() or {}
+        window = int(data.get('window', 252))
+        error = _window_error(window)
+        if error:
+            return error
+        result = portfolio.analyze(
+            data.get('holdings', []),
+            window=window,
+            confidence=float(data.get('confidence', 0.95)),
+            benchmark=data.get('benchmark')
+        )
+        return jsonify(analyzer._clean_data(result))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.exception("❌ Error in portfolio analysis: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/screen')
+def screen_stocks():
+    """סינון מניות לפי ביטוי, למשל: pe < 20 AND rsi < 35 AND trend = Uptrend"""
+    try:
+        result = screener.screen(
+            request.args.get('q', ''),
+            sort=request.args.get('sort', 'score'),
+            descending=request.args.get('order', 'desc').lower() != 'asc',
+            limit=request.args.get('limit', 50, type=int)
+        )
+        return jsonify(result)
+    except ScreenQueryError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.exception("❌ Error in screen: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/similar/<symbol>')
+def similar_stocks(symbol):
+    """המניות שהכי זזות כמו המניה (והכי הפוך ממנה) ביקום הסריקה"""
+    window = request.args.get('window', 252, type=int)
+    k = request.args.get('k', 10, type=int)
+    error = _window_error(window)
+    if error:
+        return error
+    try:
+        return jsonify(analyzer._clean_data(similarity.similar(symbol, window=window, k=max(1, k))))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.exception("❌ Error in similar stocks: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/alerts', methods=['GET'])
+def list_alerts():
+    """הכללים הפעילים (אפשר לסנן לפי symbol) וההתראות האחרונות שנורו"""
+    symbol = request.args.get('symbol')
+    return jsonify({"rules": alerts.rules(symbol), "recent": alerts.recent()})
+
+
+@app.route('/api/alerts', methods=['POST'])
+def create_alert():
+    """רישום כלל: {symbol, type, value?} - למשל {"symbol": "NVDA", "type": "rsi_below", "value": 30}"""
+    try:
+        data = request.get_json() or {}
+        if not data.get('symbol') or not data.get('type'):
+            return jsonify({"error": "Please provide symbol and type"}), 400
+        rule = alerts.add_rule(data['symbol'], data['type'], data.get('value'))
+        return jsonify(rule), 201
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.exception("❌ Error creating alert: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/alerts/<int:rule_id>', methods=['DELETE'])
+def delete_alert(rule_id):
+    if not alerts.remove_rule(rule_id):
+        return jsonify({"error": "Alert not found"}), 404
+    return jsonify({"deleted": rule_id})
+
+
+@app.route('/api/alerts/stream')
+def stream_alerts():
+    """התראות בזמן אמת ב-Server-Sent Events"""
+    return Response(alerts.stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def _watchlist_symbols(data):
+    symbols = data.get('symbols')
+    if symbols is None:
+        return None
+    if isinstance(symbols, str):
+        symbols = symbols.split(',')
+    if not isinstance(symbols, list) or len(symbols) > 100:
+        raise ValueError("symbols must be a list of up to 100 tickers")
+    return [str(s) for s in symbols]
+
+
+@app.route('/api/watchlist', methods=['GET'])
+def list_watchlists():
+    return jsonify(watchlists.store.all())
+
+
+@app.route('/api/watchlist', methods=['POST'])
+def create_watchlist():
+    """יצירת רשימת מעקב: {name, symbols}"""
+    try:
+        data = request.get_json() or {}
+        watchlist = watchlists.store.create(data.get('name') or 'Watchlist', _watchlist_symbols(data) or [])
+        return jsonify(watchlist), 201
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route('/api/watchlist/<watchlist_id>', methods=['GET'])
+def get_watchlist(watchlist_id):
+    """ציטוטים ואינדיקטורים קלים לכל המניות ברשימה"""
+    try:
+        result = watchlists.snapshot(watchlist_id)
+        if result is None:
+            return jsonify({"error": "Watchlist not found"}), 404
+        return jsonify(analyzer._clean_data(result))
+    except Exception as e:
+        logger.exception("❌ Error in watchlist %s: %s", watchlist_id, e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/watchlist/<watchlist_id>', methods=['PUT'])
+def update_watchlist(watchlist_id):
+    """עדכון שם ו/או רשימת המניות: {name?, symbols?}"""
+    try:
+        data = request.get_json() or {}
+        watchlist = watchlists.store.update(watchlist_id, data.get('name'), _watchlist_symbols(data))
+        if watchlist is None:
+            return jsonify({"error": "Watchlist not found"}), 404
+        return jsonify(watchlist)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route('/api/watchlist/<watchlist_id>', methods=['DELETE'])
+def delete_watchlist(watchlist_id):
+    if not watchlists.store.delete(watchlist_id):
+        return jsonify({"error": "Watchlist not found"}), 404
+    return jsonify({"deleted": watchlist_id})
+
+
+@app.route('/api/market')
+def market_overview():
+    """מדדים, מפת סקטורים ורוחב שוק - מהתמונה שנבנתה ברקע (503 עד הבנייה הראשונה)"""
+    snapshot = market.snapshot()
+    if snapshot is None:
+        response = jsonify({"error": "Market overview is warming up, try again shortly"})
+        response.headers['Retry-After'] = '10'
+        return response, 503
+    return jsonify(snapshot)
+
+
 @app.route('/api/recommendations')
 def get_recommendations():
     """סריקת שוק והמלצות - גרסה אופטימלית ומהירה"""
@@ -152,12 +501,13 @@ def get_recommendations():
             "market_scanned": 40
         })
     except Exception as e:
-        print(f"❌ Error in recommendations: {e}")
+        logger.exception("❌ Error in recommendations: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
 if __name__ == '__main__':
-    print("🚀 Starting Stock Analysis API Server...")
-    print("📊 Server running on http://localhost:5000")
-    print("🔍 Try: http://localhost:5000/api/analyze/AAPL")
+    logger.info("🚀 Starting Stock Analysis API Server...")
+    logger.info("📊 Server running on http://localhost:5000")
+    logger.info("🔍 Try: http://localhost:5000/api/analyze/AAPL")
+    init_services()
     app.run(debug=True, port=5000)
@@ -8,6 +8,8 @@ let priceChart = null;
 let priceInterval = null;
 let currentChartType = 'line'; // 'line' or 'candle'
 let currentChartData = null;
+// פורמט הגרף מהשרת: מערכים מקבילים, וסדרות המחירים כ-Float32 ב-base64 (קטן פי ~5 ומתפענח בלי JSON)
+const CHART_FORMAT = 'format=columnar&encoding=float32';
 let perfBasePrices = {}; // שמירת מחירי בסיס לחישוב ביצועים בלייב
 
 // --- Event Listeners and Initialization ---
@@ -26,6 +28,10 @@ document.addEventListener('DOMContentLoaded', function () {
     // Market Scan Listener
     loadRecommendationsBtn.addEventListener('click', loadRecommendations);
 
+    // Market Overview (נבנה ברקע בשרת - מתרענן כל 5 דקות)
+    loadMarketOverview();
+    setInterval(loadMarketOverview, 5 * 60 * 1000);
+
     // Quick Symbols Listeners
     quickBtns.forEach(btn => {
         btn.addEventListener('click', () => {
@@ -90,7 +96,7 @@ async function analyzeStock() {
     document.getElementById('dashboard').classList.add('hidden');
 
     try {
-        const response = await fetch(`${API_BASE_URL}/analyze/${symbol}`);
+        const response = await fetch(`${API_BASE_URL}/analyze/${symbol}?${CHART_FORMAT}&max_points=${chartMaxPoints()}`);
         const data = await response.json();
 
         if (data.error) {
@@ -112,7 +118,7 @@ async function analyzeStock() {
  */
 async function updateChart(symbol, range) {
     try {
-        const response = await fetch(`${API_BASE_URL}/analyze/${symbol}?range=${range}`);
+        const response = await fetch(`${API_BASE_URL}/chart/${symbol}?range=${range}&${CHART_FORMAT}&max_points=${chartMaxPoints()}`);
         const data = await response.json();
         if (data.chart_data) {
             renderChart(data.chart_data);
@@ -140,8 +146,9 @@ function displayStockData(data) {
 
     // Detailed Textual Analysis (Expert Pros/Cons)
     const detailedAnalysisElem = document.getElementById('detailedAnalysis');
-    if (detailedAnalysisElem && rec.detailed_analysis_he) {
-        detailedAnalysisElem.innerHTML = rec.detailed_analysis_he
+    const detailedAnalysis = rec.detailed_analysis || rec.detailed_analysis_he;
+    if (detailedAnalysisElem && detailedAnalysis) {
+        detailedAnalysisElem.innerHTML = detailedAnalysis
             .replace(/\n\n/g, '<br><br>') // Paragraphs
             .replace(/\*\*(.*?)\*\*/g, '<strong>$1</strong>') // Bold
             .replace(/\n/g, '<br>'); // Line breaks
@@ -213,26 +220,19 @@ function displayStockData(data) {
             stratEl.className = `strategy-badge ${getStrategyClass(strat.strategy)}`;
         }
         const textEl = document.getElementById('strategyText');
-        if (textEl) textEl.innerHTML = strat.recommendation_he.replace(/\n/g, '<br>');
+        if (textEl) textEl.innerHTML = (strat.recommendation || strat.recommendation_he).replace(/\n/g, '<br>');
 
         const volEl = document.getElementById('volatilityValue');
         if (volEl) volEl.textContent = `${strat.volatility}% (יומי)`;
     }
 
     // News Section (Fixed Timestamps)
-    const newsGrid = document.getElementById('newsGrid');
+    // החדשות נמשכות ברקע בשרת - אם עוד לא הגיעו, ננסה שוב מ-/api/news
     if (data.news && data.news.length > 0) {
-        newsGrid.innerHTML = data.news.map(item => `
-            <div class="news-item">
-                <div class="news-meta">
-                    <span>${item.publisher}</span> • <span>${item.published}</span>
-                </div>
-                <div class="news-title">${item.title}</div>
-                <a href="${item.link}" target="_blank" class="news-link">קרא עוד ↗</a>
-            </div>
-        `).join('');
+        renderNews(data.news);
     } else {
-        newsGrid.innerHTML = '<p class="no-news-msg">לא נמצאו חדשות אחרונות עבור סימול זה.</p>';
+        renderNews([]);
+        loadNews(data.recommendation.symbol);
     }
 
     // Initialize/Reset Chart
@@ -249,6 +249,41 @@ function displayStockData(data) {
 /**
  * Renders the performance comparison segments
  */
+function renderNews(items) {
+    const newsGrid = document.getElementById('newsGrid');
+    if (items && items.length > 0) {
+        newsGrid.innerHTML = items.map(item => `
+            <div class="news-item">
+                <div class="news-meta">
+                    <span>${item.publisher}</span> • <span>${item.published}</span>
+                </div>
+                <div class="news-title">${item.title}</div>
+                <a href="${item.link}" target="_blank" class="news-link">קרא עוד ↗</a>
+            </div>
+        `).join('');
+    } else {
+        newsGrid.innerHTML = '<p class="no-news-msg">לא נמצאו חדשות אחרונות עבור סימול זה.</p>';
+    }
+}
+
+/**
+ * Fetches news from the server-side index (prefetched in the background)
+ */
+async function loadNews(symbol, attempt = 0) {
+    try {
+        const response = await fetch(`${API_BASE_URL}/news/${symbol}?per_page=5`);
+        const data = await response.json();
+        if (document.getElementById('stockSymbolDisplay').textContent !== symbol) return;
+        if (data.items && data.items.length > 0) {
+            renderNews(data.items);
+        } else if (attempt < 3) {
+            setTimeout(() => loadNews(symbol, attempt + 1), 1500);
+        }
+    } catch (error) {
+        console.error('Error loading news:', error);
+    }
+}
+
 function renderPerformance(perfData) {
     const container = document.getElementById('performanceBar');
     if (!container) return;
@@ -353,6 +388,51 @@ async function loadRecommendations() {
     }
 }
 
+/**
+ * Loads indices and the sector heatmap (built by a background job on the server)
+ */
+async function loadMarketOverview() {
+    const status = document.getElementById('marketStatus');
+    try {
+        const response = await fetch(`${API_BASE_URL}/market`);
+        if (response.status === 503) {
+            // השרת עוד בונה את הסקירה הראשונה
+            const retry = parseInt(response.headers.get('Retry-After') || '10', 10);
+            setTimeout(loadMarketOverview, retry * 1000);
+            return;
+        }
+        const data = await response.json();
+        if (data.error) return;
+
+        const sessions = { regular: '🟢 המסחר פתוח', pre: '🌅 טרום מסחר', post: '🌙 אחרי המסחר', closed: '🔴 השוק סגור' };
+        const market = data.market || {};
+        status.textContent = `${sessions[data.status.session] || ''} | עולות ${market.advancers ?? 0} / יורדות ${market.decliners ?? 0}`;
+
+        const indices = Array.isArray(data.indices) ? data.indices : [];
+        document.getElementById('marketIndices').innerHTML = indices.map(idx => {
+            const change = idx.change ?? idx.changePercent ?? idx.percentChange;
+            const cls = change > 0 ? 'positive' : change < 0 ? 'negative' : '';
+            const value = typeof idx.value === 'number' ? idx.value.toLocaleString() : (idx.value ?? '');
+            const changeText = typeof change === 'number' ? `${change > 0 ? '+' : ''}${change.toFixed(2)}%` : (change ?? '');
+            return `<div class="index-card"><span class="index-name">${idx.name || idx.symbol}</span>
+                <span class="index-value">${value}</span><span class="index-change ${cls}">${changeText}</span></div>`;
+        }).join('');
+
+        document.getElementById('sectorHeatmap').innerHTML = data.sectors.map(s => {
+            const change = s.avg_change ?? 0;
+            // עוצמת הצבע לפי גודל השינוי (רוויה מלאה ב-3%)
+            const alpha = Math.min(Math.abs(change) / 3, 1) * 0.6 + 0.1;
+            const color = change >= 0 ? `rgba(56, 239, 125, ${alpha})` : `rgba(244, 92, 67, ${alpha})`;
+            return `<div class="sector-tile" style="background: ${color}" title="${s.best ? 'Best: ' + s.best.symbol : ''}${s.worst ? ' | Worst: ' + s.worst.symbol : ''}">
+                <span class="sector-name">${s.sector}</span>
+                <span class="sector-change">${change > 0 ? '+' : ''}${change.toFixed(2)}%</span>
+                <span class="sector-breadth">▲${s.advancers} ▼${s.decliners}</span></div>`;
+        }).join('');
+    } catch (error) {
+        status.textContent = 'סקירת השוק אינה זמינה כרגע';
+    }
+}
+
 /**
  * Handles live price polling every 5 seconds
  */
@@ -408,23 +488,86 @@ function stopLiveUpdates() {
     if (liveIndicator) liveIndicator.style.display = 'none';
 }
 
+/**
+ * How many points the chart can actually show - about one per pixel of its width.
+ * The server downsamples longer ranges to this (LTTB for the line, aggregated candles)
+ */
+function chartMaxPoints() {
+    // לפני הניתוח הראשון ה-dashboard מוסתר (רוחב 0) - רוחב החלון כקירוב
+    const wrapper = document.querySelector('.chart-wrapper');
+    const width = (wrapper && wrapper.clientWidth) || window.innerWidth;
+    return Math.max(100, Math.round(width));
+}
+
+/**
+ * Numbers from a base64 string of little-endian float32 values (Float32Array)
+ */
+function decodeFloat32(b64) {
+    const bytes = Uint8Array.from(atob(b64), c => c.charCodeAt(0));
+    return Array.from(new Float32Array(bytes.buffer));
+}
+
+/**
+ * Normalizes chart_data (columnar from the server, or the legacy rows format) into parallel arrays
+ */
+function decodeChart(chartData) {
+    if (chartData.format !== 'columnar') {
+        const candles = chartData.candles || [];
+        return {
+            length: chartData.dates.length,
+            labels: chartData.dates.map(d => new Date(d).toLocaleDateString('he-IL')),
+            open: candles.map(c => c.o),
+            high: candles.map(c => c.h),
+            low: candles.map(c => c.l),
+            close: chartData.prices,
+            sma50: chartData.sma_50 || [],
+            support: chartData.support,
+            resistance: chartData.resistance
+        };
+    }
+
+    const series = name => chartData.encoding === 'float32' ? decodeFloat32(chartData[name]) : chartData[name];
+    // זמני הברים הם שעון הבורסה כ-epoch - מוצגים ב-UTC כדי שהתאריך לא יזוז לפי אזור הזמן של הדפדפן
+    const format = chartData.intraday
+        ? d => d.toLocaleString('he-IL', { timeZone: 'UTC', day: 'numeric', month: 'numeric', hour: '2-digit', minute: '2-digit' })
+        : d => d.toLocaleDateString('he-IL', { timeZone: 'UTC' });
+    const labels = new Array(chartData.length);
+    let t = 0;
+    for (let i = 0; i < chartData.length; i++) {
+        t = chartData.time === 'delta' ? t + chartData.t[i] : chartData.t[i];
+        labels[i] = format(new Date(t * 1000));
+    }
+    return {
+        length: chartData.length,
+        labels: labels,
+        open: series('open'),
+        high: series('high'),
+        low: series('low'),
+        close: series('close'),
+        sma50: series('sma_50'),
+        support: chartData.support,
+        resistance: chartData.resistance
+    };
+}
+
 /**
  * Renders the Chart.js chart (Line or Candlestick)
  */
 function renderChart(chartData) {
     const ctx = document.getElementById('priceChart');
-    if (!ctx || !chartData || !chartData.dates) return;
+    if (!ctx || !chartData || !(chartData.dates || chartData.t)) return;
     currentChartData = chartData;
 
     if (priceChart) priceChart.destroy();
 
-    const labels = chartData.dates.map(d => new Date(d).toLocaleDateString('he-IL'));
+    const chart = decodeChart(chartData);
+    const labels = chart.labels;
     const datasets = [];
 
     if (currentChartType === 'line') {
         datasets.push({
             label: 'מחיר סגירה',
-            data: chartData.prices,
+            data: chart.close,
             borderColor: '#6366f1',
             backgroundColor: 'rgba(99, 102, 241, 0.1)',
             borderWidth: 2,
@@ -438,10 +581,7 @@ function renderChart(chartData) {
         // 1. Wicks (High/Low) - Thin bars
         datasets.push({
             label: 'טווח יומי',
-            data: chartData.candles.map(c => ({
-                x: new Date(c.t).toLocaleDateString('he-IL'),
-                y: [c.l, c.h]
-            })),
+            data: labels.map((x, i) => ({ x: x, y: [chart.low[i], chart.high[i]] })),
             backgroundColor: '#616161',
             borderColor: '#616161',
             borderWidth: 1,
@@ -452,19 +592,14 @@ function renderChart(chartData) {
         // 2. Bodies (Open/Close) - Thick bars
         datasets.push({
             label: 'גוף הנר',
-            data: chartData.candles.map(c => ({
-                x: new Date(c.t).toLocaleDateString('he-IL'),
-                y: [c.o, c.c]
-            })),
+            data: labels.map((x, i) => ({ x: x, y: [chart.open[i], chart.close[i]] })),
             backgroundColor: (ctx) => {
-                const candle = chartData.candles[ctx.index];
-                if (!candle) return '#6366f1';
-                return candle.c >= candle.o ? '#4ade80' : '#f87171';
+                if (ctx.index >= chart.length) return '#6366f1';
+                return chart.close[ctx.index] >= chart.open[ctx.index] ? '#4ade80' : '#f87171';
             },
             borderColor: (ctx) => {
-                const candle = chartData.candles[ctx.index];
-                if (!candle) return '#616161';
-                return candle.c >= candle.o ? '#22c55e' : '#ef4444';
+                if (ctx.index >= chart.length) return '#616161';
+                return chart.close[ctx.index] >= chart.open[ctx.index] ? '#22c55e' : '#ef4444';
             },
             borderWidth: 1,
             barPercentage: 0.7,
@@ -473,10 +608,10 @@ function renderChart(chartData) {
     }
 
     // Add Moving Averages
-    if (chartData.sma_50 && chartData.sma_50.length > 0) {
+    if (chart.sma50 && chart.sma50.length > 0) {
         datasets.push({
             label: 'ממוצע 50',
-            data: chartData.sma_50,
+            data: chart.sma50,
             borderColor: '#f59e0b',
             borderWidth: 1,
             borderDash: [5, 5],
@@ -486,10 +621,10 @@ function renderChart(chartData) {
     }
 
     // Add Support/Resistance Lines
-    if (chartData.support) {
+    if (chart.support) {
         datasets.push({
             label: 'תמיכה (רצפה)',
-            data: Array(labels.length).fill(chartData.support),
+            data: Array(labels.length).fill(chart.support),
             borderColor: 'rgba(34, 197, 94, 0.4)',
             borderWidth: 2,
             borderDash: [10, 5],
@@ -497,10 +632,10 @@ function renderChart(chartData) {
             fill: false
         });
     }
-    if (chartData.resistance) {
+    if (chart.resistance) {
         datasets.push({
             label: 'התנגדות (תקרה)',
-            data: Array(labels.length).fill(chartData.resistance),
+            data: Array(labels.length).fill(chart.resistance),
             borderColor: 'rgba(239, 68, 68, 0.4)',
             borderWidth: 2,
             borderDash: [10, 5],
@@ -524,12 +659,12 @@ function renderChart(chartData) {
                     callbacks: {
                         label: function (context) {
                             if (currentChartType === 'candle' && context.datasetIndex === 0) {
-                                const c = chartData.candles[context.dataIndex];
+                                const i = context.dataIndex;
                                 return [
-                                    `פתיחה: $${c.o.toFixed(2)}`,
-                                    `גבוה: $${c.h.toFixed(2)}`,
-                                    `נמוך: $${c.l.toFixed(2)}`,
-                                    `סגירה: $${c.c.toFixed(2)}`
+                                    `פתיחה: $${chart.open[i].toFixed(2)}`,
+                                    `גבוה: $${chart.high[i].toFixed(2)}`,
+                                    `נמוך: $${chart.low[i].toFixed(2)}`,
+                                    `סגירה: $${chart.close[i].toFixed(2)}`
                                 ];
                             }
                             return `${context.dataset.label}: $${context.raw.constructor === Array ? context.raw[1].toFixed(2) : context.raw.toFixed(2)}`;
@@ -0,0 +1,259 @@
+"""בקטסט וקטורי לכללי ההמלצה של המערכת.
+
+מריץ את הכללים של RecommendationEngine.generate_recommendation (מגמה + ציון פונדמנטלי)
+ושל scan_market_cached (ציון הסריקה) על כל ההיסטוריה של כל מניה כמערך אחד לאורך הזמן,
+ומחלק את היקום לחבילות שרצות במקביל בתהליכים נפרדים.
+
+שימוש:
+    python backtest.py AAPL MSFT NVDA --horizon 20 --workers 4
+    python backtest.py --output backtest_results.json      (כל יקום הסריקה)
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import indicators
+from stock_analyzer import (
+    StockDataFetcher, FundamentalAnalyzer, RecommendationEngine, TechnicalAnalyzer, SCAN_UNIVERSE, scan_signals,
+    load_config
+)
+
+# ההמלצה היא Buy (או Strong Buy) מציון 1 ומעלה, ו-Sell (או Strong Sell) מציון -1 ומטה
+BUY_SCORE = 1
+SELL_SCORE = -1
+
+# ציון אות המומנטום לפי קוד (TechnicalAnalyzer.MOMENTUMS)
+MOMENTUM_SCORES = np.array([0, -1, 1])
+
+# מספר הברים הראשונים שבהם הכללים עוד לא מוגדרים (שיא/שפל שנתי 252); לכללי המגמה - technical_warmup
+SCAN_WARMUP = 252
+
+
+def technical_warmup(params=None):
+    """get_trend_signal דורש TREND_MIN_BARS ברים, ועד שה-SMA הארוך מתמלא המגמה היא Neutral"""
+    return max(TechnicalAnalyzer.TREND_MIN_BARS, indicators.parameters(params)['sma_long'])
+
+
+def _rolling(values, window, how):
+    return getattr(pd.Series(values).rolling(window=window), how)().to_numpy()
+
+
+def technical_scores(close, fundamental_score=0, params=None):
+    """ציון ההמלצה של הניתוח המלא לכל יום: מגמה (TechnicalAnalyzer.trend_signals) + ציון פונדמנטלי"""
+    params = indicators.parameters(params)
+    sma_20 = _rolling(close, params['sma_short'], 'mean')
+    sma_50 = _rolling(close, params['sma_long'], 'mean')
+    # בכל יום get_trend_signal רואה רק את הברים עד אותו יום
+    trend = TechnicalAnalyzer.trend_codes(close, sma_20, sma_50, bars=np.arange(1, len(close) + 1))
+    return RecommendationEngine.TREND_SCORE_LUT[trend] + fundamental_score
+
+
+def momentum_scores(close, params=None):
+    """אות המומנטום (TechnicalAnalyzer.momentum_codes): +1 ב-Oversold (הזדמנות), -1 ב-Overbought (סיכון לתיקון)"""
+    params = indicators.parameters(params)
+    rsi = indicators.compute('rsi', lambda name: close, params)
+    # לפי סדר TechnicalAnalyzer.MOMENTUMS: Neutral, Overbought, Oversold
+    return MOMENTUM_SCORES[TechnicalAnalyzer.momentum_codes(rsi, params)]
+
+
+def scan_scores(close, high, low, pe=0, yield_val=0):
+    """ציון הסריקה לכל יום, כשנתוני הציטוט משוחזרים מההיסטוריה (ממוצעים, שיא/שפל 52 שבועות)"""
+    prev = np.concatenate(([np.nan], close[:-1]))
+    change_pct = (close / prev - 1) * 100
+    signals = scan_signals(
+        close, change_pct,
+        _rolling(close, 50, 'mean'), _rolling(close, 200, 'mean'),
+        _rolling(low, 252, 'min'), _rolling(high, 252, 'max'),
+        pe, yield_val
+    )
+    return signals["score"]
+
+
+def max_drawdown(returns):
+    equity = np.cumprod(1 + returns)
+    peak = np.maximum.accumulate(equity)
+    return float(np.min(equity / peak - 1)) if len(equity) else 0.0
+
+
+def evaluate_signals(close, score, horizon=20, warmup=0):
+    """מדדי ביצוע לסדרת ציונים: אחוז פגיעה ותשואה ממוצעת לכל סוג המלצה,
+    ותשואה/ירידה מקסימלית של אסטרטגיית Long כשההמלצה היא Buy"""
+    n = len(close)
+    forward = np.full(n, np.nan)
+    if n > horizon:
+        forward[:-horizon] = close[horizon:] / close[:-horizon] - 1
+
+    valid = np.arange(n) >= warmup
+    buy = valid & (score >= BUY_SCORE)
+    sell = valid & (score <= SELL_SCORE)
+    hold = valid & ~buy & ~sell
+    has_fwd = ~np.isnan(forward)
+
+    def stats(mask, wins):
+        mask = mask & has_fwd
+        count = int(mask.sum())
+        return {
+            "signals": count,
+            "hit_rate": float(wins[mask].mean()) if count else None,
+            "avg_return": float(forward[mask].mean()) if count else None
+        }
+
+    # אסטרטגיה: מחזיקים מהבר שאחרי האות (בלי הצצה לעתיד)
+    daily = np.zeros(n)
+    daily[1:] = close[1:] / close[:-1] - 1
+    position = np.zeros(n)
+    position[1:] = buy[:-1]
+    strategy = (position * daily)[valid]
+    benchmark = daily[valid]
+
+    return {
+        "buy": stats(buy, forward > 0),
+        "sell": stats(sell, forward < 0),
+        # Hold נחשב "פגיעה" כשהמחיר כמעט לא זז (פחות מ-2%) באופק
+        "hold": stats(hold, np.abs(forward) < 0.02),
+        "strategy_return": float(np.prod(1 + strategy) - 1) if len(strategy) else 0.0,
+        "buy_and_hold_return": float(np.prod(1 + benchmark) - 1) if len(benchmark) else 0.0,
+        "max_drawdown": max_drawdown(strategy),
+        "exposure": float(position[valid].mean()) if valid.any() else 0.0,
+        # לפני הבר התקף הראשון אין פוזיציה - כניסה כבר בבר הראשון נספרת כעסקה
+        "trades": int(np.count_nonzero(np.diff(position[valid], prepend=0) > 0))
+    }
+
+
+def backtest_symbol(symbol, close, high, low, horizon=20, fundamentals=None, params=None):
+    fundamentals = fundamentals or {}
+    warmup = technical_warmup(params)
+    return {
+        "symbol": symbol,
+        "bars": int(len(close)),
+        "recommendation": evaluate_signals(
+            close, technical_scores(close, fundamentals.get("score", 0), params), horizon, warmup
+        ),
+        "momentum": evaluate_signals(close, momentum_scores(close, params), horizon, warmup),
+        "scan": evaluate_signals(
+            close, scan_scores(close, high, low, fundamentals.get("pe", 0), fundamentals.get("yield", 0)),
+            horizon, SCAN_WARMUP
+        )
+    }
+
+
+def _backtest_chunk(chunk, horizon, params=None):
+    """עבודה של תהליך בודד: חבילת מניות (symbol, close, high, low, fundamentals)"""
+    return [backtest_symbol(symbol, close, high, low, horizon, fundamentals, params)
+            for symbol, close, high, low, fundamentals in chunk]
+
+
+def _summarize(results, key):
+    """סיכום על פני כל היקום - ממוצע משוקלל לפי מספר האותות"""
+    summary = {}
+    for side in ("buy", "sell", "hold"):
+        counts = np.array([r[key][side]["signals"] for r in results], dtype=float)
+        total = counts.sum()
+        hit = [r[key][side]["hit_rate"] or 0 for r in results]
+        ret = [r[key][side]["avg_return"] or 0 for r in results]
+        summary[side] = {
+            "signals": int(total),
+            "hit_rate": float(np.dot(counts, hit) / total) if total else None,
+            "avg_return": float(np.dot(counts, ret) / total) if total else None
+        }
+    for metric in ("strategy_return", "buy_and_hold_return", "max_drawdown", "exposure"):
+        summary[metric] = float(np.mean([r[key][metric] for r in results])) if results else None
+    return summary
+
+
+def load_history(symbols, fetcher, range='5y', max_workers=8):
+    """משיכת היסטוריה לכל המניות במקביל (I/O) - מחזיר symbol -> DataFrame"""
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        frames = pool.map(lambda s: fetcher.get_stock_data(s, range=range), symbols)
+        return {s: df for s, df in zip(symbols, frames) if df is not None and len(df) > TechnicalAnalyzer.TREND_MIN_BARS}
+
+
+def load_fundamentals(symbols, fetcher):
+    """ציון פונדמנטלי נוכחי, מכפיל ותשואת דיבידנד (אין היסטוריה שלהם - מוחלים כקבועים)"""
+    analyzer = FundamentalAnalyzer()
+    result = {}
+    for q in fetcher.get_batch_quotes(symbols):
+        symbol = q.get('symbol')
+        overview = fetcher.overview_from_quote(q, symbol)
+        result[symbol] = {
+            "score": analyzer.analyze_fundamentals(overview)["score"],
+            "pe": q.get('trailingPE', 0),
+            "yield": q.get('trailingAnnualDividendYield', 0)
+        }
+    return result
+
+
+def summarize(results):
+    return {rule: _summarize(results, rule) for rule in ("recommendation", "momentum", "scan")}
+
+
+def run_backtest(history, horizon=20, fundamentals=None, workers=None, chunk_size=8, params=None):
+    """הרצת הבקטסט על מילון symbol -> DataFrame, בחבילות מקבילות בין תהליכים"""
+    fundamentals = fundamentals or {}
+    items = [
+        (symbol,
+         df['close'].to_numpy(dtype=np.float64),
+         df['high'].to_numpy(dtype=np.float64),
+         df['low'].to_numpy(dtype=np.float64),
+         fundamentals.get(symbol))
+        for symbol, df in history.items()
+    ]
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+    results = []
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            results.extend(_backtest_chunk(chunk, horizon, params))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk_results in pool.map(_backtest_chunk, chunks, [horizon] * len(chunks), [params] * len(chunks)):
+                results.extend(chunk_results)
+
+    return {
+        "horizon": horizon,
+        "symbols": len(results),
+        "summary": summarize(results),
+        "results": results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the recommendation and scan rules")
+    parser.add_argument("symbols", nargs="*", help="symbols to test (default: the scan universe)")
+    parser.add_argument("--range", default="5y")
+    parser.add_argument("--horizon", type=int, default=20, help="forward-return horizon in bars")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--no-fundamentals", action="store_true", help="ignore current fundamentals")
+    parser.add_argument("--config", default="config.json", help="analysis_parameters source")
+    parser.add_argument("--output", help="write full results as JSON")
+    args = parser.parse_args()
+
+    symbols = [s.upper() for s in args.symbols] or SCAN_UNIVERSE
+    fetcher = StockDataFetcher()
+    history = load_history(symbols, fetcher, args.range)
+    fundamentals = {} if args.no_fundamentals else load_fundamentals(list(history), fetcher)
+
+    params = load_config(args.config).get('analysis_parameters')
+    report = run_backtest(history, args.horizon, fundamentals, args.workers, params=params)
+
+    print(f"\n📈 Backtest: {report['symbols']} symbols, {args.horizon}-bar horizon")
+    for rule, summary in report["summary"].items():
+        buy = summary["buy"]
+        hit = f"{buy['hit_rate'] * 100:.1f}%" if buy["hit_rate"] is not None else "N/A"
+        print(f"  {rule:<15} buy signals: {buy['signals']:>6}  hit rate: {hit:>6}  "
+              f"strategy: {summary['strategy_return'] * 100:7.1f}%  "
+              f"buy&hold: {summary['buy_and_hold_return'] * 100:7.1f}%  "
+              f"max DD: {summary['max_drawdown'] * 100:6.1f}%")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
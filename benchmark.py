@@ -0,0 +1,302 @@
+"""בנצ'מרקים offline מול שרת finance-query מקומי (mock_finance_query.py).
+
+כל הקריאות לרשת מגיעות לשרת המקומי עם השהיה/jitter קבועים, כך שאפשר להשוות ריצות:
+התוצאות נשמרות ב-benchmark_results/<name>.json ו---compare מציג שינוי מול ריצה קודמת.
+
+שימוש:
+    python benchmark.py --save baseline
+    python benchmark.py --latency 80 --jitter 30 --concurrency 8 --compare benchmark_results/baseline.json
+    python benchmark.py --only indicators chart_data --repeat 50
+    python benchmark.py --only chart_payload      (גודל ופענוח של chart_data בכל פורמט)
+"""
+import argparse
+import base64
+import gzip
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import requests
+from werkzeug.serving import make_server
+
+import mock_finance_query
+
+RESULTS_DIR = 'benchmark_results'
+BENCHMARK_SYMBOL = 'AAPL'
+
+
+def summarize(seconds):
+    ms = np.asarray(seconds) * 1000
+    return {
+        "n": int(len(ms)),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "min_ms": float(ms.min()),
+        "max_ms": float(ms.max())
+    }
+
+
+def measure(func, repeat, setup=None):
+    """זמן ריצה של func לאורך repeat חזרות; setup (אם יש) רץ לפני כל חזרה ולא נמדד"""
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        if setup:
+            func(arg)
+        else:
+            func()
+        times.append(time.perf_counter() - start)
+    return summarize(times)
+
+
+def bench_indicators(analyzer, repeat):
+    df = analyzer.candles.get_frame(BENCHMARK_SYMBOL)
+    columns = analyzer.technical.DEFAULT_INDICATORS
+    return {
+        "calculate_indicators.5y": measure(
+            lambda frame: analyzer.technical.calculate_indicators(frame, columns), repeat, setup=df.copy
+        )
+    }
+
+
+def bench_chart_data(analyzer, repeat):
+    full = analyzer.technical.calculate_indicators(analyzer.candles.get_frame(BENCHMARK_SYMBOL),
+                                                   analyzer.ANALYSIS_INDICATORS)
+    results = {}
+    for label, bars in (('3mo', 63), ('5y', len(full))):
+        df = full.iloc[-bars:]
+        results[f"prepare_chart_data.{label}"] = measure(lambda: analyzer._prepare_chart_data(df), repeat)
+    # 5y מדולל לרוחב גרף טיפוסי (LTTB + נרות מצטברים)
+    results["prepare_chart_data.5y.max_points"] = measure(
+        lambda: analyzer._prepare_chart_data(full, max_points=600), repeat
+    )
+    return results
+
+
+def _decode_payload(text):
+    """מה שהדפדפן עושה עם התשובה: JSON.parse ומעבר למערכים מספריים לכל סדרה"""
+    chart = json.loads(text)
+    if chart.get("format") != "columnar":
+        candles = chart["candles"]
+        return [np.array([c[k] for c in candles], dtype=np.float64) for k in ("o", "h", "l", "c")]
+    series = [chart[k] for k in ("open", "high", "low", "close", "sma_20", "sma_50")]
+    if chart["encoding"] == "float32":
+        return [np.frombuffer(base64.b64decode(s), dtype='<f4') for s in series]
+    return [np.array(s, dtype=np.float64) for s in series]
+
+
+def bench_chart_payload(analyzer, repeat):
+    """גודל ה-chart_data (גולמי ו-gzip) וזמן הפענוח שלו בכל פורמט - p50 הוא זמן הפענוח"""
+    import chart_payload
+    full = analyzer.technical.calculate_indicators(analyzer.candles.get_frame(BENCHMARK_SYMBOL),
+                                                   analyzer.ANALYSIS_INDICATORS)
+    variants = {
+        "rows": None,
+        "columnar": {"encoding": "json", "delta": True},
+        "columnar_float32": {"encoding": "float32", "delta": True}
+    }
+    results = {}
+    for label, bars in (('3mo', 63), ('5y', len(full))):
+        chart = analyzer._clean_data(analyzer._prepare_chart_data(full.iloc[-bars:]))
+        for name, opts in variants.items():
+            payload = chart if opts is None else chart_payload.columnar(chart, **opts)
+            text = json.dumps(payload)
+            stats = measure(lambda: _decode_payload(text), repeat)
+            stats["bytes"] = len(text.encode())
+            stats["gzip_bytes"] = len(gzip.compress(text.encode()))
+            results[f"chart_payload.{label}.{name}"] = stats
+    return results
+
+
+def bench_analyze(analyzer, repeat, universe):
+    # קר: כל מניה בפעם הראשונה (משיכת chart + quote מהשרת המקומי); חם: אותה מניה מהמטמונים
+    cold_symbols = iter(universe)
+    return {
+        "analyze_stock.cold": measure(lambda symbol: analyzer.analyze_stock(symbol),
+                                      min(repeat, len(universe)), setup=lambda: next(cold_symbols)),
+        "analyze_stock.warm": measure(lambda: analyzer.analyze_stock(universe[0]), repeat)
+    }
+
+
+def bench_scan(analyzer, repeat):
+    def reset():
+        analyzer.scan_results = None
+        if os.path.exists('scan_cache.json'):
+            os.remove('scan_cache.json')
+
+    return {
+        "scan_market_cached.cold": measure(lambda _: analyzer.scan_market_cached(), repeat, setup=reset),
+        "scan_market_cached.warm": measure(analyzer.scan_market_cached, repeat)
+    }
+
+
+def bench_endpoints(app, universe, requests_per_endpoint, concurrency):
+    """ה-API של Flask תחת עומס: requests_per_endpoint בקשות ב-concurrency חיבורים במקביל"""
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    base = f"http://127.0.0.1:{server.server_port}"
+    threading.Thread(target=server.serve_forever, name="benchmark-api", daemon=True).start()
+
+    endpoints = {
+        "analyze": lambda i: f"/api/analyze/{universe[i % len(universe)]}",
+        "chart": lambda i: f"/api/chart/{universe[i % len(universe)]}?range=1y",
+        "price": lambda i: f"/api/price/{universe[i % len(universe)]}",
+        "recommendations": lambda i: "/api/recommendations"
+    }
+    results = {}
+    try:
+        for name, path in endpoints.items():
+            session = requests.Session()
+            session.get(base + path(0), timeout=60)  # חימום
+
+            def call(i):
+                start = time.perf_counter()
+                r = session.get(base + path(i), timeout=60)
+                return time.perf_counter() - start, r.status_code
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                outcomes = list(pool.map(call, range(requests_per_endpoint)))
+            elapsed = time.perf_counter() - start
+            stats = summarize([t for t, _ in outcomes])
+            stats["throughput_rps"] = requests_per_endpoint / elapsed
+            stats["errors"] = sum(1 for _, status in outcomes if status >= 400)
+            stats["concurrency"] = concurrency
+            results[f"endpoint.{name}"] = stats
+    finally:
+        server.shutdown()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def compare(current, baseline, threshold):
+    """השוואת p50 מול ריצה קודמת; מחזיר את רשימת הבנצ'מרקים שהאטו מעבר לסף"""
+    regressions = []
+    print(f"\n{'benchmark':<28}{'baseline p50':>14}{'current p50':>14}{'change':>10}")
+    for name, stats in current.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        change = (stats["p50_ms"] / old["p50_ms"] - 1) * 100 if old["p50_ms"] else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  ⚠️ regression"
+            regressions.append(name)
+        print(f"{name:<28}{old['p50_ms']:>12.2f}ms{stats['p50_ms']:>12.2f}ms{change:>+9.1f}%{flag}")
+    return regressions
+
+
+BENCHMARKS = ('indicators', 'chart_data', 'chart_payload', 'analyze', 'scan', 'endpoints')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks against a local finance-query stand-in")
+    parser.add_argument("--fixtures", default=mock_finance_query.DEFAULT_FIXTURES)
+    parser.add_argument("--latency", type=float, default=50, help="mock API latency per request (ms)")
+    parser.add_argument("--jitter", type=float, default=15, help="mock API jitter (ms)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint in the load test")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--compute-workers", type=int, default=0,
+                        help="run the analysis CPU stage in N worker processes (COMPUTE_WORKERS)")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS)
+    parser.add_argument("--save", metavar="NAME", help=f"store results as {RESULTS_DIR}/NAME.json")
+    parser.add_argument("--compare", metavar="FILE", help="compare against a stored result file")
+    parser.add_argument("--threshold", type=float, default=10, help="p50 slowdown (%%) counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    # בלי שורת לוג לכל בקשה של השרתים המקומיים
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    fixtures = os.path.abspath(args.fixtures)
+    if not os.path.isdir(os.path.join(fixtures, 'chart')):
+        from stock_analyzer import SCAN_UNIVERSE
+        mock_finance_query.synthesize(SCAN_UNIVERSE + ['SPY'], fixtures)
+
+    mock = mock_finance_query.MockServer(fixtures, args.latency, args.jitter).start()
+    os.environ['FINANCE_QUERY_URL'] = mock.url
+    os.environ['COMPUTE_WORKERS'] = str(args.compute_workers)
+    workdir = tempfile.mkdtemp(prefix='stock-bench-')
+    os.environ['WATCHLIST_DB'] = os.path.join(workdir, 'watchlists.db')
+    results_dir = os.path.abspath(RESULTS_DIR)
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+
+    import api_server
+    from stock_analyzer import SCAN_UNIVERSE
+    analyzer = api_server.analyzer.get()
+    # קבצי מטמון (scan_cache.json) נכתבים לתיקייה זמנית ולא לתיקיית הפרויקט
+    os.chdir(workdir)
+
+    selected = args.only or BENCHMARKS
+    results = {}
+    print(f"⏱️ Mock API at {mock.url} ({args.latency}±{args.jitter} ms)")
+    if 'indicators' in selected:
+        results.update(bench_indicators(analyzer, args.repeat))
+    if 'chart_data' in selected:
+        results.update(bench_chart_data(analyzer, args.repeat))
+    if 'chart_payload' in selected:
+        results.update(bench_chart_payload(analyzer, args.repeat))
+    if 'analyze' in selected:
+        results.update(bench_analyze(analyzer, args.repeat, SCAN_UNIVERSE))
+    if 'scan' in selected:
+        results.update(bench_scan(analyzer, args.repeat))
+    if 'endpoints' in selected:
+        results.update(bench_endpoints(api_server.app, SCAN_UNIVERSE, args.requests, args.concurrency))
+
+    for name, stats in results.items():
+        extra = f"  {stats['throughput_rps']:.1f} req/s" if 'throughput_rps' in stats else ""
+        if 'bytes' in stats:
+            extra = f"  {stats['bytes'] / 1024:8.1f} KB  ({stats['gzip_bytes'] / 1024:.1f} KB gzip)"
+        print(f"  {name:<28} p50 {stats['p50_ms']:9.2f} ms   p95 {stats['p95_ms']:9.2f} ms{extra}")
+    print(f"  mock API requests: {mock.requests}")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "latency_ms": args.latency,
+            "jitter_ms": args.jitter,
+            "repeat": args.repeat,
+            "concurrency": args.concurrency,
+            "compute_workers": args.compute_workers
+        },
+        "results": results
+    }
+    if args.save:
+        os.makedirs(results_dir, exist_ok=True)
+        path = os.path.join(results_dir, f"{args.save}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results written to {path}")
+
+    mock.stop()
+    if baseline_path:
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import indicators
+from market_calendar import NYSE
+from metrics import cache_hit, cache_miss
+
+
+def to_epoch_seconds(index):
+    """המרת DatetimeIndex לשניות מאז 1970 (int64), ללא תלות ברזולוציה של pandas"""
+    return np.asarray((index - pd.Timestamp(0)) // pd.Timedelta(seconds=1), dtype=np.int64)
+
+
+# אינטרוולים שנגזרים מהסדרה היומית השמורה במקום משיכה נפרדת (period של pandas)
+RESAMPLE_PERIODS = {'1wk': 'W', '1mo': 'M'}
+
+_RANGE = re.compile(r'^(\d+)(d|wk|mo|y)$')
+
+
+def range_start(index, range, base_range='5y'):
+    """המיקום בסדרה שממנו מתחיל טווח גרף (1d/5d/1mo/3mo/6mo/1y/5y/ytd).
+    מחזיר None כשהטווח לא מוכר או ארוך מהסדרה הבסיסית - ואז צריך למשוך אותו בנפרד"""
+    if len(index) == 0:
+        return None
+    if range == base_range:
+        return 0
+    last = index[-1]
+    if range == 'ytd':
+        return int(index.searchsorted(pd.Timestamp(year=last.year, month=1, day=1)))
+    m = _RANGE.match(range)
+    base = _RANGE.match(base_range)
+    if not m or not base or base.group(2) != 'y':
+        return None
+    n, unit = int(m.group(1)), m.group(2)
+    if unit == 'd':
+        # טווח בימים הוא מספר ימי מסחר אחרונים
+        return max(0, len(index) - n)
+    offset = {'wk': pd.DateOffset(weeks=n), 'mo': pd.DateOffset(months=n), 'y': pd.DateOffset(years=n)}[unit]
+    if last - offset < last - pd.DateOffset(years=int(base.group(1))):
+        return None
+    return int(index.searchsorted(last - offset))
+
+
+class CandleRingBuffer:
+    """חוצץ מעגלי בגודל קבוע לנרות של מניה אחת - הזיכרון לא גדל ככל שהשרת רץ"""
+
+    FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._ts = np.zeros(self.capacity, dtype=np.int64)
+        self._values = np.zeros((len(self.FIELDS), self.capacity), dtype=np.float64)
+        self._start = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def last_timestamp(self):
+        if self._size == 0:
+            return None
+        return int(self._ts[(self._start + self._size - 1) % self.capacity])
+
+    def extend(self, timestamps, values):
+        """הוספת נרות (timestamps בשניות, values במבנה [field, bar]) - רק נרות חדשים נכנסים"""
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        if timestamps.size == 0:
+            return 0
+
+        with self._lock:
+            last = self.last_timestamp
+            if last is not None:
+                # הנר האחרון עדיין "חי" במהלך הדקה/האינטרוול - מעדכנים אותו במקום
+                same = np.nonzero(timestamps == last)[0]
+                if same.size:
+                    self._values[:, (self._start + self._size - 1) % self.capacity] = values[:, same[-1]]
+                newer = timestamps > last
+                timestamps, values = timestamps[newer], values[:, newer]
+
+            # רק ה-capacity האחרונים רלוונטיים
+            timestamps, values = timestamps[-self.capacity:], values[:, -self.capacity:]
+            n = timestamps.size
+            if n == 0:
+                return 0
+
+            pos = (self._start + self._size + np.arange(n)) % self.capacity
+            self._ts[pos] = timestamps
+            self._values[:, pos] = values
+
+            overflow = max(0, self._size + n - self.capacity)
+            self._start = (self._start + overflow) % self.capacity
+            self._size = min(self.capacity, self._size + n)
+            return n
+
+    def extend_frame(self, df):
+        """הוספת נרות מתוך DataFrame בפורמט של StockDataFetcher"""
+        if df is None or df.empty:
+            return 0
+        return self.extend(to_epoch_seconds(df.index), df[list(self.FIELDS)].to_numpy(dtype=np.float64).T)
+
+    def to_frame(self):
+        """החזרת הנרות כ-DataFrame ממוין מהישן לחדש"""
+        with self._lock:
+            order = (self._start + np.arange(self._size)) % self.capacity
+            ts = self._ts[order]
+            values = self._values[:, order]
+        df = pd.DataFrame(
+            {field: values[i] for i, field in enumerate(self.FIELDS)},
+            index=pd.to_datetime(ts, unit='s')
+        )
+        df.index.name = 'timestamp'
+        return df
+
+
+class IntradayStore:
+    """מאגר חוצצים מעגליים לכל (מניה, אינטרוול) במצבי מסחר תוך-יומיים"""
+
+    def __init__(self, capacities):
+        self.capacities = capacities
+        self._buffers = {}
+        self.fetched = {}  # (symbol, interval) -> datetime of the last fetch
+        self._lock = threading.Lock()
+
+    def buffer(self, symbol, interval):
+        key = (symbol, interval)
+        with self._lock:
+            buf = self._buffers.get(key)
+            if buf is None:
+                buf = CandleRingBuffer(self.capacities[interval])
+                self._buffers[key] = buf
+            return buf
+
+    def get(self, symbol, interval):
+        return self._buffers.get((symbol, interval))
+
+
+class CompactCandles:
+    """ייצוג קומפקטי של היסטוריית נרות (struct-of-arrays):
+    מחירים ב-float32, נפח ב-uint32 ותאריכים כהיסט ימים (int32) מיום בסיס"""
+
+    PRICE_FIELDS = ('open', 'high', 'low', 'close')
+
+    def __init__(self, base_day, day_offsets, open, high, low, close, volume, params=None):
+        self.base_day = int(base_day)
+        self.params = params
+        self.day_offsets = np.asarray(day_offsets, dtype=np.int32)
+        self.open = np.asarray(open, dtype=np.float32)
+        self.high = np.asarray(high, dtype=np.float32)
+        self.low = np.asarray(low, dtype=np.float32)
+        self.close = np.asarray(close, dtype=np.float32)
+        self.volume = np.asarray(volume, dtype=np.uint32)
+        self._columns = {}
+        self._resampled = {}
+
+    @classmethod
+    def from_frame(cls, df, params=None):
+        days = to_epoch_seconds(df.index) // 86400
+        base_day = int(days[0]) if len(days) else 0
+        volume = np.clip(np.nan_to_num(df['volume'].to_numpy(dtype=np.float64)), 0, np.iinfo(np.uint32).max)
+        return cls(
+            base_day, days - base_day,
+            df['open'].to_numpy(), df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy(),
+            volume, params
+        )
+
+    def __len__(self):
+        return len(self.close)
+
+    @property
+    def nbytes(self):
+        arrays = [self.day_offsets, self.open, self.high, self.low, self.close, self.volume]
+        return sum(a.nbytes for a in arrays) + sum(a.nbytes for a in self._columns.values())
+
+    @property
+    def index(self):
+        return pd.to_datetime((self.base_day + self.day_offsets.astype(np.int64)) * 86400, unit='s')
+
+    def column(self, name):
+        """עמודת מחיר/נפח או אינדיקטור - אינדיקטור מחושב בגישה הראשונה ונשמר"""
+        if name in self.PRICE_FIELDS or name == 'volume':
+            return getattr(self, name)
+        if name not in self._columns:
+            self._columns[name] = np.asarray(indicators.compute(name, self.column, self.params), dtype=np.float32)
+        return self._columns[name]
+
+    def resample(self, period):
+        """נרות שבועיים ('W') או חודשיים ('M') מהנרות היומיים - נשמר, כך שגם האינדיקטורים
+        של כל טווח זמן מחושבים פעם אחת לכל גרסה של הסדרה"""
+        if len(self) == 0:
+            return self
+        if period not in self._resampled:
+            periods = self.index.to_period(period)
+            starts = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+            ends = np.r_[starts[1:], len(self)] - 1
+            volume = np.add.reduceat(self.volume.astype(np.uint64), starts)
+            self._resampled[period] = CompactCandles(
+                self.base_day, self.day_offsets[starts],  # כל נר מתוארך ליום המסחר הראשון שלו
+                self.open[starts],
+                np.maximum.reduceat(self.high, starts),
+                np.minimum.reduceat(self.low, starts),
+                self.close[ends],
+                np.minimum(volume, np.iinfo(np.uint32).max),
+                self.params
+            )
+        return self._resampled[period]
+
+    def for_interval(self, interval):
+        """הסדרה באינטרוול המבוקש: היומית עצמה, או שבועי/חודשי שנגזר ממנה"""
+        if interval == '1d':
+            return self
+        if interval not in RESAMPLE_PERIODS:
+            raise ValueError(f"Unsupported interval for daily candles: {interval}")
+        return self.resample(RESAMPLE_PERIODS[interval])
+
+    def to_frame(self, columns=()):
+        """DataFrame (float64) בפורמט של StockDataFetcher, עם עמודות אינדיקטורים לבקשה"""
+        data = {field: getattr(self, field).astype(np.float64) for field in self.PRICE_FIELDS}
+        data['volume'] = self.volume.astype(np.int64)
+        for name in columns:
+            data[name] = self.column(name).astype(np.float64)
+        df = pd.DataFrame(data, index=self.index)
+        df.index.name = 'timestamp'
+        return df
+
+
+class CandleStore:
+    """מטמון היסטוריה בזיכרון לכל (מניה, טווח, אינטרוול) - בייצוג הקומפקטי.
+    ttl חל בזמן מסחר; סדרה שנמשכה אחרי הסגירה תקפה עד הפתיחה הבאה"""
+
+    def __init__(self, fetcher, ttl=timedelta(minutes=5), params=None):
+        self.fetcher = fetcher
+        self.params = params
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, symbol, range='5y', interval='1d'):
+        if interval in RESAMPLE_PERIODS:
+            # שבועי/חודשי נגזרים מהסדרה היומית - בלי משיכה נוספת
+            daily = self.get(symbol, range, '1d')
+            return daily.for_interval(interval) if daily is not None else None
+        if interval != '1d':
+            # היסטים של ימים לא מחזיקים נרות תוך-יומיים (אלה ב-IntradayStore)
+            raise ValueError(f"Unsupported interval for daily candles: {interval}")
+        key = (symbol, range, interval)
+        entry = self._entries.get(key)
+        if entry and NYSE.is_fresh(entry[0], self.ttl):
+            cache_hit('candles')
+            return entry[1]
+        cache_miss('candles')
+
+        df = self.fetcher.get_stock_data(symbol, range=range, interval=interval)
+        if df is None or df.empty:
+            return None
+        candles = CompactCandles.from_frame(df, self.params)
+        with self._lock:
+            self._entries[key] = (datetime.now(), candles)
+        return candles
+
+    def get_many(self, symbols, range='5y', interval='1d', max_workers=8):
+        """שליפה מרוכזת לכמה מניות: מה שבמטמון מוחזר מיד, והחסרים נמשכים יחד במקביל"""
+        result = {}
+        missing = []
+        for symbol in symbols:
+            entry = self._entries.get((symbol, range, interval))
+            if entry and NYSE.is_fresh(entry[0], self.ttl):
+                cache_hit('candles')
+                result[symbol] = entry[1]
+            else:
+                missing.append(symbol)
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as pool:
+                for symbol, candles in zip(missing, pool.map(lambda s: self.get(s, range, interval), missing)):
+                    if candles is not None:
+                        result[symbol] = candles
+        return result
+
+    def get_frame(self, symbol, range='5y', interval='1d'):
+        candles = self.get(symbol, range, interval)
+        return candles.to_frame() if candles is not None else None
+
+    @property
+    def nbytes(self):
+        return sum(candles.nbytes for _, candles in list(self._entries.values()))
+
+    def __len__(self):
+        return len(self._entries)
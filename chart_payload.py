@@ -0,0 +1,84 @@
+"""פורמט עמודתי ל-chart_data (?format=columnar ב-/api/analyze וב-/api/chart), ופרמטרי הגרף מה-query string.
+
+בפורמט הרגיל כל נר חוזר על המפתחות t/o/h/l/c, ו-dates/prices משכפלים את אותם נתונים שוב.
+כאן כל סדרה היא מערך אחד:
+  t       - זמני הברים בשניות (epoch, שעון הבורסה כפי שמוצג), כברירת מחדל בקידוד דלתא:
+            t[0] מוחלט וכל השאר הפרש מהקודם (ברים יומיים -> 86400 שחוזר על עצמו ונדחס היטב)
+  open/high/low/close/sma_20/sma_50 - מערכי מספרים (null במקום NaN), או עם encoding=float32 -
+            base64 של Float32 little-endian (NaN נשמר), שנטען ישירות ל-Float32Array בדפדפן
+"""
+import base64
+
+import numpy as np
+import pandas as pd
+
+from stock_analyzer import is_intraday
+
+FORMATS = ('rows', 'columnar')
+ENCODINGS = ('json', 'float32')
+SERIES = ('open', 'high', 'low', 'close', 'sma_20', 'sma_50')
+# ?max_points=N - דילול הגרף (downsample.lttb); פחות מזה כבר לא גרף
+MIN_POINTS = 10
+
+
+def options(args):
+    """פרמטרי הפורמט מה-query string; ValueError על ערך לא נתמך (ה-route מחזיר 400)"""
+    fmt = args.get('format', 'rows')
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    encoding = args.get('encoding', 'json')
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unsupported encoding: {encoding}")
+    points = args.get('max_points')
+    if points:
+        try:
+            points = int(points)
+        except ValueError:
+            raise ValueError(f"Invalid max_points: {points}")
+        if points < MIN_POINTS:
+            raise ValueError(f"max_points must be at least {MIN_POINTS}")
+    return {"format": fmt, "encoding": encoding, "delta": args.get('delta', '1') != '0', "max_points": points or None}
+
+
+def _encode(values, encoding):
+    if encoding == 'float32':
+        return base64.b64encode(values.astype('<f4').tobytes()).decode('ascii')
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+def columnar(chart, interval='1d', encoding='json', delta=True):
+    """המרת chart_data רגיל (של _prepare_chart_data) למערכים מקבילים - dict חדש, המקור לא משתנה"""
+    candles = chart.get('candles') or []
+    n = len(candles)
+    ohlc = np.array([(c['o'], c['h'], c['l'], c['c']) for c in candles], dtype=np.float64).reshape(n, 4)
+    columns = dict(zip(SERIES, ohlc.T))
+    for name in ('sma_20', 'sma_50'):
+        values = chart.get(name) or []
+        # None (תחילת הסדרה לפני שהחלון התמלא) -> NaN
+        columns[name] = np.array(values, dtype=np.float64) if len(values) == n else np.full(n, np.nan)
+
+    times = pd.DatetimeIndex(pd.to_datetime(chart.get('dates') or [c['t'] for c in candles]))
+    t = times.as_unit('s').asi8
+    if delta and n:
+        t = np.diff(t, prepend=0)
+
+    payload = {
+        "format": "columnar",
+        "encoding": encoding,
+        "time": "delta" if delta else "absolute",
+        "intraday": is_intraday(interval),
+        "length": n,
+        "t": t.tolist(),
+        "support": chart.get('support'),
+        "resistance": chart.get('resistance')
+    }
+    for name, values in columns.items():
+        payload[name] = _encode(values, encoding)
+    return payload
+
+
+def render(chart, interval, opts):
+    """chart_data בפורמט שביקשו (rows מוחזר כמו שהוא)"""
+    if chart is None or opts["format"] == 'rows':
+        return chart
+    return columnar(chart, interval, opts["encoding"], opts["delta"])
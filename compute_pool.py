@@ -0,0 +1,108 @@
+"""הרצת שלב החישוב של analyze_stock (אינדיקטורים, סיכון, טקסט, גרף) בתהליכים נפרדים.
+
+ב-thread של בקשה החישוב רץ תחת ה-GIL, כך שניתוחים כבדים במקביל מתורים זה אחרי זה.
+כאן כל ניתוח רץ ב-worker משלו: הנרות (CompactCandles - כל המערכים ברוחב 4 בתים) נכתבים
+לבלוק shared memory אחד והתהליך ממפה אותם ישירות, בלי pickle של DataFrame.
+רק הפרמטרים הקטנים (overview, חדשות) והתוצאה עוברים ב-pipe.
+
+מופעל עם COMPUTE_WORKERS=<מספר תהליכים> (ברירת מחדל 0 - הכל ב-thread של הבקשה).
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from candles import CompactCandles
+
+# סדר המערכים בבלוק ה-shared memory; כולם 4 בתים לאיבר
+SHARED_FIELDS = (('day_offsets', np.int32), ('open', np.float32), ('high', np.float32),
+                 ('low', np.float32), ('close', np.float32), ('volume', np.uint32))
+
+# מופע חישוב בלבד של StockAnalysisSystem - אחד לכל תהליך worker
+_system = None
+
+
+def share_candles(candles):
+    """העתקת הנרות לבלוק shared memory חדש; מחזיר את הבלוק (באחריות הקורא לשחרר) ותיאור לצד השני"""
+    n = len(candles)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, 4 * n * len(SHARED_FIELDS)))
+    for i, (field, dtype) in enumerate(SHARED_FIELDS):
+        np.ndarray(n, dtype=dtype, buffer=shm.buf, offset=4 * n * i)[:] = getattr(candles, field)
+    return shm, {"name": shm.name, "length": n, "base_day": candles.base_day, "params": candles.params}
+
+
+def attach_candles(shm, spec):
+    """CompactCandles שהמערכים שלו הם views על הבלוק המשותף (בלי העתקה)"""
+    n = spec["length"]
+    arrays = [np.ndarray(n, dtype=dtype, buffer=shm.buf, offset=4 * n * i)
+              for i, (_, dtype) in enumerate(SHARED_FIELDS)]
+    return CompactCandles(spec["base_day"], *arrays, params=spec["params"])
+
+
+def _init_worker(config_path):
+    global _system
+    from logging_config import setup_logging
+    from stock_analyzer import StockAnalysisSystem
+    setup_logging()
+    _system = StockAnalysisSystem.compute_only(config_path)
+
+
+def _analyze(spec, symbol, interval, overview, fundamental_analysis, news, lang, max_points):
+    shm = shared_memory.SharedMemory(name=spec["name"])
+    try:
+        daily = attach_candles(shm, spec)
+        df = daily.for_interval(interval).to_frame()
+        return _system._analyze_frame(symbol, df, daily, interval, overview, fundamental_analysis, news, lang,
+                                      max_points)
+    finally:
+        # ה-views חייבים להשתחרר לפני close (אחרת BufferError)
+        daily = df = None
+        try:
+            shm.close()
+        except BufferError:
+            pass
+
+
+class ComputePool:
+    """Pool של תהליכים לשלב החישוב. נוצר בעצלתיים ובכל תהליך מחדש (בטוח אחרי fork של gunicorn),
+    ובשיטת spawn - כך שה-workers לא יורשים threads ונעילות מהתהליך של השרת"""
+
+    def __init__(self, workers, config_path='config.json'):
+        self.workers = workers
+        self.config_path = config_path
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is not None and self._pid == os.getpid():
+            return self._executor
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker, initargs=(self.config_path,)
+                )
+                self._pid = os.getpid()
+                atexit.register(self._executor.shutdown, wait=False, cancel_futures=True)
+        return self._executor
+
+    def analyze(self, daily, symbol, interval, overview, fundamental_analysis, news, lang='he', max_points=None):
+        """StockAnalysisSystem._analyze_frame בתהליך worker; הנרות היומיים עוברים ב-shared memory"""
+        shm, spec = share_candles(daily)
+        try:
+            future = self._get_executor().submit(_analyze, spec, symbol, interval, overview,
+                                                 fundamental_analysis, news, lang, max_points)
+            return future.result()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
@@ -0,0 +1,57 @@
+"""דילול ויזואלי של סדרות גרף ארוכות (5y יומי, 1y תוך-יומי) לכמות נקודות שהגרף באמת מצייר.
+
+Largest-Triangle-Three-Buckets לקו: הסדרה מחולקת לדליים שווים ומכל דלי נבחרת הנקודה
+שיוצרת את המשולש הגדול ביותר עם ממוצע הדלי הקודם וממוצע הדלי הבא - כך שיאים,
+שפלים ושינויי כיוון נשמרים (בניגוד לדגימה כל n ברים שמפספסת אותם).
+לנרות: נר אחד לכל דלי (פתיחה ראשונה, גבוה מקסימלי, נמוך מינימלי, סגירה אחרונה) -
+אותם דליים כמו של הקו, כך שכל הסדרות בגרף חולקות ציר זמן אחד.
+"""
+import numpy as np
+
+
+def lttb(y, threshold):
+    """אינדקסי הנקודות שנבחרו (threshold נקודות, כולל הראשונה והאחרונה) ותחילת כל דלי.
+    אם הסדרה לא ארוכה מ-threshold - כל הנקודות, כל אחת בדלי משלה"""
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        everything = np.arange(n)
+        return everything, everything
+
+    # הראשונה והאחרונה בדליים משלהן; האמצע מחולק ל-threshold-2 דליים (לא ריקים כי threshold < n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    starts = np.concatenate(([0], edges[:-1], [n - 1]))
+    ends = np.concatenate(([1], edges[1:], [n]))
+    # ממוצע כל דלי - מחושב מראש ב-reduceat אחד
+    valid = ~np.isnan(y)
+    sums = np.add.reduceat(np.where(valid, y, 0.0), starts)
+    counts = np.add.reduceat(valid, starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg_y = sums / counts
+    avg_x = (starts + ends - 1) / 2
+
+    # הקירוב הווקטורי המקובל: קודקוד המשולש הוא ממוצע הדלי הקודם (לא הנקודה שנבחרה בו),
+    # כך שהבחירות לא תלויות זו בזו וכל השטחים מחושבים בבת אחת
+    bucket = np.repeat(np.arange(threshold), ends - starts)
+    prev, nxt = np.maximum(bucket - 1, 0), np.minimum(bucket + 1, threshold - 1)
+    ax, ay, cx, cy = avg_x[prev], avg_y[prev], avg_x[nxt], avg_y[nxt]
+    x = np.arange(n)
+    # פעמיים שטח המשולש; NaN (בר חסר או דלי ריק) לא נבחר
+    area = np.abs((ax - cx) * (y - ay) - (ax - x) * (cy - ay))
+    area[np.isnan(area)] = -1.0
+    # argmax לכל דלי: הנקודה הראשונה שמגיעה למקסימום של הדלי שלה
+    best = np.maximum.reduceat(area, starts)
+    hits = np.flatnonzero(area == best[bucket])
+    selected = hits[np.searchsorted(hits, starts)]
+    return selected, starts
+
+
+def ohlc(open_, high, low, close, starts):
+    """נר אחד לכל דלי שמתחיל ב-starts (ממוין, starts[0] == 0)"""
+    ends = np.concatenate((starts[1:], [len(close)])) - 1
+    return (
+        np.asarray(open_)[starts],
+        np.fmax.reduceat(high, starts),
+        np.fmin.reduceat(low, starts),
+        np.asarray(close)[ends]
+    )
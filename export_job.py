@@ -0,0 +1,443 @@
+"""ייצוא הניתוח היומי (המלצה, סיכון, ביצועים ואינדיקטורים) של אלפי מניות ל-CSV או Parquet.
+
+היקום עובר בחבילות דרך שני שלבים:
+  1. משיכה (I/O) - thread רקע שמושך את הנרות של כל חבילה במקביל (לכל היותר --concurrency בקשות)
+     וציטוט אחד מרוכז לכל החבילה; לכל היותר --prefetch חבילות ממתינות בתור, כך שהזיכרון חסום.
+  2. חישוב וקטורי - כל החבילה כמטריצה אחת (ברים x מניות, מיושרת לבר האחרון) והכללים של
+     analyze_stock - בגרסאות הווקטוריות המשותפות (TechnicalAnalyzer.trend_codes, RiskAssessor.risk_levels...) -
+     מוחלים על כל העמודות יחד.
+
+כל חבילה נכתבת מיד לקובץ והקובץ checkpoint מתעדכן אחריה - ריצה שנקטעה ממשיכה עם --resume
+מהחבילה הראשונה שלא הושלמה. ב-CSV הקובץ נחתך חזרה לגודל שנרשם ב-checkpoint (שורות של חבילה
+שנכתבה חלקית לא מוכפלות); Parquet נכתב כתיקייה עם קובץ לכל חבילה (דורש pyarrow).
+
+שימוש:
+    python export_job.py --symbols-file universe.txt --output daily.csv
+    python export_job.py --symbols-file universe.txt --output daily.csv --resume
+    python export_job.py AAPL MSFT NVDA --format parquet --output daily_parquet
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import indicators
+from logging_config import setup_logging
+from stock_analyzer import (
+    StockDataFetcher, FundamentalAnalyzer, RecommendationEngine, RiskAssessor, TechnicalAnalyzer, SCAN_UNIVERSE,
+    annualization_factor, load_config
+)
+
+logger = logging.getLogger(__name__)
+
+# סדר העמודות בקובץ - קבוע, כדי שחבילות שנכתבות בריצות שונות יתאימו לכותרת
+COLUMNS = [
+    'symbol', 'name', 'sector', 'date', 'bars',
+    'price', 'change_pct', 'volume', 'high_52w', 'low_52w',
+    'sma_20', 'sma_50', 'sma_200', 'rsi', 'support', 'resistance',
+    'trend', 'momentum', 'fundamental_score', 'signal_strength',
+    'short_term', 'long_term', 'confidence',
+    'risk_level', 'volatility', 'volatility_ratio', 'strategy',
+    'perf_1d', 'perf_5d', 'perf_1m', 'perf_6m', 'perf_ytd', 'perf_1y', 'perf_5y',
+    'pe_ratio', 'beta', 'market_cap'
+]
+
+# תקופות הביצועים של _calculate_performance: עמודה -> ימים קלנדריים אחורה
+PERFORMANCE_DAYS = {'perf_1d': 1, 'perf_5d': 5, 'perf_1m': 30, 'perf_6m': 180, 'perf_1y': 365, 'perf_5y': 1825}
+
+# analyze_investment_strategy דורש 20 ברים
+STRATEGY_MIN_BARS = 20
+
+
+def read_universe(path):
+    """רשימת מניות מקובץ טקסט: מניה בכל שורה (או מופרדות בפסיקים), # להערות"""
+    symbols = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0]
+            symbols.extend(s.strip().upper() for s in line.split(',') if s.strip())
+    # בלי כפילויות ובלי לשנות את הסדר (החבילות נגזרות מהסדר)
+    return list(dict.fromkeys(symbols))
+
+
+def batches(symbols, size):
+    return [symbols[i:i + size] for i in range(0, len(symbols), size)]
+
+
+# --- שלב המשיכה ---
+
+def fetch_batch(fetcher, pool, symbols, range='5y'):
+    """נרות לכל מניה בחבילה (במקביל דרך ה-pool) וציטוט מרוכז אחד לכל החבילה"""
+    quotes = pool.submit(fetcher.get_batch_quotes, symbols)
+    frames = pool.map(lambda s: fetcher.get_stock_data(s, range=range), symbols)
+    frames = {s: df for s, df in zip(symbols, frames) if df is not None and len(df) > 1}
+    return frames, {q.get('symbol'): q for q in quotes.result() or []}
+
+
+def prefetch(fetcher, plan, range, concurrency, depth, stop):
+    """thread המשיכה: ממלא תור חסום ב-(מספר חבילה, מניות, נרות, ציטוטים); None מסמן סוף.
+    כשהחישוב מפגר - put נחסם והמשיכה ממתינה, כך שלכל היותר depth חבילות בזיכרון"""
+    out = queue.Queue(maxsize=max(1, depth))
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run():
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                for number, symbols in plan:
+                    if stop.is_set():
+                        return
+                    try:
+                        frames, quotes = fetch_batch(fetcher, pool, symbols, range)
+                    except Exception as e:
+                        logger.exception("❌ Fetch failed for batch %d: %s", number, e)
+                        frames, quotes = {}, {}
+                    if not put((number, symbols, frames, quotes)):
+                        return
+        finally:
+            put(None)
+
+    thread = threading.Thread(target=run, name="export-fetch", daemon=True)
+    thread.start()
+    return out, thread
+
+
+# --- שלב החישוב ---
+
+def _matrix(frames, symbols, column, length):
+    """עמודה מכל מניה כמטריצה (ברים x מניות) מיושרת לבר האחרון; ההתחלה של סדרות קצרות היא NaN"""
+    out = np.full((length, len(symbols)), np.nan)
+    for j, symbol in enumerate(symbols):
+        values = frames[symbol][column].to_numpy(dtype=np.float64)
+        out[length - len(values):, j] = values
+    return out
+
+
+def _nearest(stamps, targets):
+    """אינדקס הבר הקרוב ביותר ל-targets[j] בכל עמודה (כמו get_indexer(method='nearest'):
+    בשוויון - הבר המאוחר יותר). stamps הן ננו-שניות, NaN בריפוד"""
+    distance = np.abs(stamps - targets)
+    distance[np.isnan(distance)] = np.inf
+    length = len(stamps)
+    return length - 1 - np.argmin(distance[::-1], axis=0)
+
+
+def _window(frame, window, how):
+    """ערך rolling(window) בבר האחרון של כל עמודה - בלי לחשב את כל ההיסטוריה"""
+    if len(frame) < window:
+        return np.full(frame.shape[1], np.nan)
+    return getattr(frame.iloc[-window:], how)(skipna=False).to_numpy()
+
+
+def _number(value):
+    """ערך מספרי מהציטוט (או NaN)"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return np.nan
+    return value
+
+
+def compute_batch(frames, quotes, params=None, risk_thresholds=None):
+    """הניתוח היומי לכל המניות בחבילה בבת אחת, על הבר האחרון. הכללים עצמם (מגמה, מומנטום, המלצה,
+    סיכון ואסטרטגיה) הם הגרסאות הווקטוריות של TechnicalAnalyzer / RecommendationEngine / RiskAssessor
+    ש-analyze_stock משתמש בהן; test_export_job.py משווה את השורות מול analyze_stock"""
+    symbols = list(frames)
+    if not symbols:
+        return pd.DataFrame(columns=COLUMNS)
+    params = indicators.parameters(params)
+    thresholds = {**RiskAssessor.DEFAULT_THRESHOLDS, **(risk_thresholds or {})}
+
+    bars = np.array([len(frames[s]) for s in symbols])
+    length = int(bars.max())
+    close = pd.DataFrame(_matrix(frames, symbols, 'close', length))
+    high = pd.DataFrame(_matrix(frames, symbols, 'high', length))
+    low = pd.DataFrame(_matrix(frames, symbols, 'low', length))
+    volume = _matrix(frames, symbols, 'volume', length)[-1]
+    # זמני הברים בננו-שניות (האינדקס של get_stock_data הוא datetime64[s])
+    times = {s: pd.DataFrame({'t': frames[s].index.as_unit('ns').asi8}) for s in symbols}
+    stamps = _matrix(times, symbols, 't', length)
+
+    last = close.iloc[-1].to_numpy()
+    prev = close.iloc[-2].to_numpy()
+
+    # אינדיקטורים - רק החלון האחרון של כל עמודה נחוץ (הריפוד NaN נותן NaN כמו חלון לא מלא)
+    sma_20 = _window(close, params['sma_short'], 'mean')
+    sma_50 = _window(close, params['sma_long'], 'mean')
+    sma_200 = _window(close, 200, 'mean')
+    delta = close.diff()
+    gain = _window(delta.where(delta > 0, 0), params['rsi_period'], 'mean')
+    loss = _window(-delta.where(delta < 0, 0), params['rsi_period'], 'mean')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - (100 / (1 + gain / loss))
+    support = _window(low, 20, 'min')
+    resistance = _window(high, 20, 'max')
+    # calculate_indicators לא מחשב כלום מתחת ל-MIN_BARS ברים
+    short = bars < TechnicalAnalyzer.MIN_BARS
+    sma_20, sma_50, sma_200, rsi, support, resistance = (
+        np.where(short, np.nan, values) for values in (sma_20, sma_50, sma_200, rsi, support, resistance)
+    )
+
+    # מגמה, מומנטום והמלצה - אותם כללים וקטוריים ש-analyze_stock קורא להם
+    trend_codes = TechnicalAnalyzer.trend_codes(last, sma_20, sma_50, bars)
+    trend = TechnicalAnalyzer.names(TechnicalAnalyzer.TRENDS, trend_codes)
+    momentum = TechnicalAnalyzer.momentum_signals(rsi, params)
+    momentum[short] = "Unknown"
+
+    # ציון פונדמנטלי מהציטוט - אותו FundamentalAnalyzer, זול (מילון לכל מניה)
+    overviews = [StockDataFetcher.overview_from_quote(quotes.get(s, {}), s) for s in symbols]
+    analyzer = FundamentalAnalyzer()
+    fundamental = np.array([analyzer.analyze_fundamentals(o)["score"] for o in overviews])
+    recommendation = RecommendationEngine.recommendations(trend_codes, fundamental)
+
+    # סיכון ואסטרטגיה (assess_risk / analyze_investment_strategy) - תשואות יומיות לכל העמודות
+    returns = close / close.shift(1) - 1
+    annualize = annualization_factor('1d')
+    daily_vol = returns.std().to_numpy()
+    volatility = daily_vol * annualize
+    risk_level = RiskAssessor.risk_levels(daily_vol, thresholds)
+    # 20 הברים האחרונים = 19 תשואות (כמו pct_change על df.iloc[-20:])
+    recent_std = returns.iloc[-(STRATEGY_MIN_BARS - 1):].std(skipna=False).to_numpy() * annualize
+    with np.errstate(divide='ignore', invalid='ignore'):
+        volatility_ratio = np.where(volatility > 0, recent_std / volatility, 1.0)
+    keys = RiskAssessor.strategy_keys(volatility_ratio, risk_level, last > sma_200)
+    strategy = np.array([RiskAssessor.STRATEGY_LABELS[k] for k in keys], dtype=object)
+    strategy[bars < STRATEGY_MIN_BARS] = "N/A"
+    volatility_ratio[bars < STRATEGY_MIN_BARS] = np.nan
+
+    # ביצועים (_calculate_performance): הבר הקרוב ביותר לתאריך היעד בכל עמודה
+    columns = np.arange(len(symbols))
+    last_stamp = stamps[-1]
+    performance = {}
+    for column, days in PERFORMANCE_DAYS.items():
+        base = close.to_numpy()[_nearest(stamps, last_stamp - days * 86400e9), columns]
+        performance[column] = last / base - 1
+    year_start = np.array([pd.Timestamp(datetime(frames[s].index[-1].year, 1, 1)).value for s in symbols],
+                          dtype=np.float64)
+    base_ytd = close.to_numpy()[_nearest(stamps, year_start), columns]
+    performance['perf_ytd'] = last / base_ytd - 1
+
+    table = pd.DataFrame({
+        'symbol': symbols,
+        'name': [o['name'] for o in overviews],
+        'sector': [o['sector'] for o in overviews],
+        'date': [frames[s].index[-1].strftime('%Y-%m-%d') for s in symbols],
+        'bars': bars,
+        'price': last,
+        'change_pct': (last / prev - 1) * 100,
+        'volume': volume,
+        # כמו price_data של analyze_stock: שיא/שפל על כל ההיסטוריה שנמשכה (--range)
+        'high_52w': high.max().to_numpy(),
+        'low_52w': low.min().to_numpy(),
+        'sma_20': sma_20, 'sma_50': sma_50, 'sma_200': sma_200, 'rsi': rsi,
+        'support': support, 'resistance': resistance,
+        'trend': trend, 'momentum': momentum,
+        'fundamental_score': fundamental, 'signal_strength': recommendation["signal_strength"],
+        'short_term': recommendation["short_term"], 'long_term': recommendation["long_term"],
+        'confidence': recommendation["short_term_confidence"],
+        'risk_level': risk_level, 'volatility': volatility, 'volatility_ratio': volatility_ratio,
+        'strategy': strategy,
+        **performance,
+        'pe_ratio': [_number(o['pe_ratio']) for o in overviews],
+        'beta': [_number(o['beta']) for o in overviews],
+        'market_cap': [_number(o['market_cap']) for o in overviews]
+    })
+    return table[COLUMNS]
+
+
+# --- כתיבה ו-checkpoint ---
+
+class CsvSink:
+    """קובץ CSV אחד שגדל בחבילות; offset הוא גודל הקובץ אחרי החבילה האחרונה שהושלמה"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def open(self, offset=None):
+        if offset is None:
+            # ריצה חדשה
+            open(self.path, 'w').close()
+        elif os.path.exists(self.path):
+            # שורות של חבילה שנכתבה אחרי ה-checkpoint האחרון נחתכות
+            os.truncate(self.path, offset)
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def write(self, number, table):
+        header = os.path.getsize(self.path) == 0
+        with open(self.path, 'a', encoding='utf-8', newline='') as f:
+            table.to_csv(f, header=header, index=False, float_format='%.10g')
+            f.flush()
+            os.fsync(f.fileno())
+            return f.tell()
+
+
+class ParquetSink:
+    """תיקיית Parquet עם קובץ לכל חבילה (part-00000.parquet...) - pd.read_parquet(path) קורא את כולה"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def open(self, offset=None):
+        os.makedirs(self.path, exist_ok=True)
+        if offset is None:
+            for name in os.listdir(self.path):
+                if name.startswith('part-') and name.endswith('.parquet'):
+                    os.remove(os.path.join(self.path, name))
+        return None
+
+    def write(self, number, table):
+        target = os.path.join(self.path, f"part-{number:05d}.parquet")
+        # כתיבה לקובץ זמני והחלפה - קובץ חלקי לא נראה כחבילה שלמה
+        table.to_parquet(target + '.tmp', index=False)
+        os.replace(target + '.tmp', target)
+        return None
+
+
+class Checkpoint:
+    """מצב הריצה בקובץ JSON: החבילות שהושלמו, מניות שנכשלו וה-offset של הפלט.
+    נכתב אחרי כל חבילה (קובץ זמני + החלפה) ונקשר ליקום ולפרמטרים - resume עם יקום אחר נדחה"""
+
+    def __init__(self, path, job):
+        self.path = path
+        self.state = {"job": job, "completed": [], "failed": {}, "rows": 0, "offset": None}
+
+    @staticmethod
+    def job_key(symbols, batch_size, range, fmt):
+        digest = hashlib.sha1(",".join(symbols).encode()).hexdigest()
+        return {"universe": digest, "symbols": len(symbols), "batch_size": batch_size, "range": range, "format": fmt}
+
+    def load(self):
+        with open(self.path, encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get("job") != self.state["job"]:
+            raise ValueError(f"Checkpoint {self.path} belongs to a different job (universe or parameters changed)")
+        self.state = state
+
+    @property
+    def completed(self):
+        return set(self.state["completed"])
+
+    def commit(self, number, rows, failed, offset):
+        self.state["completed"].append(number)
+        self.state["rows"] += rows
+        self.state["failed"].update(failed)
+        self.state["offset"] = offset
+        self.state["updated"] = datetime.now().isoformat()
+        with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(self.path + '.tmp', self.path)
+
+
+def run_export(symbols, output, fmt='csv', range='5y', batch_size=100, concurrency=8, prefetch_depth=2,
+               checkpoint_path=None, resume=False, params=None, risk_thresholds=None, fetcher=None):
+    """הרצת הייצוא; מחזיר סיכום (חבילות, שורות, מניות שנכשלו, זמן)"""
+    fetcher = fetcher or StockDataFetcher()
+    sink = ParquetSink(output) if fmt == 'parquet' else CsvSink(output)
+    checkpoint = Checkpoint(checkpoint_path or f"{output.rstrip(os.sep)}.checkpoint.json",
+                            Checkpoint.job_key(symbols, batch_size, range, fmt))
+    if resume and os.path.exists(checkpoint.path):
+        checkpoint.load()
+        offset = sink.open(checkpoint.state["offset"] if checkpoint.state["completed"] else None)
+        logger.info("♻️ Resuming export: %d batches already done (%d rows)",
+                    len(checkpoint.completed), checkpoint.state["rows"])
+    else:
+        offset = sink.open()
+
+    done = checkpoint.completed
+    plan = [(n, batch) for n, batch in enumerate(batches(symbols, batch_size)) if n not in done]
+    total = len(done) + len(plan)
+    start = time.perf_counter()
+    stop = threading.Event()
+    fetched, thread = prefetch(fetcher, plan, range, concurrency, prefetch_depth, stop)
+    try:
+        while True:
+            item = fetched.get()
+            if item is None:
+                break
+            number, batch, frames, quotes = item
+            table = compute_batch(frames, quotes, params, risk_thresholds)
+            offset = sink.write(number, table)
+            failed = {s: "no data" for s in batch if s not in frames}
+            checkpoint.commit(number, len(table), failed, offset)
+            logger.info("📦 Batch %d/%d: %d rows, %d failed", len(checkpoint.completed), total, len(table), len(failed))
+    finally:
+        stop.set()
+        thread.join()
+
+    return {
+        "batches": len(checkpoint.completed),
+        "rows": checkpoint.state["rows"],
+        "failed": checkpoint.state["failed"],
+        "seconds": time.perf_counter() - start,
+        "output": output,
+        "checkpoint": checkpoint.path
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the daily analysis of a symbol universe to CSV/Parquet")
+    parser.add_argument("symbols", nargs="*", help="symbols to export (default: the scan universe)")
+    parser.add_argument("--symbols-file", help="text file with one symbol per line")
+    parser.add_argument("--output", default="daily_analysis.csv", help="CSV file, or a directory for parquet")
+    parser.add_argument("--format", choices=("csv", "parquet"), default="csv")
+    parser.add_argument("--range", default="5y", help="history range per symbol (5y matches /api/analyze)")
+    parser.add_argument("--batch-size", type=int, default=100, help="symbols per batch (and per checkpoint)")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent chart requests")
+    parser.add_argument("--prefetch", type=int, default=2, help="fetched batches allowed to wait for compute")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <output>.checkpoint.json)")
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint")
+    parser.add_argument("--config", default="config.json", help="analysis_parameters / risk_thresholds source")
+    args = parser.parse_args()
+
+    if args.format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("--format parquet requires pyarrow (pip install pyarrow)")
+
+    os.environ.setdefault('LOG_LEVEL', 'INFO')
+    setup_logging()
+
+    symbols = [s.upper() for s in args.symbols]
+    if args.symbols_file:
+        symbols = list(dict.fromkeys(symbols + read_universe(args.symbols_file)))
+    symbols = symbols or SCAN_UNIVERSE
+
+    config = load_config(args.config)
+    print(f"\n📤 Exporting {len(symbols)} symbols in batches of {args.batch_size} to {args.output}")
+    try:
+        report = run_export(
+            symbols, args.output, args.format, args.range, args.batch_size, args.concurrency, args.prefetch,
+            args.checkpoint, args.resume, config.get('analysis_parameters'), config.get('risk_thresholds')
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    except KeyboardInterrupt:
+        print("\n⏸️ Interrupted - rerun with --resume to continue from the last completed batch")
+        raise SystemExit(130)
+
+    rate = report["rows"] / report["seconds"] if report["seconds"] else 0
+    print(f"✅ {report['rows']} rows in {report['batches']} batches ({report['seconds']:.1f}s, {rate:.0f} symbols/s)")
+    if report["failed"]:
+        print(f"⚠️ {len(report['failed'])} symbols without data: {', '.join(sorted(report['failed'])[:20])}")
+    print(f"   checkpoint: {report['checkpoint']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import threading
+from datetime import datetime, timedelta
+
+from market_calendar import NYSE
+from metrics import cache_hit, cache_miss
+
+
+class FundamentalsStore:
+    """מטמון נתונים פונדמנטליים בשתי שכבות:
+    פרופיל חברה (שם, סקטור, תיאור) שכמעט לא משתנה - נשמר לימים,
+    ומדדי ציטוט (שווי שוק, מכפיל וכו') - נשמרים לזמן קצר בזמן מסחר ועד הפתיחה הבאה כשהשוק סגור,
+    והציון הפונדמנטלי מחושב פעם אחת בכל רענון"""
+
+    def __init__(self, fetcher, analyzer, profile_ttl=timedelta(days=3), metrics_ttl=timedelta(minutes=5)):
+        self.fetcher = fetcher
+        self.analyzer = analyzer
+        self.profile_ttl = profile_ttl
+        self.metrics_ttl = metrics_ttl
+        self._profiles = {}  # symbol -> (timestamp, profile)
+        self._metrics = {}   # symbol -> (timestamp, metrics, fundamental analysis)
+        self._lock = threading.Lock()
+
+    def _fresh(self, entry, ttl):
+        return entry is not None and datetime.now() - entry[0] < ttl
+
+    def _metrics_fresh(self, entry):
+        return entry is not None and NYSE.is_fresh(entry[0], self.metrics_ttl)
+
+    def _split(self, overview):
+        metric_keys = self.fetcher.METRIC_FIELDS
+        profile = {k: v for k, v in overview.items() if k not in metric_keys}
+        metrics = {k: v for k, v in overview.items() if k in metric_keys}
+        return profile, metrics
+
+    def _store_metrics(self, symbol, metrics):
+        # הציון מחושב כאן - פעם אחת לכל רענון, ולא בכל בקשת ניתוח
+        analysis = self.analyzer.analyze_fundamentals(metrics)
+        self._metrics[symbol] = (datetime.now(), metrics, analysis)
+        return analysis
+
+    def profile(self, symbol):
+        """הפרופיל השמור (גם אם ישן) - בלי משיכה; {} אם אין"""
+        entry = self._profiles.get(symbol)
+        return entry[1] if entry else {}
+
+    def get(self, symbol):
+        """החזרת (overview, fundamental_analysis) למניה - מהמטמון כשאפשר"""
+        profile_entry = self._profiles.get(symbol)
+        metrics_entry = self._metrics.get(symbol)
+        profile_fresh = self._fresh(profile_entry, self.profile_ttl)
+
+        if not profile_fresh:
+            cache_miss('fundamentals')
+            # רענון מלא - בקשת quote אחת מחזירה גם פרופיל וגם מדדים
+            overview = self.fetcher.get_company_overview(symbol)
+            profile, metrics = self._split(overview)
+            if not metrics:
+                # הבקשה נכשלה - לא שומרים במטמון, מחזירים את מה שיש
+                if profile_entry and metrics_entry:
+                    return {**profile_entry[1], **metrics_entry[1]}, metrics_entry[2]
+                return overview, self.analyzer.analyze_fundamentals(overview)
+            with self._lock:
+                self._profiles[symbol] = (datetime.now(), profile)
+                analysis = self._store_metrics(symbol, metrics)
+            return {**profile, **metrics}, analysis
+
+        if not self._metrics_fresh(metrics_entry):
+            cache_miss('fundamentals')
+            # הפרופיל עדיין תקף - מרעננים רק את המדדים דרך ה-batch הקל
+            self.update_from_quotes(self.fetcher.get_batch_quotes([symbol]))
+            metrics_entry = self._metrics.get(symbol)
+        else:
+            cache_hit('fundamentals')
+
+        return {**profile_entry[1], **metrics_entry[1]}, metrics_entry[2]
+
+    def update_from_quotes(self, quotes):
+        """עדכון מדדים (ופרופיל חסר) מתוך תוצאות get_batch_quotes"""
+        with self._lock:
+            for q in quotes:
+                symbol = q.get('symbol')
+                if not symbol:
+                    continue
+                previous = self._metrics.get(symbol)
+                metrics = dict(previous[1]) if previous else {k: 'N/A' for k in self.fetcher.METRIC_FIELDS}
+                # שדות שחסרים ב-batch נשארים מהרענון הקודם
+                for key, api_key in self.fetcher.METRIC_FIELDS.items():
+                    if api_key in q:
+                        metrics[key] = q[api_key]
+                self._store_metrics(symbol, metrics)
+
+                # פרופיל נלקח מה-batch רק אם יש בו את כל השדות (אחרת נחכה לבקשת quote מלאה)
+                has_profile = all(api_key in q for api_key in self.fetcher.PROFILE_FIELDS.values())
+                if has_profile and not self._fresh(self._profiles.get(symbol), self.profile_ttl):
+                    profile, _ = self._split(self.fetcher.overview_from_quote(q, symbol))
+                    self._profiles[symbol] = (datetime.now(), profile)
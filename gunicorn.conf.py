@@ -0,0 +1,36 @@
+"""הגדרות gunicorn (Procfile: gunicorn -c gunicorn.conf.py api_server:app).
+
+preload: המודולים (pandas, numpy, flask...) נטענים פעם אחת בתהליך הראשי ומשותפים ל-workers
+אחרי ה-fork (copy-on-write) - worker חדש עולה בלי לשלם שוב על ה-imports.
+השירותים עצמם (sessions, מטמונים, SQLite, threads ברקע) לא נבנים ב-import אלא ב-post_fork,
+בכל worker בנפרד, כך ששום חיבור או thread לא משותף בין תהליכים.
+
+worker_class: gthread - /api/alerts/stream (SSE) מחזיק חיבור פתוח לאורך כל חייו. ב-worker
+sync כל מנוי תופס worker שלם וחוסם את כל שאר הבקשות שלו (ו-timeout הורג אותו); ב-gthread כל
+חיבור תופס thread אחד מתוך threads, כך שבכל worker יכולים לרוץ במקביל עד threads חיבורים
+(streams + בקשות רגילות). השירותים כבר בטוחים ל-threads (נעילות, SingleFlight).
+
+כמה workers (WEB_CONCURRENCY): מצב שחייב להיות משותף לכולם נמצא ב-SQLite - רשימות מעקב
+(WATCHLIST_DB) והתראות (ALERTS_DB: כללים, התראות שנורו ומחיר הייחוס). רק worker אחד מושך
+ציטוטים ובודק כללים (lease ב-ALERTS_DB; אם הוא נופל worker אחר ממשיך), וה-streams בכל worker
+קוראים את ההתראות מהקובץ. שאר המטמונים (נרות, ציטוטים, ניתוחים) פרטיים לכל worker.
+
+משתני סביבה:
+    GUNICORN_PRELOAD=0        כיבוי ה-preload (למשל כדי ש---reload יעבוד בפיתוח)
+    WARM_SERVICES=0           בניית השירותים בבקשה הראשונה במקום מיד אחרי ה-fork
+    GUNICORN_WORKER_CLASS     ברירת מחדל gthread
+    GUNICORN_THREADS=16       threads לכל worker - תקרת ה-streams והבקשות המקבילות בכל worker
+"""
+import os
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+
+
+def post_fork(server, worker):
+    if os.environ.get('WARM_SERVICES', '1') != '1':
+        return
+    import api_server
+    api_server.init_services()
+    server.log.info("Worker %s: services initialized", worker.pid)
@@ -0,0 +1,142 @@
+import pandas as pd
+
+# רישום האינדיקטורים: שם עמודה -> (עמודות קלט, פונקציית חישוב)
+INDICATORS = {}
+
+# ערכי ברירת מחדל לפרמטרים - נדרסים ע"י analysis_parameters ב-config.json.
+# שמות העמודות sma_20/sma_50 נשמרים (הם מפתחות ב-API) גם כשהחלונות בפועל שונים
+DEFAULT_PARAMETERS = {
+    'sma_short': 20,
+    'sma_long': 50,
+    'rsi_period': 14,
+    'rsi_oversold': 30,
+    'rsi_overbought': 70,
+    'macd_fast': 12,
+    'macd_slow': 26,
+    'macd_signal': 9
+}
+
+
+def parameters(overrides=None):
+    """פרמטרי ברירת המחדל, מעודכנים לפי מילון (למשל analysis_parameters מה-config)"""
+    params = dict(DEFAULT_PARAMETERS)
+    params.update(overrides or {})
+    return params
+
+
+def indicator(name, inputs=('close',)):
+    """דקורטור לרישום אינדיקטור יחד עם העמודות שהוא תלוי בהן"""
+    def register(func):
+        INDICATORS[name] = (tuple(inputs), func)
+        return func
+    return register
+
+
+def ensure(df, *names, params=None):
+    """חישוב עמודות האינדיקטורים המבוקשות (והתלויות שלהן) רק אם עוד לא קיימות ב-df"""
+    params = params or DEFAULT_PARAMETERS
+    for name in names:
+        if name in df.columns:
+            continue
+        if name not in INDICATORS:
+            raise KeyError(f"Unknown indicator: {name}")
+        inputs, func = INDICATORS[name]
+        ensure(df, *inputs, params=params)
+        df[name] = func(df, params)
+    return df
+
+
+# --- ממוצעים נעים ---
+@indicator('sma_20')
+def _sma_20(df, p):
+    return df['close'].rolling(window=p['sma_short']).mean()
+
+@indicator('sma_50')
+def _sma_50(df, p):
+    return df['close'].rolling(window=p['sma_long']).mean()
+
+@indicator('sma_200')
+def _sma_200(df, p):
+    return df['close'].rolling(window=200).mean()
+
+# --- RSI ---
+@indicator('rsi')
+def _rsi(df, p):
+    delta = df['close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=p['rsi_period']).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=p['rsi_period']).mean()
+    rs = gain / loss
+    return 100 - (100 / (1 + rs))
+
+# --- MACD (פשוט) ---
+@indicator('macd')
+def _macd(df, p):
+    exp1 = df['close'].ewm(span=p['macd_fast'], adjust=False).mean()
+    exp2 = df['close'].ewm(span=p['macd_slow'], adjust=False).mean()
+    return exp1 - exp2
+
+@indicator('macd_signal', inputs=('macd',))
+def _macd_signal(df, p):
+    return df['macd'].ewm(span=p['macd_signal'], adjust=False).mean()
+
+@indicator('macd_diff', inputs=('macd', 'macd_signal'))
+def _macd_diff(df, p):
+    return df['macd'] - df['macd_signal']
+
+# --- רמות תמיכה והתנגדות בסיסיות (פיבוט) ---
+@indicator('pivot', inputs=('high', 'low', 'close'))
+def _pivot(df, p):
+    return (df['high'] + df['low'] + df['close']) / 3
+
+@indicator('r1', inputs=('pivot', 'low'))
+def _r1(df, p):
+    return 2 * df['pivot'] - df['low']
+
+@indicator('s1', inputs=('pivot', 'high'))
+def _s1(df, p):
+    return 2 * df['pivot'] - df['high']
+
+# --- רמות "קיר" (התנגדות) ו"רצפה" (תמיכה) חזקות ---
+@indicator('resistance_level', inputs=('high',))
+def _resistance_level(df, p):
+    return df['high'].rolling(window=20).max()
+
+@indicator('support_level', inputs=('low',))
+def _support_level(df, p):
+    return df['low'].rolling(window=20).min()
+
+# --- אינדיקטורים מספריית ta (מחושבים רק כשמישהו מבקש אותם; גם ה-import של ta נדחה עד אז) ---
+@indicator('ema_20')
+def _ema_20(df, p):
+    from ta.trend import EMAIndicator
+    return EMAIndicator(df['close'], window=20).ema_indicator()
+
+@indicator('bb_high')
+def _bb_high(df, p):
+    from ta.volatility import BollingerBands
+    return BollingerBands(df['close'], window=20, window_dev=2).bollinger_hband()
+
+@indicator('bb_low')
+def _bb_low(df, p):
+    from ta.volatility import BollingerBands
+    return BollingerBands(df['close'], window=20, window_dev=2).bollinger_lband()
+
+@indicator('bb_width', inputs=('bb_high', 'bb_low', 'sma_20'))
+def _bb_width(df, p):
+    return (df['bb_high'] - df['bb_low']) / df['sma_20']
+
+
+class ColumnSource:
+    """מתאם שמאפשר להריץ את פונקציות האינדיקטורים על מקור שאינו DataFrame (למשל CompactCandles)"""
+
+    def __init__(self, get_column):
+        self._get_column = get_column
+
+    def __getitem__(self, name):
+        return pd.Series(self._get_column(name), dtype='float64')
+
+
+def compute(name, get_column, params=None):
+    """חישוב אינדיקטור בודד מעל מקור עמודות כללי (התלויות נשלפות דרך get_column)"""
+    _, func = INDICATORS[name]
+    return func(ColumnSource(get_column), params or DEFAULT_PARAMETERS).to_numpy()
@@ -0,0 +1,111 @@
+"""לוגים מובנים: רמות, מזהה בקשה (correlation id) לכל שורה, וכתיבה לא חוסמת דרך תור.
+
+setup_logging() מחבר ל-root logger רק QueueHandler - הכתיבה ל-stdout נעשית ב-thread נפרד
+(QueueListener), כך ש-thread של בקשה אף פעם לא מחכה ל-I/O. עם LOG_LEVEL=WARNING קריאות
+logger.debug/info בנתיב החם נעצרות בבדיקת הרמה, בלי עיצוב ההודעה.
+
+משתני סביבה:
+    LOG_LEVEL   DEBUG / INFO / WARNING / ERROR (ברירת מחדל INFO)
+    LOG_FORMAT  text / json (ברירת מחדל text)
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import uuid
+from datetime import datetime, timezone
+
+# מזהה הבקשה הנוכחית (נקבע ב-before_request של ה-API); '-' מחוץ לבקשה
+request_id = contextvars.ContextVar('request_id', default='-')
+
+TEXT_FORMAT = '%(asctime)s %(levelname)-7s [%(request_id)s] %(name)s: %(message)s'
+
+_listener = None
+_listener_pid = None
+_lock = threading.Lock()
+
+
+def new_request_id(incoming=None):
+    """מזהה לבקשה: מה שהגיע ב-X-Request-ID (אם סביר) או מזהה חדש קצר"""
+    if incoming and len(incoming) <= 64 and incoming.isprintable():
+        return incoming
+    return uuid.uuid4().hex[:16]
+
+
+class RequestIdFilter(logging.Filter):
+    """מוסיף request_id לכל רשומה - רץ ב-thread של הבקשה, לפני שהרשומה נכנסת לתור"""
+
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """שורת JSON אחת לכל רשומה (לאיסוף לוגים מרוכז)"""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, 'request_id', '-'),
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler שמוודא שה-listener חי בתהליך הנוכחי (threads לא שורדים fork של gunicorn)"""
+
+    def emit(self, record):
+        _start_listener(self.queue)
+        super().emit(record)
+
+
+def _formatter(fmt):
+    return JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT)
+
+
+def _start_listener(log_queue):
+    global _listener, _listener_pid
+    if _listener_pid == os.getpid():
+        return
+    with _lock:
+        if _listener_pid == os.getpid():
+            return
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(_formatter(os.environ.get('LOG_FORMAT', 'text').lower()))
+        _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=False)
+        _listener.start()
+        _listener_pid = os.getpid()
+
+
+def setup_logging(level=None, fmt=None):
+    """הגדרת ה-root logger (פעם אחת); קריאה נוספת רק מעדכנת את הרמה"""
+    level = (level or os.environ.get('LOG_LEVEL', 'INFO')).upper()
+    if fmt:
+        os.environ['LOG_FORMAT'] = fmt
+    root = logging.getLogger()
+    root.setLevel(level)
+    if any(isinstance(h, _QueueHandler) for h in root.handlers):
+        return
+    handler = _QueueHandler(queue.SimpleQueue())
+    handler.addFilter(RequestIdFilter())
+    root.addHandler(handler)
+    atexit.register(shutdown)
+
+
+def shutdown():
+    """ריקון התור לפני יציאה (ל-CLI ולבדיקות)"""
+    global _listener, _listener_pid
+    with _lock:
+        if _listener is not None and _listener_pid == os.getpid():
+            _listener.stop()
+        _listener, _listener_pid = None, None
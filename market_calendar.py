@@ -0,0 +1,187 @@
+"""לוח המסחר של NYSE: ימי מסחר, חגים, ימים מקוצרים ושעות טרום/אחרי מסחר.
+
+משמש את המטמונים ואת עבודות הרקע: בזמן מסחר נתון מתיישן מהר (ttl קצר), ואחרי הסגירה
+הוא תקף עד הפתיחה הבאה - נתונים של סוף שבוע או חג לא משתנים, אז אין טעם למשוך אותם שוב.
+"""
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+PRE_MARKET_OPEN = time(4, 0)
+REGULAR_OPEN = time(9, 30)
+REGULAR_CLOSE = time(16, 0)
+EARLY_CLOSE = time(13, 0)
+# אחרי המסחר: 4 שעות אחרי הסגירה (20:00 ביום רגיל, 17:00 ביום מקוצר)
+POST_MARKET_HOURS = timedelta(hours=4)
+# נתונים שנמשכו בדקות הראשונות אחרי הסגירה עוד עלולים לא לכלול את מחיר הסגירה הסופי
+SETTLE = timedelta(minutes=5)
+
+
+def _easter(year):
+    """יום ראשון של פסחא (האלגוריתם הגרגוריאני האנונימי)"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = (h + l - 7 * m + 114) % 31 + 1
+    return date(year, month, day)
+
+
+def _nth_weekday(year, month, weekday, n):
+    """היום ה-n (1..) מסוג weekday בחודש; n=-1 הוא האחרון"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(day):
+    """חג שחל בשבת נחגג ביום שישי שלפניו, ובראשון - ביום שני שאחריו"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+class MarketCalendar:
+    def __init__(self, tz='America/New_York'):
+        self.tz = ZoneInfo(tz)
+
+    @lru_cache(maxsize=16)
+    def holidays(self, year):
+        """תאריך -> שם החג (ימים שבהם הבורסה סגורה)"""
+        days = {
+            _nth_weekday(year, 1, 0, 3): "Martin Luther King Jr. Day",
+            _nth_weekday(year, 2, 0, 3): "Washington's Birthday",
+            _easter(year) - timedelta(days=2): "Good Friday",
+            _nth_weekday(year, 5, 0, -1): "Memorial Day",
+            _observed(date(year, 7, 4)): "Independence Day",
+            _nth_weekday(year, 9, 0, 1): "Labor Day",
+            _nth_weekday(year, 11, 3, 4): "Thanksgiving Day",
+            _observed(date(year, 12, 25)): "Christmas Day"
+        }
+        # ראש השנה שחל בשבת לא נחגג ביום שישי (31 בדצמבר נשאר יום מסחר)
+        new_year = date(year, 1, 1)
+        if new_year.weekday() != 5:
+            days[_observed(new_year)] = "New Year's Day"
+        if year >= 2022:
+            days[_observed(date(year, 6, 19))] = "Juneteenth"
+        return days
+
+    @lru_cache(maxsize=16)
+    def early_closes(self, year):
+        """ימים שבהם המסחר נסגר ב-13:00"""
+        days = {_nth_weekday(year, 11, 3, 4) + timedelta(days=1)}  # יום שישי אחרי Thanksgiving
+        for day in (date(year, 7, 3), date(year, 12, 24)):
+            if day.weekday() < 5 and day not in self.holidays(year):
+                days.add(day)
+        return days
+
+    def is_trading_day(self, day):
+        return day.weekday() < 5 and day not in self.holidays(day.year)
+
+    def _local(self, when=None):
+        """זמן בשעון הבורסה; datetime נאיבי נחשב כשעה המקומית של השרת (כמו datetime.now())"""
+        if when is None:
+            return datetime.now(self.tz)
+        return when.astimezone(self.tz)
+
+    def _at(self, day, t):
+        return datetime.combine(day, t, tzinfo=self.tz)
+
+    def close_time(self, day):
+        return EARLY_CLOSE if day in self.early_closes(day.year) else REGULAR_CLOSE
+
+    def session(self, when=None):
+        """'pre' / 'regular' / 'post' / 'closed'"""
+        now = self._local(when)
+        day = now.date()
+        if not self.is_trading_day(day):
+            return 'closed'
+        close = self._at(day, self.close_time(day))
+        if self._at(day, REGULAR_OPEN) <= now < close:
+            return 'regular'
+        if self._at(day, PRE_MARKET_OPEN) <= now < self._at(day, REGULAR_OPEN):
+            return 'pre'
+        if close <= now < close + POST_MARKET_HOURS:
+            return 'post'
+        return 'closed'
+
+    def is_open(self, when=None):
+        return self.session(when) == 'regular'
+
+    def next_open(self, when=None):
+        """פתיחת המסחר הרגיל הבאה (אחרי when)"""
+        now = self._local(when)
+        day = now.date()
+        if self.is_trading_day(day) and now < self._at(day, REGULAR_OPEN):
+            return self._at(day, REGULAR_OPEN)
+        day += timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return self._at(day, REGULAR_OPEN)
+
+    def next_close(self, when=None):
+        """סגירת המסחר הרגיל הבאה - של היום אם המסחר עוד לא נסגר"""
+        now = self._local(when)
+        day = now.date()
+        if self.is_trading_day(day) and now < self._at(day, self.close_time(day)):
+            return self._at(day, self.close_time(day))
+        day = self.next_open(now).date()
+        return self._at(day, self.close_time(day))
+
+    def last_close(self, when=None):
+        """הסגירה האחרונה שכבר התרחשה (עד when)"""
+        now = self._local(when)
+        day = now.date()
+        if not (self.is_trading_day(day) and now >= self._at(day, self.close_time(day))):
+            day -= timedelta(days=1)
+            while not self.is_trading_day(day):
+                day -= timedelta(days=1)
+        return self._at(day, self.close_time(day))
+
+    def expires_at(self, fetched_at, ttl, closed_ttl=None):
+        """עד מתי נתון שנמשך ב-fetched_at תקף: ttl בזמן מסחר (ולא אחרי הסגירה), ואחרי הסגירה -
+        עד הפתיחה הבאה (או closed_ttl אם הוא קצר יותר, לנתונים שמתעדכנים גם כשהבורסה סגורה)"""
+        fetched = self._local(fetched_at)
+        if self.is_open(fetched):
+            return min(fetched + ttl, self.next_close(fetched) + SETTLE)
+        settled = self.last_close(fetched) + SETTLE
+        if fetched < settled:
+            # נמשך רגע אחרי הסגירה - עוד משיכה אחת כשמחיר הסגירה סופי
+            return settled
+        expires = self.next_open(fetched)
+        return min(expires, fetched + closed_ttl) if closed_ttl is not None else expires
+
+    def is_fresh(self, fetched_at, ttl, closed_ttl=None, now=None):
+        return self._local(now) < self.expires_at(fetched_at, ttl, closed_ttl)
+
+    def refresh_interval(self, seconds, closed_seconds=3600):
+        """מרווח לעבודת רקע: seconds בזמן מסחר; כשסגור - עד הפתיחה הבאה, ולכל היותר closed_seconds"""
+        now = self._local()
+        if self.is_open(now):
+            return seconds
+        until_open = (self.next_open(now) - now).total_seconds()
+        return max(seconds, min(until_open, closed_seconds))
+
+    def status(self, when=None):
+        now = self._local(when)
+        return {
+            "session": self.session(now),
+            "is_open": self.is_open(now),
+            "holiday": self.holidays(now.year).get(now.date()),
+            "next_open": self.next_open(now).isoformat(),
+            "next_close": self.next_close(now).isoformat(),
+            "time": now.isoformat()
+        }
+
+
+# לוח המסחר שכל המטמונים ועבודות הרקע משתמשים בו
+NYSE = MarketCalendar()
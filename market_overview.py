@@ -0,0 +1,119 @@
+import logging
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from market_calendar import NYSE
+
+logger = logging.getLogger(__name__)
+
+
+def sector_heatmap(results):
+    """מדדי סקטורים מתוצאות הסריקה: שינוי ממוצע/חציוני, רוחב שוק ועולות/יורדות - groupby אחד על כל היקום"""
+    df = pd.DataFrame(results, columns=['symbol', 'sector', 'change', 'score'])
+    if df.empty:
+        return [], {}
+    df['sector'] = df['sector'].where(df['sector'].notna() & (df['sector'] != 'N/A'), 'Unknown')
+    df['change'] = pd.to_numeric(df['change'], errors='coerce')
+    df['advancing'] = df['change'] > 0
+    df['declining'] = df['change'] < 0
+
+    grouped = df.groupby('sector')
+    stats = grouped.agg(
+        count=('symbol', 'size'),
+        avg_change=('change', 'mean'),
+        median_change=('change', 'median'),
+        advancers=('advancing', 'sum'),
+        decliners=('declining', 'sum'),
+        avg_score=('score', 'mean')
+    )
+    stats['unchanged'] = stats['count'] - stats['advancers'] - stats['decliners']
+    stats['breadth'] = (stats['advancers'] - stats['decliners']) / stats['count']
+
+    # המניה החזקה והחלשה בכל סקטור
+    ranked = df.dropna(subset=['change']).sort_values('change')
+    worst = ranked.groupby('sector')[['symbol', 'change']].first()
+    best = ranked.groupby('sector')[['symbol', 'change']].last()
+
+    sectors = []
+    for sector, row in stats.sort_values('avg_change', ascending=False).iterrows():
+        sectors.append({
+            "sector": sector,
+            "count": int(row['count']),
+            "avg_change": _number(row['avg_change']),
+            "median_change": _number(row['median_change']),
+            "advancers": int(row['advancers']),
+            "decliners": int(row['decliners']),
+            "unchanged": int(row['unchanged']),
+            "breadth": _number(row['breadth']),
+            "avg_score": _number(row['avg_score']),
+            "best": _member(best, sector),
+            "worst": _member(worst, sector)
+        })
+
+    advancers, decliners = int(df['advancing'].sum()), int(df['declining'].sum())
+    market = {
+        "count": len(df),
+        "avg_change": _number(df['change'].mean()),
+        "advancers": advancers,
+        "decliners": decliners,
+        "unchanged": len(df) - advancers - decliners,
+        "breadth": (advancers - decliners) / len(df)
+    }
+    return sectors, market
+
+
+def _number(value):
+    return float(value) if value is not None and np.isfinite(value) else None
+
+
+def _member(frame, sector):
+    if sector not in frame.index:
+        return None
+    row = frame.loc[sector]
+    return {"symbol": row['symbol'], "change": _number(row['change'])}
+
+
+class MarketOverview:
+    """סקירת שוק ל-/api/market: מדדים (get_market_summary) ומפת חום של סקטורים מהסריקה האחרונה.
+    נבנית רק בעבודת רקע - בקשות מקבלות את התמונה האחרונה (או None עד הבנייה הראשונה)"""
+
+    def __init__(self, analyzer, scheduler, every=300):
+        self.analyzer = analyzer
+        self._snapshot = None
+        self._lock = threading.Lock()
+        # בזמן מסחר כל every שניות; כשהשוק סגור - עד הפתיחה הבאה (לכל היותר שעה)
+        scheduler.add_job("market", self.refresh, every=lambda: NYSE.refresh_interval(every))
+
+    def refresh(self):
+        # הסריקה מהמטמון שלה - נמשכת מחדש רק כשהתוצאות התיישנו
+        results = self.analyzer.scan_market_cached()
+        sectors, market = sector_heatmap(results)
+        summary = self.analyzer.fetcher.get_market_summary()
+        if isinstance(summary, dict) and 'indices' in summary:
+            summary = summary['indices']
+        previous = self._snapshot
+        if summary is None and previous is not None:
+            # כשל זמני במשיכת המדדים - נשארים עם האחרונים שהצלחנו למשוך
+            summary = previous["indices"]
+
+        snapshot = {
+            "indices": summary,
+            "sectors": sectors,
+            "market": market,
+            "status": NYSE.status(),
+            "scan_time": self.analyzer.scan_timestamp.isoformat() if self.analyzer.scan_timestamp else None,
+            "updated": datetime.now().isoformat()
+        }
+        with self._lock:
+            self._snapshot = snapshot
+        logger.debug("Market overview refreshed: %d sectors", len(sectors))
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        # מצב השוק (פתוח/סגור) מחושב לכל בקשה - זול ולא תלוי ברענון
+        return {**snapshot, "status": NYSE.status()}
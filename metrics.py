@@ -0,0 +1,154 @@
+"""מדידת זמנים ומטריקות בפורמט Prometheus (בלי תלות חיצונית).
+
+span('stage') מודד שלב ורושם אותו בהיסטוגרמה; cache_hit / cache_miss סופרים פגיעות במטמונים;
+render() מחזיר את כל המטריקות בפורמט הטקסט של Prometheus עבור /metrics.
+"""
+import cProfile
+import contextvars
+import io
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+# גבולות ה-buckets בשניות (מ-1ms ועד 30s)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# השלבים שנמדדו בבקשה הנוכחית (ל-Server-Timing ול-?profile=1)
+_request_spans = contextvars.ContextVar('request_spans', default=None)
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{str(v)}"' for k, v in labels) + '}'
+
+
+class Histogram:
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{_labels(key + (("le", bound),))} {count}')
+                lines.append(f'{self.name}_bucket{_labels(key + (("le", "+Inf"),))} {series[-1]}')
+                lines.append(f'{self.name}_sum{_labels(key)} {series[-2]}')
+                lines.append(f'{self.name}_count{_labels(key)} {series[-1]}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for key, value in sorted(self.values().items()):
+            lines.append(f'{self.name}{_labels(key)} {value}')
+        return lines
+
+
+STAGE_SECONDS = Histogram('stock_stage_duration_seconds', 'Duration of analysis and scan stages')
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'HTTP request latency by endpoint')
+CACHE_REQUESTS = Counter('cache_requests_total', 'Cache lookups by cache and result (hit/miss)')
+
+
+@contextmanager
+def span(stage):
+    """מדידת שלב: נרשם בהיסטוגרמה, ובבקשה הנוכחית גם לרשימת השלבים שלה"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((stage, elapsed))
+
+
+def cache_hit(cache, count=1):
+    CACHE_REQUESTS.inc(count, cache=cache, result='hit')
+
+
+def cache_miss(cache, count=1):
+    CACHE_REQUESTS.inc(count, cache=cache, result='miss')
+
+
+def start_request():
+    """תחילת בקשה: רשימת שלבים חדשה לבקשה הזו; מחזיר token לסיום"""
+    return _request_spans.set([]), time.perf_counter()
+
+
+def finish_request(token, endpoint, method, status):
+    """סיום בקשה: רישום זמן הבקשה; מחזיר את השלבים שנמדדו בה"""
+    spans_token, start = token
+    REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, method=method, status=status)
+    spans = _request_spans.get() or []
+    _request_spans.reset(spans_token)
+    return spans
+
+
+def server_timing(spans):
+    """ערך ל-header של Server-Timing (מוצג ב-DevTools של הדפדפן)"""
+    totals = {}
+    for stage, seconds in spans:
+        totals[stage] = totals.get(stage, 0) + seconds
+    return ', '.join(f'{stage.replace(".", "_")};dur={seconds * 1000:.1f}' for stage, seconds in totals.items())
+
+
+class RequestProfiler:
+    """פרופיילר לבקשה בודדת (cProfile על ה-thread של הבקשה)"""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def report(self, limit=30):
+        self.profile.disable()
+        out = io.StringIO()
+        pstats.Stats(self.profile, stream=out).sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+
+
+def render():
+    lines = STAGE_SECONDS.render() + REQUEST_SECONDS.render() + CACHE_REQUESTS.render()
+    # יחס פגיעות מחושב מראש לכל מטמון (נוח לגרפים בלי PromQL)
+    totals = {}
+    for key, value in CACHE_REQUESTS.values().items():
+        labels = dict(key)
+        hits, total = totals.get(labels['cache'], (0, 0))
+        totals[labels['cache']] = (hits + (value if labels['result'] == 'hit' else 0), total + value)
+    lines += ['# HELP cache_hit_ratio Cache hits / lookups since start', '# TYPE cache_hit_ratio gauge']
+    for cache, (hits, total) in sorted(totals.items()):
+        lines.append(f'cache_hit_ratio{_labels((("cache", cache),))} {hits / total if total else 0}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,257 @@
+"""שרת מקומי שמחליף את finance-query.com לבנצ'מרקים ולבדיקות - בלי רשת ובאופן שחוזר על עצמו.
+
+מגיש payloads מוקלטים (chart / quote / quotes / news / market) מתיקיית fixtures,
+עם השהיה ו-jitter שניתנים להגדרה כדי לדמות את ה-API האמיתי.
+
+שימוש:
+    python mock_finance_query.py synthesize                 (fixtures סינתטיים דטרמיניסטיים ליקום הסריקה)
+    python mock_finance_query.py record AAPL MSFT NVDA      (הקלטה מה-API האמיתי)
+    python mock_finance_query.py serve --port 8765 --latency 80 --jitter 30
+    FINANCE_QUERY_URL=http://127.0.0.1:8765/v2 python api_server.py
+"""
+import argparse
+import calendar
+import json
+import os
+import random
+import threading
+import time
+import zlib
+
+import numpy as np
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+DEFAULT_FIXTURES = 'bench_fixtures'
+# נקודת הזמן של הנר האחרון ב-fixtures הסינתטיים (קבועה - כדי שכל ריצה תהיה זהה)
+SYNTHETIC_END = 1760054400  # 2025-10-10
+SECTORS = ['Technology', 'Healthcare', 'Financial Services', 'Consumer Defensive', 'Energy', 'Communication Services']
+
+# טווח -> כמה ימים קלנדריים אחורה (או כמה נרות אחרונים לטווח בימים)
+RANGE_DAYS = {'1mo': 31, '3mo': 92, '6mo': 183, 'ytd': None, '1y': 366, '2y': 731, '5y': 1827}
+RANGE_BARS = {'1d': 1, '5d': 5}
+
+
+def _seed(symbol):
+    return zlib.crc32(symbol.encode())
+
+
+def synthetic_chart(symbol, bars=1260):
+    """5 שנים של נרות יומיים (ימי חול בלבד) מ-random walk דטרמיניסטי לכל מניה"""
+    rng = np.random.default_rng(_seed(symbol))
+    days = []
+    day = SYNTHETIC_END // 86400
+    while len(days) < bars:
+        if (day + 3) % 7 < 5:  # 1970-01-01 היה יום חמישי
+            days.append(day)
+        day -= 1
+    days.reverse()
+    close = rng.uniform(20, 400) * np.exp(np.cumsum(rng.normal(0.0004, rng.uniform(0.01, 0.03), bars)))
+    open_ = close * (1 + rng.normal(0, 0.005, bars))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.008, bars)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.008, bars)))
+    volume = rng.integers(500_000, 50_000_000, bars)
+    return {"candles": [
+        {"timestamp": int(d * 86400 + 14 * 3600 + 1800), "open": round(float(o), 4), "high": round(float(h), 4),
+         "low": round(float(l), 4), "close": round(float(c), 4), "volume": int(v)}
+        for d, o, h, l, c, v in zip(days, open_, high, low, close, volume)
+    ]}
+
+
+def synthetic_quote(symbol, chart):
+    rng = random.Random(_seed(symbol))
+    candles = chart["candles"]
+    closes = [c["close"] for c in candles]
+    price, prev = closes[-1], closes[-2]
+    return {
+        "symbol": symbol,
+        "longName": f"{symbol} Holdings Inc.",
+        "shortName": symbol,
+        "regularMarketPrice": price,
+        "regularMarketPreviousClose": prev,
+        "regularMarketChangePercent": (price / prev - 1) * 100,
+        "regularMarketVolume": candles[-1]["volume"],
+        "fiftyDayAverage": sum(closes[-50:]) / 50,
+        "twoHundredDayAverage": sum(closes[-200:]) / 200,
+        "fiftyTwoWeekHigh": max(c["high"] for c in candles[-252:]),
+        "fiftyTwoWeekLow": min(c["low"] for c in candles[-252:]),
+        "trailingPE": round(rng.uniform(6, 60), 2),
+        "trailingAnnualDividendYield": round(rng.uniform(0, 0.045), 4),
+        "dividendYield": round(rng.uniform(0, 4.5), 2),
+        "profitMargins": round(rng.uniform(-0.05, 0.35), 4),
+        "marketCap": rng.randint(5 * 10**9, 3 * 10**12),
+        "beta": round(rng.uniform(0.4, 2.2), 2),
+        "sector": rng.choice(SECTORS),
+        "industry": "Synthetic",
+        "longBusinessSummary": f"{symbol} is a synthetic company used for offline benchmarks."
+    }
+
+
+def synthetic_news(symbol, count=20):
+    return [{
+        "title": f"{symbol}: market update #{i + 1}",
+        "link": f"https://example.com/{symbol.lower()}/{i + 1}",
+        "source": "Synthetic Wire",
+        "providerPublishTime": SYNTHETIC_END - i * 5400
+    } for i in range(count)]
+
+
+def _write(path, payload):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f)
+
+
+def synthesize(symbols, directory=DEFAULT_FIXTURES):
+    for symbol in symbols:
+        chart = synthetic_chart(symbol)
+        _write(os.path.join(directory, 'chart', f'{symbol}.json'), chart)
+        _write(os.path.join(directory, 'quote', f'{symbol}.json'), synthetic_quote(symbol, chart))
+        _write(os.path.join(directory, 'news', f'{symbol}.json'), synthetic_news(symbol))
+    _write(os.path.join(directory, 'market.json'), {"indices": [
+        {"name": "S&P 500", "symbol": "^GSPC", "value": 5000.0, "change": 0.4},
+        {"name": "Nasdaq", "symbol": "^IXIC", "value": 16000.0, "change": 0.7}
+    ]})
+    print(f"✅ Wrote synthetic fixtures for {len(symbols)} symbols to {directory}/")
+
+
+def record(symbols, directory=DEFAULT_FIXTURES):
+    """הקלטת התשובות האמיתיות של finance-query (chart 5y, quote, news) ו-market"""
+    from stock_analyzer import StockDataFetcher
+    fetcher = StockDataFetcher()
+    for symbol in symbols:
+        for kind, endpoint, params in (('chart', f'chart/{symbol}', {'range': '5y', 'interval': '1d'}),
+                                       ('quote', f'quote/{symbol}', None),
+                                       ('news', f'news/{symbol}', None)):
+            payload = fetcher._get(endpoint, params=params)
+            if payload is not None:
+                _write(os.path.join(directory, kind, f'{symbol}.json'), payload)
+    market = fetcher._get('market')
+    if market is not None:
+        _write(os.path.join(directory, 'market.json'), market)
+    print(f"✅ Recorded {len(symbols)} symbols to {directory}/")
+
+
+def _slice_candles(candles, range):
+    """חיתוך ה-chart המוקלט (5y יומי) לטווח שהתבקש"""
+    if range in RANGE_BARS:
+        return candles[-RANGE_BARS[range]:]
+    if range == 'ytd':
+        year = time.gmtime(candles[-1]["timestamp"]).tm_year
+        start = calendar.timegm((year, 1, 1, 0, 0, 0))
+        return [c for c in candles if c["timestamp"] >= start]
+    days = RANGE_DAYS.get(range)
+    if days is None:
+        return candles
+    cutoff = candles[-1]["timestamp"] - days * 86400
+    return [c for c in candles if c["timestamp"] > cutoff]
+
+
+def create_app(directory=DEFAULT_FIXTURES, latency_ms=0, jitter_ms=0, seed=0):
+    app = Flask(__name__)
+    cache = {}
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+    stats = {"requests": 0}
+
+    def load(*parts):
+        path = os.path.join(directory, *parts)
+        if path not in cache:
+            if not os.path.exists(path):
+                return None
+            with open(path, encoding='utf-8') as f:
+                cache[path] = json.load(f)
+        return cache[path]
+
+    @app.before_request
+    def simulate_latency():
+        with rng_lock:
+            stats["requests"] += 1
+            delay = max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms))
+        if delay:
+            time.sleep(delay / 1000)
+
+    @app.route('/v2/chart/<symbol>')
+    def chart(symbol):
+        # רק נרות יומיים מוקלטים; אינטרוולים אחרים לא נתמכים בשרת המקומי
+        payload = load('chart', f'{symbol}.json')
+        if payload is None or request.args.get('interval', '1d') != '1d':
+            return jsonify({"error": "not recorded"}), 404
+        return jsonify({**payload, "candles": _slice_candles(payload["candles"], request.args.get('range', '5y'))})
+
+    @app.route('/v2/quote/<symbol>')
+    def quote(symbol):
+        payload = load('quote', f'{symbol}.json')
+        return (jsonify(payload), 200) if payload is not None else (jsonify({"error": "not recorded"}), 404)
+
+    @app.route('/v2/quotes')
+    def quotes():
+        symbols = [s for s in request.args.get('symbols', '').split(',') if s]
+        found = {s: load('quote', f'{s}.json') for s in symbols}
+        return jsonify({"quotes": {s: q for s, q in found.items() if q is not None}})
+
+    @app.route('/v2/news/<symbol>')
+    def news(symbol):
+        payload = load('news', f'{symbol}.json')
+        return jsonify(payload if payload is not None else [])
+
+    @app.route('/v2/market')
+    def market():
+        payload = load('market.json')
+        return (jsonify(payload), 200) if payload is not None else (jsonify({"error": "not recorded"}), 404)
+
+    app.config['MOCK_STATS'] = stats
+    return app
+
+
+class MockServer:
+    """הרצת השרת ב-thread ברקע (לבנצ'מרקים); url הוא ה-base_url עבור FINANCE_QUERY_URL"""
+
+    def __init__(self, directory=DEFAULT_FIXTURES, latency_ms=0, jitter_ms=0, host='127.0.0.1', port=0):
+        self.app = create_app(directory, latency_ms, jitter_ms)
+        self.server = make_server(host, port, self.app, threaded=True)
+        self.url = f"http://{host}:{self.server.server_port}/v2"
+        self._thread = threading.Thread(target=self.server.serve_forever, name="mock-finance-query", daemon=True)
+
+    @property
+    def requests(self):
+        return self.app.config['MOCK_STATS']["requests"]
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for finance-query.com")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("synthesize", "record"):
+        p = sub.add_parser(name)
+        p.add_argument("symbols", nargs="*", help="default: the scan universe + SPY")
+        p.add_argument("--dir", default=DEFAULT_FIXTURES)
+    serve = sub.add_parser("serve")
+    serve.add_argument("--dir", default=DEFAULT_FIXTURES)
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--latency", type=float, default=0, help="base latency per request (ms)")
+    serve.add_argument("--jitter", type=float, default=0, help="uniform +/- jitter (ms)")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        app = create_app(args.dir, args.latency, args.jitter)
+        print(f"🧪 Mock finance-query on http://127.0.0.1:{args.port}/v2 (latency {args.latency}±{args.jitter} ms)")
+        app.run(port=args.port, threaded=True)
+        return
+
+    from stock_analyzer import SCAN_UNIVERSE
+    symbols = [s.upper() for s in args.symbols] or SCAN_UNIVERSE + ['SPY']
+    if args.command == "synthesize":
+        synthesize(symbols, args.dir)
+    else:
+        record(symbols, args.dir)
+
+
+if __name__ == "__main__":
+    main()
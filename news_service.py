@@ -0,0 +1,134 @@
+import hashlib
+import threading
+from datetime import datetime, timedelta
+
+from market_calendar import NYSE
+from metrics import cache_hit, cache_miss
+
+
+def _hash(text):
+    return hashlib.sha1(text.strip().lower().encode('utf-8')).hexdigest()
+
+
+class NewsService:
+    """אינדקס חדשות מקומי: משיכה ברקע למניות במעקב, מניעת כפילויות לפי hash של URL/כותרת,
+    והגשה מהאינדקס בלבד - בקשות ניתוח לא מחכות יותר ל-endpoint החדשות"""
+
+    def __init__(self, fetcher, scheduler, refresh_every=timedelta(minutes=10), closed_refresh_every=timedelta(hours=1),
+                 max_items=100, watch_for=timedelta(hours=6), max_watched=500):
+        self.fetcher = fetcher
+        self.scheduler = scheduler
+        self.refresh_every = refresh_every
+        # חדשות מתפרסמות גם כשהבורסה סגורה, רק בקצב נמוך יותר
+        self.closed_refresh_every = closed_refresh_every
+        self.max_items = max_items
+        # מניה שלא נותחה/נסרקה/נשאלה watch_for יוצאת מהמעקב; לכל היותר max_watched (הישנות יוצאות ראשונות)
+        self.watch_for = watch_for
+        self.max_watched = max_watched
+        self._stories = {}   # symbol -> list of stories (newest first)
+        self._seen = {}      # symbol -> set of url/title hashes
+        self._updated = {}   # symbol -> datetime of last refresh
+        self._watched = {}   # symbol -> datetime of last request (סדר הכנסה = LRU)
+        self._lock = threading.Lock()
+        self.scheduler.add_job("news", self.refresh_watched, every=30)
+
+    def watch(self, *symbols):
+        """הוספת מניות למעקב (רק מניות שנמצאו - מהניתוח או מהסריקה); מניה חדשה נמשכת מיד ברקע"""
+        now = datetime.now()
+        with self._lock:
+            new = [s for s in symbols if s not in self._watched]
+            for symbol in symbols:
+                self._watched.pop(symbol, None)
+                self._watched[symbol] = now
+            self._expire(now)
+        if new:
+            self.scheduler.run_now("news")
+
+    def _touch(self, symbol):
+        """בקשת חדשות למניה שכבר במעקב מאריכה את המעקב שלה; מניה אחרת לא נכנסת למעקב"""
+        with self._lock:
+            if symbol in self._watched:
+                self._watched.pop(symbol)
+                self._watched[symbol] = datetime.now()
+
+    def _expire(self, now):
+        """הוצאת מניות שלא נשאלו watch_for, ומעבר ל-max_watched - הכי פחות עדכניות (תחת הנעילה)"""
+        stale = [s for s, requested in self._watched.items() if now - requested > self.watch_for]
+        stale += list(self._watched)[len(stale):len(self._watched) - self.max_watched]
+        for symbol in stale:
+            del self._watched[symbol]
+            self._stories.pop(symbol, None)
+            self._seen.pop(symbol, None)
+            self._updated.pop(symbol, None)
+
+    def refresh_watched(self):
+        """עבודת הרקע: רענון כל המניות במעקב שהאינדקס שלהן ישן"""
+        with self._lock:
+            self._expire(datetime.now())
+        for symbol in list(self._watched):
+            updated = self._updated.get(symbol)
+            if updated is None or not NYSE.is_fresh(updated, self.refresh_every, self.closed_refresh_every):
+                self.refresh(symbol)
+
+    def refresh(self, symbol):
+        """משיכת החדשות למניה והוספת כתבות חדשות בלבד לאינדקס; מחזיר את מספר הכתבות החדשות"""
+        items = self.fetcher.get_news_items(symbol)
+        self._updated[symbol] = datetime.now()
+        if not items:
+            return 0
+
+        with self._lock:
+            stories = self._stories.setdefault(symbol, [])
+            seen = self._seen.setdefault(symbol, set())
+            added = 0
+            for item in items:
+                story = item.get('content', item)
+                keys = self._keys(story)
+                if keys & seen:
+                    continue
+                # פענוח התאריך נעשה פעם אחת, בזמן ההכנסה לאינדקס
+                stories.append(self.fetcher.format_news_item(story))
+                seen.update(keys)
+                added += 1
+
+            if added:
+                stories.sort(key=lambda s: s['published_ts'], reverse=True)
+                del stories[self.max_items:]
+                self._seen[symbol] = set().union(*(self._keys_of_formatted(s) for s in stories))
+        return added
+
+    def _keys(self, story):
+        link = (story.get('clickThroughUrl') or {}).get('url', story.get('link', ''))
+        keys = {'t:' + _hash(story.get('title', ''))}
+        if link and link != '#':
+            keys.add('u:' + _hash(link))
+        return keys
+
+    def _keys_of_formatted(self, story):
+        return self._keys({'title': story['title'], 'link': story['link']})
+
+    def latest(self, symbol, limit=5):
+        """הכתבות האחרונות מהאינדקס (בלי לחכות לרשת)"""
+        self._touch(symbol)
+        stories = self._stories.get(symbol)
+        # "פספוס" = המניה עוד לא באינדקס, והניתוח חוזר בלי חדשות
+        if stories:
+            cache_hit('news')
+        else:
+            cache_miss('news')
+        return list((stories or [])[:limit])
+
+    def page(self, symbol, page=1, per_page=10):
+        self._touch(symbol)
+        stories = self._stories.get(symbol, [])
+        start = (page - 1) * per_page
+        updated = self._updated.get(symbol)
+        return {
+            "symbol": symbol,
+            "page": page,
+            "per_page": per_page,
+            "total": len(stories),
+            "pages": (len(stories) + per_page - 1) // per_page,
+            "updated": updated.isoformat() if updated else None,
+            "items": stories[start:start + per_page]
+        }
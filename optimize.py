@@ -0,0 +1,178 @@
+"""סריקת פרמטרים (grid / random search) מעל analysis_parameters.
+
+מערכי המחירים של כל היקום נטענים פעם אחת ל-shared memory; כל תהליך במאגר מתחבר
+לאותו בלוק זיכרון לפי שם (בלי להעתיק את ההיסטוריה לכל worker) ומריץ את הבקטסט
+לכל צירוף פרמטרים.
+
+שימוש:
+    python optimize.py --grid sma_short=10,20,30 sma_long=50,100,150
+    python optimize.py --random 50 --grid rsi_period=7,14,21 rsi_oversold=20,25,30,35 --objective momentum.buy.hit_rate
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import indicators
+from backtest import load_history, load_fundamentals, backtest_symbol, summarize
+from stock_analyzer import StockDataFetcher, SCAN_UNIVERSE, load_config
+
+# רשת ברירת המחדל - סביב הערכים ב-config.json
+DEFAULT_GRID = {
+    'sma_short': [10, 15, 20, 30],
+    'sma_long': [50, 100, 150, 200],
+    'rsi_period': [7, 14, 21],
+    'rsi_oversold': [25, 30, 35],
+    'rsi_overbought': [65, 70, 75]
+}
+
+# מצב ה-worker: views על ה-shared memory (ממולא ב-_attach)
+_shared = {}
+
+
+class SharedPrices:
+    """מערכי close/high/low של כל היקום בבלוק shared memory אחד (symbols x bars, מיושר לימין)"""
+
+    FIELDS = ('close', 'high', 'low')
+
+    def __init__(self, history):
+        self.symbols = list(history)
+        self.lengths = [len(history[s]) for s in self.symbols]
+        self.shape = (len(self.FIELDS), len(self.symbols), max(self.lengths, default=0))
+        size = max(1, int(np.prod(self.shape)) * np.dtype(np.float64).itemsize)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        data = np.ndarray(self.shape, dtype=np.float64, buffer=self.shm.buf)
+        data[:] = np.nan
+        for i, symbol in enumerate(self.symbols):
+            n = self.lengths[i]
+            for f, field in enumerate(self.FIELDS):
+                data[f, i, -n:] = history[symbol][field].to_numpy(dtype=np.float64)
+
+    def init_args(self):
+        return (self.shm.name, self.shape, self.symbols, self.lengths)
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _attach(name, shape, symbols, lengths):
+    """initializer של ה-worker: חיבור ל-shared memory (פעם אחת לכל תהליך)"""
+    shm = shared_memory.SharedMemory(name=name)
+    _shared['shm'] = shm  # שומרים הפניה כדי שהזיכרון לא ייסגר
+    _shared['data'] = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    _shared['symbols'] = symbols
+    _shared['lengths'] = lengths
+
+
+def _evaluate(params, horizon, fundamentals):
+    """הערכת צירוף פרמטרים אחד על כל היקום (רץ בתוך worker)"""
+    data = _shared['data']
+    results = []
+    for i, symbol in enumerate(_shared['symbols']):
+        n = _shared['lengths'][i]
+        # slicing של view - בלי העתקה של המחירים
+        close, high, low = data[0, i, -n:], data[1, i, -n:], data[2, i, -n:]
+        results.append(backtest_symbol(symbol, close, high, low, horizon, fundamentals.get(symbol), params))
+    return params, summarize(results)
+
+
+def _is_valid(params):
+    # SMA קצר חייב להיות קצר מה-SMA הארוך, וסף ה-oversold מתחת ל-overbought
+    return params['sma_short'] < params['sma_long'] and params['rsi_oversold'] < params['rsi_overbought']
+
+
+def build_combinations(grid, samples=None, seed=0, base_params=None):
+    """כל הצירופים של הרשת, או מדגם אקראי של samples צירופים (random search)"""
+    keys = list(grid)
+    combos = [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+    combos = [c for c in combos if _is_valid(indicators.parameters({**(base_params or {}), **c}))]
+    if samples and samples < len(combos):
+        combos = random.Random(seed).sample(combos, samples)
+    return combos
+
+
+def objective_value(summary, objective):
+    """שליפת ערך המטרה לפי נתיב נקודות, למשל recommendation.strategy_return"""
+    value = summary
+    for part in objective.split('.'):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value if value is not None else float('-inf')
+
+
+def run_sweep(history, combinations, base_params=None, horizon=20, fundamentals=None,
+              objective='recommendation.strategy_return', workers=None):
+    """הרצת כל הצירופים במאגר תהליכים מעל אותו בלוק shared memory; מחזיר רשימה ממוינת מהטוב לגרוע"""
+    fundamentals = fundamentals or {}
+    prices = SharedPrices(history)
+    try:
+        params_list = [{**(base_params or {}), **combo} for combo in combinations]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=prices.init_args()) as pool:
+            outcomes = list(pool.map(
+                _evaluate, params_list, [horizon] * len(params_list), [fundamentals] * len(params_list)
+            ))
+    finally:
+        prices.close()
+
+    ranked = [
+        {"params": combo, "objective": objective_value(summary, objective), "summary": summary}
+        for combo, (_, summary) in zip(combinations, outcomes)
+    ]
+    ranked.sort(key=lambda r: r["objective"], reverse=True)
+    return ranked
+
+
+def parse_grid(items):
+    grid = {}
+    for item in items or []:
+        key, _, values = item.partition('=')
+        if key not in indicators.DEFAULT_PARAMETERS:
+            raise SystemExit(f"Unknown parameter: {key}")
+        grid[key] = [int(v) if v.strip().lstrip('-').isdigit() else float(v) for v in values.split(',')]
+    return grid or DEFAULT_GRID
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grid/random search over analysis_parameters")
+    parser.add_argument("symbols", nargs="*", help="symbols to test (default: the scan universe)")
+    parser.add_argument("--grid", nargs="+", metavar="PARAM=V1,V2", help="parameter values to sweep")
+    parser.add_argument("--random", type=int, metavar="N", help="evaluate N random combinations of the grid")
+    parser.add_argument("--objective", default="recommendation.strategy_return",
+                        help="summary metric to maximize, e.g. recommendation.buy.hit_rate")
+    parser.add_argument("--range", default="5y")
+    parser.add_argument("--horizon", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--no-fundamentals", action="store_true", help="ignore current fundamentals")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--output", help="write all ranked results as JSON")
+    args = parser.parse_args()
+
+    base_params = load_config(args.config).get('analysis_parameters', {})
+    combinations = build_combinations(parse_grid(args.grid), args.random, base_params=base_params)
+    symbols = [s.upper() for s in args.symbols] or SCAN_UNIVERSE
+    fetcher = StockDataFetcher()
+    history = load_history(symbols, fetcher, args.range)
+    # אותה פונקציית ציון כמו ב-backtest.py ובפרודקשן: מגמה + ציון פונדמנטלי נוכחי
+    fundamentals = {} if args.no_fundamentals else load_fundamentals(list(history), fetcher)
+
+    print(f"🔧 Evaluating {len(combinations)} parameter sets over {len(history)} symbols...")
+    ranked = run_sweep(history, combinations, base_params, args.horizon, fundamentals,
+                       objective=args.objective, workers=args.workers)
+
+    for r in ranked[:args.top]:
+        print(f"  {args.objective} = {r['objective']:.4f}  {r['params']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(ranked, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
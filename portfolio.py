@@ -0,0 +1,166 @@
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from market_calendar import NYSE
+from stock_analyzer import BARS_PER_YEAR
+
+# ערכי z לחישוב VaR פרמטרי (התפלגות נורמלית, זנב שמאלי)
+Z_SCORES = {0.90: 1.2816, 0.95: 1.6449, 0.975: 1.9600, 0.99: 2.3263}
+
+
+class PortfolioAnalyzer:
+    """ניתוח סיכון ברמת תיק: תנודתיות, מטריצות קווריאנס/קורלציה, בטא מול מדד ו-VaR.
+    הכל מחושב במעבר וקטורי אחד על מטריצת תשואות מיושרת (ימים x מניות)"""
+
+    def __init__(self, candles, benchmark='SPY', cache_ttl=timedelta(minutes=5), cache_size=64):
+        self.candles = candles
+        self.benchmark = benchmark
+        self.cache_ttl = cache_ttl
+        # כל יקום שונה (תיק של לקוח) הוא רשומה עם מטריצת תשואות שלמה - מטמון חסום (LRU)
+        self.cache_size = cache_size
+        self._cache = {}  # (universe, window) -> (timestamp, stats), בסדר שימוש (הישן ראשון)
+        self._lock = threading.Lock()
+
+    def _universe_stats(self, symbols, window):
+        """תשואות מיושרות, ממוצעים וקווריאנס ליקום - נשמר במטמון לפי (יקום, חלון)"""
+        key = (tuple(sorted(symbols)), window)
+        with self._lock:
+            entry = self._cache.pop(key, None)
+            if entry and NYSE.is_fresh(entry[0], self.cache_ttl):
+                self._cache[key] = entry
+                return entry[1]
+
+        # משיכה מרוכזת אחת לכל ההיסטוריות (מה שכבר במטמון לא נמשך שוב)
+        history = self.candles.get_many(list(key[0]))
+        missing = [s for s in key[0] if s not in history]
+        if missing:
+            raise ValueError(f"No price history for: {', '.join(missing)}")
+
+        closes = pd.DataFrame({s: pd.Series(c.close, index=c.index, dtype=np.float64) for s, c in history.items()})
+        # יישור לפי תאריך: רק ימים שבהם יש מחיר לכל המניות
+        returns = closes.dropna().pct_change().dropna().iloc[-window:]
+        if len(returns) < 2:
+            raise ValueError("Not enough overlapping history for the requested symbols")
+
+        matrix = returns.to_numpy()
+        stats = {
+            "symbols": list(returns.columns),
+            "returns": matrix,
+            "mean": matrix.mean(axis=0),
+            "cov": np.cov(matrix, rowvar=False),
+            "start": returns.index[0].strftime('%Y-%m-%d'),
+            "end": returns.index[-1].strftime('%Y-%m-%d'),
+            "last_close": closes.dropna().iloc[-1].to_numpy()
+        }
+        with self._lock:
+            self._cache[key] = (datetime.now(), stats)
+            # רשומות שפג תוקפן יוצאות, ומעבר ל-cache_size - הכי פחות בשימוש
+            expired = [k for k, (created, _) in self._cache.items() if not NYSE.is_fresh(created, self.cache_ttl)]
+            for k in expired + list(self._cache)[:len(self._cache) - len(expired) - self.cache_size]:
+                self._cache.pop(k, None)
+        return stats
+
+    @staticmethod
+    def parse_holdings(holdings):
+        """holdings כמילון {symbol: weight} או כרשימה של {symbol, weight|shares}"""
+        if isinstance(holdings, dict):
+            holdings = [{"symbol": s, "weight": w} for s, w in holdings.items()]
+        if not isinstance(holdings, list):
+            raise ValueError("holdings must be an object {symbol: weight} or a list of {symbol, weight|shares}")
+        parsed = {}
+        for h in holdings:
+            if not isinstance(h, dict):
+                raise ValueError("Each holding must be an object like {\"symbol\": \"AAPL\", \"weight\": 0.5}")
+            symbol = h.get("symbol")
+            if not isinstance(symbol, str) or not symbol.strip():
+                raise ValueError("Each holding needs a symbol")
+            symbol = symbol.strip().upper()
+            kind = "shares" if "shares" in h else "weight"
+            try:
+                amount = float(h[kind] if kind == "shares" else h.get("weight", 1))
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid {kind} for {symbol}")
+            if not np.isfinite(amount):
+                raise ValueError(f"Invalid {kind} for {symbol}")
+            parsed[symbol] = (kind, amount)
+        if not parsed:
+            raise ValueError("Please provide at least one holding")
+        kinds = {kind for kind, _ in parsed.values()}
+        if len(kinds) > 1:
+            raise ValueError("Use either weights or shares for all holdings, not both")
+        return parsed
+
+    def analyze(self, holdings, window=252, confidence=0.95, benchmark=None):
+        benchmark = (benchmark or self.benchmark).upper()
+        if confidence not in Z_SCORES:
+            raise ValueError(f"confidence must be one of {sorted(Z_SCORES)}")
+        parsed = self.parse_holdings(holdings)
+        symbols = list(parsed)
+
+        stats = self._universe_stats(set(symbols) | {benchmark}, window)
+        order = [stats["symbols"].index(s) for s in symbols]
+        b = stats["symbols"].index(benchmark)
+        cov = stats["cov"]
+        annualize = BARS_PER_YEAR['1d']
+
+        # משקלות: לפי שווי (מניות x מחיר אחרון) או לפי המשקלות שנשלחו, מנורמלים לסכום 1
+        amounts = np.array([parsed[s][1] for s in symbols])
+        value = None
+        if parsed[symbols[0]][0] == "shares":
+            amounts = amounts * stats["last_close"][order]
+            value = float(amounts.sum())
+        if amounts.sum() <= 0:
+            raise ValueError("Holdings must have a positive total weight")
+        weights = amounts / amounts.sum()
+
+        sub_cov = cov[np.ix_(order, order)]
+        port_var = float(weights @ sub_cov @ weights)
+        port_std = port_var ** 0.5
+        port_mean = float(weights @ stats["mean"][order])
+
+        # בטא: cov(asset, index) / var(index), ובטא התיק היא הממוצע המשוקלל
+        betas = cov[order, b] / cov[b, b]
+        port_returns = stats["returns"][:, order] @ weights
+
+        std = np.sqrt(np.diag(cov))
+        corr = cov / np.outer(std, std)
+        sub_corr = corr[np.ix_(order, order)]
+
+        var_parametric = Z_SCORES[confidence] * port_std - port_mean
+        var_historical = -float(np.percentile(port_returns, (1 - confidence) * 100))
+        tail = port_returns[port_returns <= -var_historical]
+        cvar = -float(tail.mean()) if len(tail) else var_historical
+
+        def money(pct):
+            return pct * value if value is not None else None
+
+        return {
+            "symbols": symbols,
+            "weights": dict(zip(symbols, weights.tolist())),
+            "value": value,
+            "window": {"observations": len(port_returns), "start": stats["start"], "end": stats["end"]},
+            "volatility": {
+                "daily": port_std,
+                "annual": port_std * annualize ** 0.5
+            },
+            "expected_return_annual": port_mean * annualize,
+            "beta": {
+                "benchmark": benchmark,
+                "portfolio": float(weights @ betas),
+                "holdings": dict(zip(symbols, betas.tolist()))
+            },
+            "var": {
+                "confidence": confidence,
+                "horizon_days": 1,
+                "parametric": var_parametric,
+                "historical": var_historical,
+                "cvar": cvar,
+                "parametric_value": money(var_parametric),
+                "historical_value": money(var_historical)
+            },
+            "covariance": {"symbols": symbols, "matrix": (sub_cov * annualize).tolist()},
+            "correlation": {"symbols": symbols, "matrix": sub_corr.tolist()}
+        }
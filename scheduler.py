@@ -0,0 +1,66 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundScheduler:
+    """מתזמן עבודות רקע מחזוריות על thread יחיד (daemon).
+    ה-thread עולה בעצלתיים בשימוש הראשון ובכל תהליך מחדש - כך שזה בטוח גם אחרי fork של gunicorn"""
+
+    def __init__(self):
+        self._jobs = {}  # name -> {"func", "every", "next_run"}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def add_job(self, name, func, every):
+        """רישום עבודה מחזורית; every הוא מספר שניות או פונקציה שמחזירה מספר שניות"""
+        with self._lock:
+            self._jobs[name] = {"func": func, "every": every, "next_run": 0}
+        self.start()
+        # ה-thread אולי ישן עד העבודה הבאה שכבר רשומה - מעירים אותו כדי שהחדשה תרוץ מיד
+        self._wakeup.set()
+
+    def run_now(self, name):
+        """הקדמת הריצה הבאה של עבודה לעכשיו"""
+        with self._lock:
+            if name in self._jobs:
+                self._jobs[name]["next_run"] = 0
+        self.start()
+        self._wakeup.set()
+
+    def start(self):
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._loop, name="background-scheduler", daemon=True)
+            self._thread.start()
+
+    def _interval(self, job):
+        every = job["every"]
+        return every() if callable(every) else every
+
+    def _loop(self):
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                due = [(name, job) for name, job in self._jobs.items() if job["next_run"] <= now]
+
+            for name, job in due:
+                try:
+                    job["func"]()
+                except Exception as e:
+                    logger.exception("❌ Background job '%s' failed: %s", name, e)
+                job["next_run"] = time.monotonic() + self._interval(job)
+
+            with self._lock:
+                next_run = min((job["next_run"] for job in self._jobs.values()), default=now + 60)
+            self._wakeup.wait(timeout=max(0.1, next_run - time.monotonic()))
+            self._wakeup.clear()
@@ -0,0 +1,174 @@
+import re
+import threading
+
+import numpy as np
+
+# תנאי בודד: שדה, אופרטור, ערך (למשל pe < 20 או trend = Strong Uptrend)
+_CONDITION = re.compile(r'^\s*(\w+)\s*(<=|>=|!=|==|=|<|>)\s*(.+?)\s*$')
+# מחברי AND - רק מחוץ למחרוזות במירכאות (כדי ש-name = "Procter and Gamble" יישאר תנאי אחד)
+_AND_OR_QUOTED = re.compile(r'"[^"]*"|\'[^\']*\'|\s+AND\s+', re.IGNORECASE)
+
+
+class ScreenQueryError(ValueError):
+    pass
+
+
+def _split_and(expression):
+    """פיצול הביטוי לתנאים לפי AND שמחוץ למירכאות"""
+    clauses, start = [], 0
+    for m in _AND_OR_QUOTED.finditer(expression):
+        if m.group()[0] not in '"\'':
+            clauses.append(expression[start:m.start()])
+            start = m.end()
+    clauses.append(expression[start:])
+    return clauses
+
+
+def parse_query(expression):
+    """פירוק ביטוי סינון לרשימת תנאים (field, op, value); התנאים מחוברים ב-AND"""
+    conditions = []
+    if not expression or not expression.strip():
+        return conditions
+    for clause in _split_and(expression.strip()):
+        m = _CONDITION.match(clause)
+        if not m:
+            raise ScreenQueryError(f"Invalid condition: '{clause}'")
+        field, op, raw = m.groups()
+        raw = raw.strip('\'"')
+        try:
+            value = float(raw)
+        except ValueError:
+            value = raw
+        conditions.append((field.lower(), '=' if op == '==' else op, value))
+    return conditions
+
+
+class ScreenTable:
+    """טבלה עמודתית בזיכרון מעל תוצאות הסריקה, עם אינדקסים ממוינים לשדות מספריים
+    ואינדקס ערכים לשדות קטגוריים - כל תנאי הוא חיפוש בינארי ולא מעבר על כל השורות"""
+
+    NUMERIC = ('price', 'change', 'rsi', 'pe', 'yield', 'score')
+    CATEGORICAL = ('symbol', 'name', 'trend', 'short_term', 'long_term', 'risk')
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.size = len(rows)
+        self.numeric = {}
+        self.sorted = {}  # field -> (order, sorted values, number of non-NaN values)
+        for field in self.NUMERIC:
+            values = np.array([self._number(r.get(field)) for r in rows], dtype=np.float64)
+            order = np.argsort(values, kind='stable')  # NaN בסוף
+            self.numeric[field] = values
+            self.sorted[field] = (order, values[order], int(np.count_nonzero(~np.isnan(values))))
+
+        self.categorical = {}
+        self.value_index = {}  # field -> {value (lowercase): row ids}
+        for field in self.CATEGORICAL:
+            values = np.array([str(r.get(field, '')) for r in rows], dtype=object)
+            self.categorical[field] = values
+            index = {}
+            for i, v in enumerate(values):
+                index.setdefault(v.lower(), []).append(i)
+            self.value_index[field] = {k: np.array(v, dtype=np.int64) for k, v in index.items()}
+
+    @staticmethod
+    def _number(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return np.nan  # למשל pe = "N/A"
+
+    def _numeric_rows(self, field, op, value):
+        if not isinstance(value, float):
+            raise ScreenQueryError(f"'{field}' needs a numeric value")
+        order, values, valid = self.sorted[field]
+        values = values[:valid]
+        left = np.searchsorted(values, value, side='left')
+        right = np.searchsorted(values, value, side='right')
+        if op == '<': return order[:left]
+        if op == '<=': return order[:right]
+        if op == '>': return order[right:valid]
+        if op == '>=': return order[left:valid]
+        if op == '=': return order[left:right]
+        return np.concatenate([order[:left], order[right:valid]])  # !=
+
+    def _categorical_rows(self, field, op, value):
+        if op not in ('=', '!='):
+            raise ScreenQueryError(f"'{field}' supports only = and !=")
+        rows = self.value_index[field].get(str(value).lower(), np.array([], dtype=np.int64))
+        if op == '=':
+            return rows
+        mask = np.ones(self.size, dtype=bool)
+        mask[rows] = False
+        return np.nonzero(mask)[0]
+
+    def select(self, conditions):
+        """מסכה בוליאנית של השורות שעוברות את כל התנאים"""
+        mask = np.ones(self.size, dtype=bool)
+        for field, op, value in conditions:
+            if field in self.numeric:
+                rows = self._numeric_rows(field, op, value)
+            elif field in self.categorical:
+                rows = self._categorical_rows(field, op, value)
+            else:
+                raise ScreenQueryError(f"Unknown field: '{field}'")
+            hit = np.zeros(self.size, dtype=bool)
+            hit[rows] = True
+            mask &= hit
+        return mask
+
+    def query(self, expression, sort='score', descending=True, limit=None):
+        mask = self.select(parse_query(expression))
+        if sort in self.sorted:
+            # הסדר הממוין כבר מחושב - רק מסננים אותו לפי המסכה
+            order, _, valid = self.sorted[sort]
+            ranked, missing = order[:valid], order[valid:]
+            if descending:
+                ranked = ranked[::-1]
+            order = np.concatenate([ranked, missing])
+        elif sort in self.categorical:
+            order = np.argsort(self.categorical[sort], kind='stable')
+            if descending:
+                order = order[::-1]
+        else:
+            raise ScreenQueryError(f"Unknown sort field: '{sort}'")
+        selected = order[mask[order]]
+        matched = len(selected)
+        if limit is not None:
+            if limit < 1:
+                raise ScreenQueryError("limit must be at least 1")
+            selected = selected[:limit]
+        return [self.rows[i] for i in selected], matched
+
+
+class Screener:
+    """סינון מעל תוצאות הסריקה האחרונה; הטבלה והאינדקסים נבנים מחדש רק כשהסריקה מתעדכנת"""
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self._table = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def table(self):
+        results = self.analyzer.scan_market_cached()
+        version = self.analyzer.scan_timestamp
+        if self._table is None or version != self._version:
+            with self._lock:
+                self._table = ScreenTable(results)
+                self._version = version
+        return self._table
+
+    def screen(self, expression, sort='score', descending=True, limit=50):
+        table = self.table()
+        results, matched = table.query(expression, sort, descending, limit)
+        return {
+            "query": expression,
+            "sort": sort,
+            "order": "desc" if descending else "asc",
+            "universe": table.size,
+            "matches": matched,
+            "count": len(results),
+            "scan_time": self._version.isoformat() if self._version else None,
+            "results": results
+        }
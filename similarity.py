@@ -0,0 +1,159 @@
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from market_calendar import NYSE
+from stock_analyzer import SCAN_UNIVERSE
+
+
+class ReturnWindow:
+    """מטריצת תשואות יומיות (ימים x מניות) לחלון אחד, עם סכומים ומכפלה צולבת שמתעדכנים
+    בהדרגה: כשנכנסים ימים חדשים מוסיפים אותם ומורידים את הימים שיצאו מהחלון (O(ימים חדשים x מניות²)).
+    מטריצת הקורלציה נגזרת מהסכומים (O(מניות²)); אין מטריצה מנורמלת של כל החלון שצריך לבנות מחדש"""
+
+    def __init__(self, returns):
+        self.symbols = list(returns.columns)
+        self.position = {s: i for i, s in enumerate(self.symbols)}
+        self.dates = returns.index
+        self.returns = returns.to_numpy(dtype=np.float64)
+        self.sum = self.returns.sum(axis=0)
+        self.cross = self.returns.T @ self.returns
+        self.updates = 0
+        self._normalize()
+
+    def advance(self, returns):
+        """עדכון לפי מטריצת התשואות האחרונה; מחזיר False אם צריך לבנות מחדש (יקום/היסטוריה השתנו).
+        גם ימים שכבר בחלון מתעדכנים אם הערך שלהם השתנה (הבר האחרון של יום שעוד לא נסגר, או תיקון)"""
+        if list(returns.columns) != self.symbols or len(returns) != len(self.dates):
+            return False
+        new = int((returns.index > self.dates[-1]).sum())
+        kept = len(self.dates) - new
+        if kept <= 0 or not returns.index[:kept].equals(self.dates[new:]):
+            return False
+
+        incoming = returns.to_numpy(dtype=np.float64)
+        # ימים חופפים שהערך שלהם השתנה: מורידים את הישן ומוסיפים את החדש במקומו
+        changed = np.flatnonzero((incoming[:kept] != self.returns[new:]).any(axis=1))
+        if new == 0 and len(changed) == 0:
+            return True
+        old, fresh = self.returns[new:][changed], incoming[:kept][changed]
+        added = incoming[kept:]
+        dropped = self.returns[:new]
+        self.sum += added.sum(axis=0) - dropped.sum(axis=0) + fresh.sum(axis=0) - old.sum(axis=0)
+        self.cross += added.T @ added - dropped.T @ dropped + fresh.T @ fresh - old.T @ old
+        self.returns = incoming
+        self.dates = returns.index
+        self.updates += new + len(changed)
+        self._normalize()
+        return True
+
+    def _normalize(self):
+        """ממוצע, סטיית תקן ומטריצת קורלציה מתוך הסכומים המצטברים - בלי לעבור שוב על כל החלון"""
+        n = len(self.dates)
+        mean = self.sum / n
+        cov = self.cross / n - np.outer(mean, mean)
+        std = np.sqrt(np.clip(np.diag(cov), 0, None))
+        std[std == 0] = np.nan  # מניה בלי תנודה - אין לה קורלציה מוגדרת
+        self.corr = cov / np.outer(std, std)
+        self.mean = mean
+        self.std = std
+
+    def correlations(self, vector):
+        """קורלציה של סדרת תשואות (באותם ימים) מול כל היקום - מכפלת מטריצה-וקטור אחת על התשואות
+        עצמן: הווקטור הממורכז מסתכם ל-0, ולכן מירכוז העמודות לא משנה את המכפלה"""
+        centered = vector - vector.mean()
+        norm = np.linalg.norm(centered)
+        if norm == 0:
+            return np.full(len(self.symbols), np.nan)
+        return (self.returns.T @ (centered / norm)) / (self.std * np.sqrt(len(self.dates)))
+
+
+class SimilarityService:
+    """'מה זז כמו NVDA?' - מניות דומות / הפוכות לפי קורלציית תשואות יומיות מול יקום הסריקה.
+    מטריצה לכל חלון נשמרת במטמון; כשמגיעים ברים חדשים הסכומים מתעדכנים בהדרגה, אבל טבלת התשואות
+    של החלון עדיין נבנית מחדש מהנרות בכל רענון (ומדלגים עליו כשאף סדרה לא השתנתה)"""
+
+    def __init__(self, candles, universe=SCAN_UNIVERSE, ttl=timedelta(minutes=5), scheduler=None):
+        self.candles = candles
+        self.universe = list(universe)
+        self.ttl = ttl
+        self._windows = {}   # window -> ReturnWindow
+        self._sources = {}   # window -> {symbol: CompactCandles} the window was built from
+        self._checked = {}   # window -> datetime of last refresh
+        self._lock = threading.Lock()
+        if scheduler is not None:
+            # בזמן מסחר כל ttl; כשהשוק סגור הנרות לא משתנים - עד הפתיחה הבאה
+            scheduler.add_job("similarity", self.refresh_all, every=lambda: NYSE.refresh_interval(ttl.total_seconds()))
+
+    def _returns(self, history, symbols, window):
+        closes = pd.DataFrame({s: pd.Series(history[s].close, index=history[s].index, dtype=np.float64)
+                               for s in symbols if s in history})
+        recent = closes.pct_change().iloc[1:].iloc[-window:]
+        # מניות בלי היסטוריה מלאה בחלון יוצאות מהיקום במקום לקצר את החלון לכולם
+        return recent.dropna(axis=1)
+
+    def refresh(self, window):
+        history = self.candles.get_many(self.universe)
+        state = self._windows.get(window)
+        # שום סדרה לא התעדכנה במטמון הנרות מאז הרענון הקודם - אין מה לבנות
+        if state is not None and history.keys() == self._sources[window].keys() and \
+                all(history[s] is self._sources[window][s] for s in history):
+            self._checked[window] = datetime.now()
+            return state
+        returns = self._returns(history, self.universe, window)
+        if len(returns) < 2 or returns.shape[1] < 2:
+            raise ValueError("Not enough price history to compute correlations")
+        with self._lock:
+            state = self._windows.get(window)
+            # בנייה מלאה מחדש כשהיקום השתנה, או מדי פעם כדי שטעויות עיגול מהעדכונים לא יצטברו
+            if state is None or state.updates >= window or not state.advance(returns):
+                state = ReturnWindow(returns)
+                self._windows[window] = state
+            self._sources[window] = history
+            self._checked[window] = datetime.now()
+        return state
+
+    def refresh_all(self):
+        """עבודת הרקע: עדכון כל החלונות שכבר נשאלו"""
+        for window in list(self._windows):
+            self.refresh(window)
+
+    def matrix(self, window=252):
+        checked = self._checked.get(window)
+        if checked and NYSE.is_fresh(checked, self.ttl):
+            return self._windows[window]
+        return self.refresh(window)
+
+    def similar(self, symbol, window=252, k=10):
+        symbol = symbol.upper()
+        state = self.matrix(window)
+        if symbol in state.position:
+            # מניה מהיקום - שורה מוכנה מהמטריצה המחושבת מראש
+            corr = state.corr[state.position[symbol]].copy()
+            corr[state.position[symbol]] = np.nan
+        else:
+            candles = self.candles.get(symbol)
+            if candles is None:
+                raise ValueError(f"No price history for {symbol}")
+            closes = pd.Series(candles.close, index=candles.index, dtype=np.float64)
+            vector = closes.pct_change().reindex(state.dates)
+            if vector.isna().any():
+                raise ValueError(f"Not enough overlapping history for {symbol}")
+            corr = state.correlations(vector.to_numpy())
+
+        ranked = [i for i in np.argsort(corr) if not np.isnan(corr[i])]
+
+        def items(indices):
+            return [{"symbol": state.symbols[i], "correlation": float(corr[i])} for i in indices]
+
+        return {
+            "symbol": symbol,
+            "window": {"observations": len(state.dates),
+                       "start": state.dates[0].strftime('%Y-%m-%d'),
+                       "end": state.dates[-1].strftime('%Y-%m-%d')},
+            "universe": len(state.symbols),
+            "similar": items(ranked[::-1][:k]),
+            "anti_correlated": items(ranked[:k])
+        }
@@ -0,0 +1,63 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from metrics import cache_hit, cache_miss
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error', 'done_at')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.done_at = None
+
+
+class SingleFlight:
+    """איחוד בקשות זהות במקביל: הקריאה הראשונה למפתח מחשבת, כל השאר מחכות לה ומקבלות את אותה תוצאה.
+    התוצאה נשארת זמינה עוד ttl אחרי הסיום כדי לספוג פרץ בקשות; חריגות לא נשמרות.
+    התוצאה משותפת לכל הממתינים - אסור לשנות אותה אחרי שהוחזרה"""
+
+    def __init__(self, name, ttl=timedelta(seconds=5)):
+        self.name = name
+        self.ttl = ttl
+        self._calls = {}  # key -> _Call
+        self._lock = threading.Lock()
+
+    def _expired(self, call, now):
+        return call.done_at is not None and now - call.done_at >= self.ttl
+
+    def do(self, key, func):
+        now = datetime.now()
+        with self._lock:
+            for stale in [k for k, c in self._calls.items() if self._expired(c, now)]:
+                del self._calls[stale]
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if leader:
+            cache_miss(self.name)
+            try:
+                call.result = func()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    call.done_at = datetime.now()
+                    if call.error is not None or self.ttl <= timedelta(0):
+                        self._calls.pop(key, None)
+                call.event.set()
+        else:
+            cache_hit(self.name)
+            logger.debug("Joining in-flight %s for %s", self.name, key)
+            call.event.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
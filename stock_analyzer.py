@@ -1,24 +1,70 @@
+import logging
 import requests
 import pandas as pd
 import numpy as np
 import os
 from datetime import datetime, timedelta
 import json
-from ta.trend import SMAIndicator, EMAIndicator, MACD
-from ta.momentum import RSIIndicator
-from ta.volatility import BollingerBands
+from candles import IntradayStore, CandleStore, RESAMPLE_PERIODS, range_start
+from compute_pool import ComputePool
+from market_calendar import NYSE
+from metrics import span, cache_hit, cache_miss
+import indicators
+import downsample
+from fundamentals import FundamentalsStore
+from news_service import NewsService
+from scheduler import BackgroundScheduler
+from analysis_text import AnalysisTemplates, TEMPLATES, DEFAULT_LANGUAGE
+from logging_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# מצבים תוך-יומיים: אינטרוול -> (טווח למשיכה ראשונית, מספר נרות שנשמרים בזיכרון)
+INTRADAY_INTERVALS = {
+    '1m': ('1d', 390),
+    '5m': ('5d', 390),
+    '15m': ('1mo', 520)
+}
+
+# האינטרוולים שבאמת אפשר להגיש - המקור היחיד לבדיקת הקלט ב-API:
+# יומי + מה שנגזר ממנו (RESAMPLE_PERIODS), ומצבי החוצץ התוך-יומי
+DAILY_INTERVALS = ('1d',) + tuple(RESAMPLE_PERIODS)
+SUPPORTED_INTERVALS = DAILY_INTERVALS + tuple(INTRADAY_INTERVALS)
+
+# מספר ברים בשנת מסחר לכל אינטרוול נתמך (6.5 שעות מסחר ביום, 252 ימי מסחר בשנה)
+BARS_PER_YEAR = {
+    '1m': 252 * 390, '5m': 252 * 78, '15m': 252 * 26,
+    '1d': 252, '1wk': 52, '1mo': 12
+}
+
+def load_config(config_path='config.json'):
+    """טעינת config.json (אם קיים) - פרמטרי הניתוח וספי הסיכון"""
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("⚠️ Could not load %s, using default parameters: %s", config_path, e)
+        return {}
+
+def annualization_factor(interval):
+    """מקדם להמרת סטיית תקן של תשואה לבר לתנודתיות שנתית"""
+    return BARS_PER_YEAR.get(interval, 252) ** 0.5
+
+def is_intraday(interval):
+    return interval in INTRADAY_INTERVALS
 
 class StockDataFetcher:
     """מחלקה לאיסוף נתוני מניות מ-finance-query.com API"""
     
     def __init__(self, config_path='config.json'):
-        self.base_url = 'https://finance-query.com/v2'
+        # FINANCE_QUERY_URL מאפשר להפנות לשרת מקומי (mock_finance_query.py) לבדיקות ובנצ'מרקים
+        self.base_url = os.environ.get('FINANCE_QUERY_URL', 'https://finance-query.com/v2').rstrip('/')
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'FinanceQueryPython/1.0',
             'Accept': 'application/json'
         })
-        print("✅ StockDataFetcher initialized with finance-query.com")
+        logger.info("✅ StockDataFetcher initialized with %s", self.base_url)
 
     def _get(self, endpoint, params=None):
         """פונקציית עזר לביצוע בקשות GET"""
@@ -28,14 +74,14 @@ class StockDataFetcher:
             if r.status_code == 200:
                 return r.json()
             else:
-                print(f"❌ API Error ({r.status_code}) for {endpoint}: {r.text}")
+                logger.warning("❌ API Error (%s) for %s: %s", r.status_code, endpoint, r.text[:200])
         except Exception as e:
-            print(f"❌ Connection Error for {endpoint}: {e}")
+            logger.warning("❌ Connection Error for %s: %s", endpoint, e)
         return None
 
     def get_stock_data(self, symbol, range='5y', interval='1d'):
         """קבלת נתוני מחירים היסטוריים (Candles)"""
-        print(f"Fetching {range} chart for {symbol}...")
+        logger.debug("Fetching %s chart for %s...", range, symbol)
         res = self._get(f"chart/{symbol}", params={'range': range, 'interval': interval})
         
         if res and 'candles' in res:
@@ -46,69 +92,84 @@ class StockDataFetcher:
                 df.set_index('timestamp', inplace=True)
                 # הבטחת שמות עמודות תואמים למנתח הטכני
                 df = df[['open', 'high', 'low', 'close', 'volume']]
-                print(f"✅ Chart fetched from finance-query for {symbol}")
+                logger.debug("✅ Chart fetched from finance-query for %s", symbol)
                 return df
                 
-        print(f"❌ Failed to fetch chart for {symbol}")
+        logger.warning("❌ Failed to fetch chart for %s", symbol)
         return None
 
+    # שדות פרופיל (משתנים לעיתים רחוקות) ושדות מדדים (משתנים עם המחיר) - מפתח אצלנו -> מפתח ב-API
+    PROFILE_FIELDS = {
+        'description': 'longBusinessSummary', 'sector': 'sector', 'industry': 'industry'
+    }
+    METRIC_FIELDS = {
+        'market_cap': 'marketCap', 'pe_ratio': 'trailingPE', 'beta': 'beta',
+        'dividend_yield': 'dividendYield', 'profit_margin': 'profitMargins',
+        'high_52w': 'fiftyTwoWeekHigh', 'low_52w': 'fiftyTwoWeekLow'
+    }
+
     def get_company_overview(self, symbol):
         """קבלת מידע פונדמנטלי (Quote Data)"""
-        print(f"Fetching info for {symbol}...")
+        logger.debug("Fetching info for %s...", symbol)
         res = self._get(f"quote/{symbol}")
         if res:
-            # המרה למבנה שה-Frontend (app.js) מצפה לו - snake_case
-            return {
-                'name': res.get('longName', res.get('shortName', symbol)),
-                'symbol': symbol,
-                'description': res.get('longBusinessSummary', 'N/A'),
-                'sector': res.get('sector', 'N/A'),
-                'industry': res.get('industry', 'N/A'),
-                'market_cap': res.get('marketCap', 'N/A'),
-                'pe_ratio': res.get('trailingPE', 'N/A'),
-                'beta': res.get('beta', 'N/A'),
-                'dividend_yield': res.get('dividendYield', 'N/A'),
-                'profit_margin': res.get('profitMargins', 'N/A'),
-                'high_52w': res.get('fiftyTwoWeekHigh', 'N/A'),
-                'low_52w': res.get('fiftyTwoWeekLow', 'N/A')
-            }
+            return self.overview_from_quote(res, symbol)
         return {'name': symbol, 'symbol': symbol}
 
-    def get_stock_news(self, symbol):
-        """קבלת חדשות אחרונות"""
-        print(f"Fetching news for {symbol}...")
+    @classmethod
+    def overview_from_quote(cls, res, symbol):
+        """המרה למבנה שה-Frontend (app.js) מצפה לו - snake_case"""
+        overview = {
+            'name': res.get('longName', res.get('shortName', symbol)),
+            'symbol': symbol
+        }
+        for key, api_key in {**cls.PROFILE_FIELDS, **cls.METRIC_FIELDS}.items():
+            overview[key] = res.get(api_key, 'N/A')
+        return overview
+
+    def get_news_items(self, symbol):
+        """רשימת החדשות הגולמית מה-API"""
+        logger.debug("Fetching news for %s...", symbol)
         res = self._get(f"news/{symbol}")
-        formatted_news = []
+        return res if isinstance(res, list) else []
+
+    @staticmethod
+    def format_news_item(story):
+        """המרת כתבה בודדת למבנה שה-Frontend מצפה לו"""
+        title = story.get('title', 'No Title')
         
-        if res and isinstance(res, list):
-            for item in res[:5]: # 5 כתבות ראשונות
-                story = item.get('content', item)
-                title = story.get('title', 'No Title')
-                
-                # תאריך (יכול להיות ISO או Timestamp)
-                published_at = story.get('pubDate', story.get('providerPublishTime', ''))
-                if not published_at:
-                    # Try to find date in different spots
-                    published_at = story.get('published_at', '')
-                    
-                if isinstance(published_at, int):
-                    # Convert timestamp to human readable
-                    dt = datetime.fromtimestamp(published_at)
-                    published_at = dt.strftime('%d.%m.%Y')
-                elif isinstance(published_at, str) and published_at:
-                    try:
-                        dt = datetime.fromisoformat(published_at.replace('Z', '+00:00'))
-                        published_at = dt.strftime('%d.%m.%Y')
-                    except: pass
-                
-                formatted_news.append({
-                    'title': title,
-                    'publisher': story.get('provider', {}).get('displayName', story.get('source', 'Market News')),
-                    'link': story.get('clickThroughUrl', {}).get('url', story.get('link', '#')),
-                    'published': published_at if published_at else 'היום',
-                    'type': 'STORY'
-                })
-        return formatted_news
+        # תאריך (יכול להיות ISO או Timestamp)
+        published_at = story.get('pubDate', story.get('providerPublishTime', ''))
+        if not published_at:
+            # Try to find date in different spots
+            published_at = story.get('published_at', '')
+        
+        published_ts = 0
+        if isinstance(published_at, int):
+            # Convert timestamp to human readable
+            published_ts = published_at
+            dt = datetime.fromtimestamp(published_at)
+            published_at = dt.strftime('%d.%m.%Y')
+        elif isinstance(published_at, str) and published_at:
+            try:
+                dt = datetime.fromisoformat(published_at.replace('Z', '+00:00'))
+                published_ts = int(dt.timestamp())
+                published_at = dt.strftime('%d.%m.%Y')
+            except: pass
+        
+        return {
+            'title': title,
+            'publisher': (story.get('provider') or {}).get('displayName', story.get('source', 'Market News')),
+            'link': (story.get('clickThroughUrl') or {}).get('url', story.get('link', '#')),
+            'published': published_at if published_at else 'היום',
+            'published_ts': published_ts,
+            'type': 'STORY'
+        }
+
+    def get_stock_news(self, symbol):
+        """קבלת חדשות אחרונות"""
+        # 5 כתבות ראשונות
+        return [self.format_news_item(item.get('content', item)) for item in self.get_news_items(symbol)[:5]]
 
     def get_batch_quotes(self, symbols):
         """קבלת מחירים ונתונים פונדמנטליים עבור קבוצת מניות בבקשה אחת"""
@@ -132,74 +193,88 @@ class StockDataFetcher:
     
 class TechnicalAnalyzer:
     """ניתוח טכני בסיסי"""
+
+    # כל האינדיקטורים ה"קלאסיים" - למי שקורא ל-calculate_indicators בלי לפרט עמודות
+    DEFAULT_INDICATORS = (
+        'sma_20', 'sma_50', 'rsi', 'macd', 'macd_signal', 'macd_diff',
+        'pivot', 'r1', 's1', 'resistance_level', 'support_level'
+    )
     
-    def calculate_indicators(self, df):
-        """חישוב אינדיקטורים טכניים"""
-        if df is None or len(df) < 20:
+    def __init__(self, params=None):
+        # analysis_parameters מה-config (חלונות SMA, RSI ו-MACD)
+        self.params = indicators.parameters(params)
+    
+    def calculate_indicators(self, df, columns=DEFAULT_INDICATORS):
+        """חישוב אינדיקטורים טכניים - רק העמודות המבוקשות (והתלויות שלהן) שעוד לא חושבו"""
+        if df is None or len(df) < self.MIN_BARS:
             return df
             
         try:
-            # ממוצעים נעים
-            df['sma_20'] = df['close'].rolling(window=20).mean()
-            df['sma_50'] = df['close'].rolling(window=50).mean()
-            
-            # RSI
-            delta = df['close'].diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-            rs = gain / loss
-            df['rsi'] = 100 - (100 / (1 + rs))
-            
-            # MACD (פשוט)
-            exp1 = df['close'].ewm(span=12, adjust=False).mean()
-            exp2 = df['close'].ewm(span=26, adjust=False).mean()
-            df['macd'] = exp1 - exp2
-            df['macd_signal'] = df['macd'].ewm(span=9, adjust=False).mean()
-            df['macd_diff'] = df['macd'] - df['macd_signal']
-            
-            # רמות תמיכה והתנגדות בסיסיות (פיבוט)
-            df['pivot'] = (df['high'] + df['low'] + df['close']) / 3
-            df['r1'] = 2 * df['pivot'] - df['low']
-            df['s1'] = 2 * df['pivot'] - df['high']
-            
-            # רמות "קיר" (התנגדות) ו"רצפה" (תמיכה) חזקות
-            df['resistance_level'] = df['high'].rolling(window=20).max()
-            df['support_level'] = df['low'].rolling(window=20).min()
-            
+            indicators.ensure(df, *columns, params=self.params)
         except Exception as e:
-            print(f"Error calculating indicators: {e}")
+            logger.error("Error calculating indicators: %s", e)
             
         return df
 
+    # מתחת ל-MIN_BARS לא מחושב אף אינדיקטור; מגמה דורשת TREND_MIN_BARS
+    MIN_BARS = 20
+    TREND_MIN_BARS = 50
+
+    # קודי המגמה והמומנטום (int8) - אינדקס בטבלאות האלה; מערכים של קודים ממופים בלי לולאה
+    TRENDS = ("Neutral", "Strong Uptrend", "Uptrend", "Strong Downtrend", "Downtrend", "Unknown")
+    MOMENTUMS = ("Neutral", "Overbought", "Oversold")
+
+    @staticmethod
+    def trend_codes(close, sma_20, sma_50, bars=None):
+        """כללי המגמה בצורה וקטורית (מערכים או סקלרים) כקודים ב-TRENDS - המקור היחיד שלהם, גם לבקטסט,
+        לייצוא ולרשימות מעקב. SMA חסר (NaN) נותן Neutral; bars (מספר הברים עד אותה נקודה)
+        מתחת ל-TREND_MIN_BARS - Unknown"""
+        close, sma_20, sma_50 = np.broadcast_arrays(*(np.asarray(a, dtype=np.float64) for a in (close, sma_20, sma_50)))
+        up, down = close > sma_20, close < sma_20
+        codes = np.select([up & (sma_20 > sma_50), up, down & (sma_20 < sma_50), down], [1, 2, 3, 4], 0).astype(np.int8)
+        codes[np.isnan(sma_20) | np.isnan(sma_50)] = 0
+        if bars is not None:
+            codes[np.broadcast_to(np.asarray(bars) < TechnicalAnalyzer.TREND_MIN_BARS, codes.shape)] = 5
+        return codes
+
+    @classmethod
+    def trend_signals(cls, close, sma_20, sma_50, bars=None):
+        """trend_codes כשמות ("Strong Uptrend"...) - מערך object"""
+        return cls.names(cls.TRENDS, cls.trend_codes(close, sma_20, sma_50, bars))
+
+    @staticmethod
+    def momentum_codes(rsi, params):
+        """כללי המומנטום בצורה וקטורית כקודים ב-MOMENTUMS: RSI מול ספי ה-overbought/oversold; NaN נותן Neutral"""
+        rsi = np.asarray(rsi, dtype=np.float64)
+        return np.select([rsi > params['rsi_overbought'], rsi < params['rsi_oversold']], [1, 2], 0).astype(np.int8)
+
+    @classmethod
+    def momentum_signals(cls, rsi, params):
+        return cls.names(cls.MOMENTUMS, cls.momentum_codes(rsi, params))
+
+    @staticmethod
+    def names(table, codes):
+        """קודים -> מערך object של השמות מהטבלה, באותה צורה (גם 0-d, כך ש-[()] נותן str)"""
+        codes = np.asarray(codes)
+        return np.asarray(table, dtype=object)[codes.ravel()].reshape(codes.shape)
+
     def get_trend_signal(self, df):
-        if df is None or len(df) < 50: return "Unknown"
+        if df is None or len(df) < self.TREND_MIN_BARS: return "Unknown"
+        self.calculate_indicators(df, ('sma_20', 'sma_50'))
         last = df.iloc[-1]
-        
-        # Check for NaN and handle
-        try:
-            if pd.isna(last['sma_20']) or pd.isna(last['sma_50']):
-                return "Neutral"
-                
-            if last['close'] > last['sma_20'] > last['sma_50']: return "Strong Uptrend"
-            if last['close'] > last['sma_20']: return "Uptrend"
-            if last['close'] < last['sma_20'] < last['sma_50']: return "Strong Downtrend"
-            if last['close'] < last['sma_20']: return "Downtrend"
-        except: pass
-        return "Neutral"
+        return self.trend_signals(last['close'], last.get('sma_20', np.nan), last.get('sma_50', np.nan))[()]
 
     def get_momentum_signal(self, df):
+        self.calculate_indicators(df, ('rsi',))
         if df is None or 'rsi' not in df.columns: return "Unknown"
-        rsi = df['rsi'].iloc[-1]
-        if pd.isna(rsi): return "Neutral"
-        if rsi > 70: return "Overbought"
-        if rsi < 30: return "Oversold"
-        return "Neutral"
+        return self.momentum_signals(df['rsi'].iloc[-1], self.params)[()]
 
 class FundamentalAnalyzer:
     """ניתוח פונדמנטלי מהיר"""
     def analyze_fundamentals(self, overview):
         score = 0
-        pe = overview.get('PERatio')
+        # ה-overview של finance-query משתמש ב-pe_ratio (PERatio נשאר מהפורמט של Alpha Vantage)
+        pe = overview.get('pe_ratio', overview.get('PERatio'))
         try:
             pe_val = float(pe) if pe and pe != 'N/A' else None
             if pe_val:
@@ -211,119 +286,122 @@ class FundamentalAnalyzer:
         return {
             "score": score,
             "pe_rating": "Good" if score > 0 else "Fair",
-            "market_cap": overview.get('MarketCapitalization', 'N/A')
+            "market_cap": overview.get('market_cap', overview.get('MarketCapitalization', 'N/A'))
         }
 
+def score_recommendations(score, strong_buy=3):
+    """מיפוי ציון מספרי להמלצה - וקטורי (סף ה-Strong Buy שונה בין הניתוח המלא לסריקה)"""
+    score = np.asarray(score)
+    return np.select(
+        [score >= strong_buy, score >= 1, score <= -2, score <= -1], ["Strong Buy", "Buy", "Strong Sell", "Sell"], "Hold"
+    ).astype(object)
+
+def score_to_recommendation(score, strong_buy=3):
+    return score_recommendations(score, strong_buy)[()]
+
 class RecommendationEngine:
     """מנוע המלצות חכם"""
+    # Trend score based on signal
+    TREND_SCORES = {"Strong Uptrend": 2, "Uptrend": 1, "Downtrend": -1, "Strong Downtrend": -2, "Neutral": 0, "Unknown": 0}
+    # אותו ניקוד לפי קוד מגמה (TechnicalAnalyzer.TRENDS) - TREND_SCORE_LUT[codes]
+    TREND_SCORE_LUT = np.array(list(map(TREND_SCORES.get, TechnicalAnalyzer.TRENDS)), dtype=np.int64)
+
+    @classmethod
+    def recommendations(cls, trend_codes, fundamental_score):
+        """ההמלצה לפי קוד מגמה + ציון פונדמנטלי - וקטורי (מערכים או סקלרים), משותף לניתוח ולייצוא"""
+        fundamental = np.asarray(fundamental_score)
+        total = cls.TREND_SCORE_LUT[trend_codes] + fundamental
+        return {
+            "short_term": score_recommendations(total),
+            "long_term": np.where(fundamental > 0, "Buy & Hold", "Hold").astype(object),
+            "short_term_confidence": np.where(np.abs(total) >= 2, "High", "Medium").astype(object),
+            "signal_strength": total
+        }
+
     def generate_recommendation(self, symbol, df, overview, technical, risk, fundamental):
-        # Trend score based on signal
-        trend_map = {"Strong Uptrend": 2, "Uptrend": 1, "Downtrend": -1, "Strong Downtrend": -2, "Neutral": 0, "Unknown": 0}
-        trend_score = trend_map.get(technical.get('trend'), 0)
-        
-        total_score = trend_score + fundamental.get('score', 0)
-        
-        rec = "Hold"
-        if total_score >= 3: rec = "Strong Buy"
-        elif total_score >= 1: rec = "Buy"
-        elif total_score <= -2: rec = "Strong Sell"
-        elif total_score <= -1: rec = "Sell"
-        
+        trend = technical.get('trend')
+        code = TechnicalAnalyzer.TRENDS.index(trend) if trend in TechnicalAnalyzer.TRENDS else 0
+        rec = self.recommendations(code, fundamental.get('score', 0))
         return {
             "symbol": symbol,
-            "short_term": rec,
-            "long_term": "Buy & Hold" if fundamental.get('score', 0) > 0 else "Hold",
-            "short_term_confidence": "High" if abs(total_score) >= 2 else "Medium",
-            "signal_strength": total_score
+            "short_term": rec["short_term"][()],
+            "long_term": rec["long_term"][()],
+            "short_term_confidence": rec["short_term_confidence"][()],
+            "signal_strength": int(rec["signal_strength"])
         }
 
-    def _generate_detailed_analysis(self, symbol, df, technical, risk, fundamental, overview):
+    def __init__(self):
+        self.text = AnalysisTemplates()
+
+    def _generate_detailed_analysis(self, symbol, df, technical, risk, fundamental, overview, lang='he'):
         current_price = df['close'].iloc[-1]
         res_level = df['resistance_level'].iloc[-1] if 'resistance_level' in df.columns else None
         sup_level = df['support_level'].iloc[-1] if 'support_level' in df.columns else None
+        if sup_level is not None and pd.isna(sup_level): sup_level = None
+        if res_level is not None and pd.isna(res_level): res_level = None
         
-        trend = technical.get('trend', 'Neutral')
-        momentum = technical.get('momentum', 'Neutral')
-        
-        # תרגום מצב המניה לשפה פשוטה
-        trend_desc = {
-            "Strong Uptrend": "נמצאת בשיא של עוצמה, עם נטייה ברורה למעלה. הקונים שולטים בשוק.",
-            "Uptrend": "בכיוון חיובי, המחיר מטפס בהדרגה אך בעקביות.",
-            "Downtrend": "מראה סימני חולשה, הכיוון הכללי הוא כלפי מטה.",
-            "Strong Downtrend": "נמצאת בנפילה חופשית יחסית, המוכרים לוחצים על המחיר.",
-            "Neutral": "נעה הצידה ללא כיוון ברור, מחכה לחדשות או אירוע משמעותי."
-        }.get(trend, "במצב יציב יחסית.")
-
-        # הסבר על רמות תמיכה והתנגדות (פשוט)
-        support_he = ""
-        if sup_level:
-            dist_sup = ((current_price / sup_level) - 1) * 100
-            support_he = f"**רצפת המחיר (תמיכה):** הרמה שממנה המחיר נוטה 'לקפוץ' חזרה למעלה נמצאת ב-{sup_level:,.2f}$. המרחק מהרצפה הוא כ-{dist_sup:.1f}%. "
-            if dist_sup < 3:
-                support_he += "אנחנו קרובים מאוד לרצפה, מה שמהווה לעיתים נקודת כניסה בטוחה יותר."
-            else:
-                support_he += "המחיר כרגע מבוסס מעל הרצפה, מה שמעיד על ביטחון מסוים."
-
-        resistance_he = ""
-        if res_level:
-            dist_res = ((res_level / current_price) - 1) * 100
-            resistance_he = f"**תקרת המחיר (התנגדות):** המחיר מתקשה לפרוץ את רמת ה-{res_level:,.2f}$. המרחק מהתקרה הוא כ-{dist_res:.1f}%. "
-            if dist_res < 3:
-                resistance_he += "המניה 'נוגחת' בתקרה כרגע. פריצה של הרמה הזו עשויה להוביל לזינוק חזק קדימה."
-            else:
-                resistance_he += "יש למניה עוד 'מקום לעלות' עד שתפגוש שוב את התקרה הקרובה."
-
-        # בניית דעת אנליסטים ותחזית מעמיקה
-        forecast = ""
-        if trend in ["Strong Uptrend", "Uptrend"] and momentum != "Overbought":
-            forecast = "התחזית לטווח הקרוב היא **חיובית מאוד**. השילוב של מגמה עולה ללא מצב של 'קניית יתר' מעיד על כך שיש עוד דלק לעליות. אם המחיר יפרוץ את התקרה (התנגדות), נראה כנראה שיאים חדשים."
-        elif trend in ["Strong Downtrend", "Downtrend"] and momentum == "Oversold":
-            forecast = "אנחנו נמצאים במצב מעניין - המניה נופלת, אבל היא כבר 'נמכרה מדי' (Oversold). זהו מצב שלרוב מוביל לקפיצה טכנית כלפי מעלה בימים הקרובים. זהירות נדרשת, אך ייתכן שיש כאן הזדמנות לסיבוב קצר."
-        elif momentum == "Overbought":
-            forecast = "המניה כבר עלתה הרבה ומהר מאוד, והיא נמצאת כרגע ב'קניית יתר'. בדרך כלל, במצב כזה מגיע תיקון קל למטה או תקופה של יציבות לפני המשך עליות. מומלץ לא לרדוף אחרי המחיר בשיא."
-        else:
-            forecast = "כרגע השוק מחפש כיוון. המלצת המערכת היא להמתין לפריצה של תקרת המחיר או הגעה לרצפה כדי לקבל החלטה מושכלת יותר."
-
-        # Pros and Cons Logic
-        pros = []
-        cons = []
-        if trend in ["Strong Uptrend", "Uptrend"]: pros.append("מגמה חיובית ומומנטום חזק.")
-        if fundamental.get('score', 0) > 0: pros.append("נתונים כלכליים טובים - החברה נחשבת לרווחית ויציבה.")
-        if momentum == "Oversold": pros.append("המניה זולה מדי טכנית ('נמכרה מדי'), פוטנציאל לקפיצה.")
+        # המרחקים מהרצפה ומהתקרה (באחוזים) - רק הם והמחירים משתנים בין בקשות
+        dist_sup = ((current_price / sup_level) - 1) * 100 if sup_level else None
+        dist_res = ((res_level / current_price) - 1) * 100 if res_level else None
         
-        if trend in ["Strong Downtrend", "Downtrend"]: cons.append("מגמת ירידה חזקה - הכסף יוצא מהמניה.")
-        if momentum == "Overbought": cons.append("קניית יתר - המחיר גבוה מדי לנקודת זמן זו, סיכון לתיקון מטה.")
-        if risk.get('level') == "High": cons.append("תנודתיות גבוהה - המניה עלולה 'להשתולל' ולהפיל סטופ-לוסים.")
-
-        analysis = [
-            f"### 🎯 ניתוח מומחה ותחזית עבור {symbol}",
-            f"**איך המניה מתנהגת?** {trend_desc}",
-            "",
-            "#### 📊 מה הגרף מספר לנו?",
-            support_he,
-            "",
-            resistance_he,
-            "",
-            "#### 🔮 תחזית ודעת אנליסטים:",
-            forecast,
-            "",
-            "#### ✅ למה כן? (Pros):",
-            "\n".join([f"* {p}" for p in pros]) if pros else "* אין נקודות חוזק בולטות כרגע.",
-            "",
-            "#### ⚠️ למה לא? (Cons):",
-            "\n".join([f"* {c}" for c in cons]) if cons else "* אין נורות אזהרה בולטות כרגע.",
-            "",
-            f"**לסיכום:** המניה נמצאת במצב של **{trend_he_map(trend)}**. המלצתנו המקצועית: **{rec_map(symbol, technical, fundamental)}**."
-        ]
-        
-        return "\n".join(analysis)
+        # שאר הטקסט נגזר ממצב בדיד ונשמר במטמון של מנוע התבניות
+        state = self.text.make_state(
+            technical.get('trend', 'Neutral'), technical.get('momentum', 'Neutral'),
+            risk.get('level'), fundamental.get('score', 0), dist_sup, dist_res
+        )
+        return self.text.render(
+            state, lang, symbol=symbol,
+            sup_level=sup_level or 0, dist_sup=dist_sup or 0,
+            res_level=res_level or 0, dist_res=dist_res or 0
+        )
+
+# תוקף תוצאות הסריקה בזמן מסחר (כשהשוק סגור - עד הפתיחה הבאה)
+SCAN_TTL = timedelta(minutes=5)
+
+# יקום המניות של סריקת השוק
+SCAN_UNIVERSE = [
+    "AAPL", "MSFT", "GOOGL", "AMZN", "META", "NVDA", "TSLA", "AVGO", "ADBE", "NFLX", # US Tech
+    "TSM", "ASML", "SAP", "BABA", "NVO", "SNY", "TM", "HMC", "SONY", "TTE", # Global
+    "JPM", "V", "MA", "WMT", "COST", "PG", "JNJ", "HD", "DIS", "PYPL", # US Traditional
+    "LLY", "UNH", "XOM", "CVX", "ABBV", "PEP", "KO", "BAC", "VZ", "T" # More US
+]
+
+def scan_signals(price, change_pct, sma_50, sma_200, low_52w, high_52w, pe=0, yield_val=0):
+    """ניתוח הסריקה המהירה (מגמה, RSI Proxy וציון -5 עד +5).
+    עובד גם על ערכים בודדים וגם על מערכי numpy - כך שהבקטסט מריץ בדיוק את אותם כללים"""
+    price, change_pct, sma_50, sma_200, low_52w, high_52w, pe, yield_val = (
+        np.asarray(x if x is not None else np.nan, dtype=np.float64)
+        for x in (price, change_pct, sma_50, sma_200, low_52w, high_52w, pe, yield_val)
+    )
+    
+    # --- Deep Technical Analysis ---
+    # מחיר מעל ממוצע 200 זה סימן שורי לטווח ארוך
+    is_bullish_long = (sma_200 != 0) & (price > sma_200)
+    strong_up = price > sma_50 * 1.05
+    strong_down = price < sma_50 * 0.95
+    trend = np.where(strong_down, "Strong Downtrend",
+            np.where(strong_up, "Strong Uptrend",
+            np.where(price > sma_50, "Uptrend", "Downtrend")))
+    
+    # RSI Proxy (0-100) based on 52w high/low
+    range_52w = high_52w - low_52w
+    has_range = range_52w > 0
+    rsi_proxy = np.where(has_range, (price - low_52w) / np.where(has_range, range_52w, 1) * 100, 50)
+    
+    # --- Advanced Scoring System (-5 to +5) ---
+    # Momentum Factors
+    score = (change_pct > 0).astype(np.int64) + (change_pct > 2) + strong_up + is_bullish_long
+    # Value Factors: Strong Value / Fair Value / Very Overvalued
+    score = score + np.select([(pe > 0) & (pe < 18), (pe >= 18) & (pe < 30), pe > 45], [2, 1, -2], 0)
+    # Contrarian Factor (BUY the dip): Oversold - opportunity, Overbought - risky
+    score = score + 2 * (rsi_proxy < 25) - (rsi_proxy > 85)
+    # Dividend / Stability
+    score = score + (yield_val > 0.02)
+    
+    return {"score": score, "trend": trend, "rsi_proxy": rsi_proxy, "is_bullish_long": is_bullish_long}
 
 def trend_he_map(trend):
-    return {
-        "Strong Uptrend": "עוצמה שורית", "Uptrend": "מגמה חיובית",
-        "Downtrend": "מגמה שלילית", "Strong Downtrend": "לחץ מכירות כבד",
-        "Neutral": "חיפוש כיוון"
-    }.get(trend, "נייטרלי")
+    return TEMPLATES['he']['trend_label'].get(trend, TEMPLATES['he']['trend_label_default'])
 
 def rec_map(symbol, technical, fundamental):
     # Helper for summarizing strategy in text
@@ -333,61 +411,144 @@ def rec_map(symbol, technical, fundamental):
 
 class RiskAssessor:
     """הערכת סיכונים"""
-    def assess_risk(self, df, overview):
+    # ספי ברירת מחדל - נדרסים ע"י risk_thresholds ב-config.json
+    # (תנודתיות = סטיית תקן יומית של התשואה; בטא מול השוק)
+    DEFAULT_THRESHOLDS = {
+        "low_volatility": 0.02,
+        "high_volatility": 0.05,
+        "low_beta": 0.8,
+        "high_beta": 1.2
+    }
+
+    def __init__(self, thresholds=None):
+        self.thresholds = {**self.DEFAULT_THRESHOLDS, **(thresholds or {})}
+        self.text = AnalysisTemplates()
+
+    # תנודתיות אחרונה (20 ברים) גבוהה ב-30% מהרגיל -> כניסה הדרגתית
+    DCA_VOLATILITY_RATIO = 1.3
+    # התוויות בשפת ברירת המחדל (הייצוא); analyze_investment_strategy מתרגם לפי lang
+    STRATEGY_LABELS = TEMPLATES[DEFAULT_LANGUAGE]['strategy_labels']
+
+    @staticmethod
+    def risk_levels(daily_volatility, thresholds):
+        """רמת הסיכון לפי סטיית התקן היומית של התשואה - וקטורי (גם לייצוא); NaN נותן Moderate"""
+        volatility = np.asarray(daily_volatility, dtype=np.float64)
+        return np.select(
+            [volatility > thresholds['high_volatility'], volatility < thresholds['low_volatility']],
+            ["High", "Low"], "Moderate"
+        ).astype(object)
+
+    @classmethod
+    def strategy_keys(cls, volatility_ratio, risk_level, above_sma_200):
+        """מפתח האסטרטגיה (dca / lump_sum / aggressive_dca) - וקטורי"""
+        volatility_ratio = np.asarray(volatility_ratio, dtype=np.float64)
+        calm = (np.asarray(risk_level) == "Low") & np.asarray(above_sma_200)
+        return np.select(
+            [volatility_ratio > cls.DCA_VOLATILITY_RATIO, calm], ["dca", "lump_sum"], "aggressive_dca"
+        ).astype(object)
+
+    def assess_risk(self, df, overview, interval='1d'):
         if df is None: return {"level": "Unknown", "factors": []}
         try:
-            volatility = df['close'].pct_change().std() * (252**0.5)
-            level = "Moderate"
-            if volatility > 0.4: level = "High"
-            elif volatility < 0.2: level = "Low"
+            volatility = df['close'].pct_change().std() * annualization_factor(interval)
+            # הספים ב-config הם יומיים - ממירים את התנודתיות השנתית לסטיית תקן יומית
+            daily_volatility = volatility / annualization_factor('1d')
+            level = self.risk_levels(daily_volatility, self.thresholds)[()]
+            
+            factors = ["High Volatility"] if level == "High" else []
+            try:
+                beta = float((overview or {}).get('beta'))
+                if beta > self.thresholds['high_beta']: factors.append(f"High Beta ({beta:.2f})")
+                elif beta < self.thresholds['low_beta']: factors.append(f"Low Beta ({beta:.2f})")
+            except (TypeError, ValueError): pass
             
             return {
                 "level": level,
                 "volatility": f"{volatility*100:.1f}%",
-                "factors": ["High Volatility"] if level == "High" else []
+                "factors": factors
             }
         except:
             return {"level": "Moderate", "volatility": "N/A", "factors": []}
 
-    def analyze_investment_strategy(self, df, risk):
-        """ניתוח אסטרטגיית השקעה אמיתי המבוסס על מצב השוק"""
+    def analyze_investment_strategy(self, df, risk, interval='1d', lang=DEFAULT_LANGUAGE):
+        """ניתוח אסטרטגיית השקעה אמיתי המבוסס על מצב השוק. recommendation בשפה המבוקשת,
+        recommendation_he תמיד בעברית (תאימות לאחור)"""
         if df is None or len(df) < 20:
-            return {"strategy": "N/A", "recommendation_he": "אין מספיק נתונים לחישוב אסטרטגיה."}
+            return self._strategy_result(None, lang)
             
-        # חישוב תנודתיות ב-20 הימים האחרונים (ATR Proxy)
+        # חישוב תנודתיות ב-20 הברים האחרונים (ATR Proxy)
+        annualize = annualization_factor(interval)
         last_20 = df.iloc[-20:]
-        recent_std = last_20['close'].pct_change().std() * (252**0.5)
-        avg_std = df['close'].pct_change().std() * (252**0.5)
+        recent_std = last_20['close'].pct_change().std() * annualize
+        avg_std = df['close'].pct_change().std() * annualize
         
         # האם התנודתיות כרגע חריגה?
         volatility_ratio = recent_std / avg_std if avg_std > 0 else 1
         
-        strategy = ""
-        text = ""
-        
-        if volatility_ratio > 1.3:
-            strategy = "DCA (מנות קטנות)"
-            text = "בשל התנודתיות הגבוהה כרגע (גבוהה ב-{:.0f}% מהרגיל), מומלץ להימנע מכניסה בסכום חד פעמי. הצורה החכמה ביותר היא כניסה הדרגתית (DCA) לאורך 3-6 חודשים כדי למצע את מחיר הקנייה.".format((volatility_ratio-1)*100)
-        elif risk['level'] == "Low" and df['close'].iloc[-1] > df['close'].rolling(200).mean().iloc[-1]:
-            strategy = "Lump Sum (סכום חד פעמי)"
-            text = "המניה מציגה יציבות גבוהה ומגמה שורית חזקה מעל הממוצע ל-200 יום. בהתחשב ברמת הסיכון הנמוכה, ניתן לשקול כניסה משמעותית יותר (Lump Sum) במחיר הנוכחי."
-        else:
-            strategy = "Aggressive DCA"
-            text = "המניה נמצאת בשלב של חיפוש כיוון או תיקון מסוים. מומלץ לקנות את ה-Dips (ירידות חדות) במנות כפולות, אך לשמור על זהירות עד להיערכות מחדש של המגמה הטכנית."
-            
+        sma_200 = indicators.ensure(df, 'sma_200')['sma_200'].iloc[-1]
+        key = self.strategy_keys(volatility_ratio, risk['level'], df['close'].iloc[-1] > sma_200)[()]
         return {
-            "strategy": strategy,
-            "recommendation_he": text,
+            **self._strategy_result(key, lang, excess=(volatility_ratio - 1) * 100),
             "volatility": f"{recent_std*100:.1f}"
         }
 
+    def _strategy_result(self, key, lang, **values):
+        strategy, text = self.text.strategy(key, lang, **values)
+        return {
+            "strategy": strategy,
+            "recommendation": text,
+            "recommendation_he": text if lang == DEFAULT_LANGUAGE else self.text.strategy(key, DEFAULT_LANGUAGE, **values)[1]
+        }
+
 class StockAnalysisSystem:
-    def __init__(self):
-        self.fetcher = StockDataFetcher()
-        self.technical = TechnicalAnalyzer()
+    # העמודות שהניתוח המלא באמת צורך (גרף + טקסט); כל השאר מחושב רק לפי דרישה
+    ANALYSIS_INDICATORS = ('sma_20', 'sma_50', 'rsi', 'resistance_level', 'support_level')
+    # טווחי הזמן של סיכום ה-multi-timeframe: שם -> period לדגימה מחדש של הסדרה היומית
+    TIMEFRAMES = (('daily', None), ('weekly', 'W'), ('monthly', 'M'))
+
+    def __init__(self, config_path='config.json'):
+        self._init_analysis(config_path)
+        self.fetcher = StockDataFetcher(config_path)
+        # פרופיל חברה נשמר לימים, מדדים וציון פונדמנטלי - עד הרענון הבא
+        self.fundamentals = FundamentalsStore(self.fetcher, self.fundamental)
+        # עבודות רקע (משיכת חדשות וכו') - thread אחד לכל תהליך
+        self.scheduler = BackgroundScheduler()
+        self.news = NewsService(self.fetcher, self.scheduler)
+        # מטמון היסטוריה קומפקטי (float32) - מאפשר להחזיק את כל היקום בזיכרון
+        self.candles = CandleStore(self.fetcher, params=self.technical.params)
+        self.intraday = IntradayStore({k: cap for k, (_, cap) in INTRADAY_INTERVALS.items()})
+        # תוצאות הסריקה האחרונה גם בזיכרון (חוסך קריאת קובץ בכל בקשה)
+        self.scan_timestamp = None
+        self.scan_results = None
+        # COMPUTE_WORKERS>0: שלב החישוב של analyze_stock רץ בתהליכים נפרדים (נרות ב-shared memory)
+        workers = int(os.environ.get('COMPUTE_WORKERS', '0') or 0)
+        self.compute_pool = ComputePool(workers, config_path) if workers > 0 else None
+
+    def _init_analysis(self, config_path):
+        self.config = load_config(config_path)
+        self.technical = TechnicalAnalyzer(self.config.get('analysis_parameters'))
         self.fundamental = FundamentalAnalyzer()
         self.recommender = RecommendationEngine()
-        self.risk = RiskAssessor()
+        self.risk = RiskAssessor(self.config.get('risk_thresholds'))
+
+    @classmethod
+    def compute_only(cls, config_path='config.json'):
+        """מופע לחישוב בלבד (בתהליכי ה-compute pool): בלי fetcher, מטמונים ו-threads ברקע"""
+        system = cls.__new__(cls)
+        system._init_analysis(config_path)
+        system.compute_pool = None
+        return system
+
+    def _get_intraday_data(self, symbol, interval):
+        """נרות תוך-יומיים מתוך החוצץ המעגלי - אחרי המילוי הראשון נמשך רק היום האחרון"""
+        buf = self.intraday.buffer(symbol, interval)
+        fetched = self.intraday.fetched.get((symbol, interval))
+        # אחרי הסגירה אין נרות חדשים עד הפתיחה הבאה - החוצץ מוגש כמו שהוא
+        if len(buf) == 0 or fetched is None or not NYSE.is_fresh(fetched, timedelta(0)):
+            fetch_range = INTRADAY_INTERVALS[interval][0] if len(buf) == 0 else '1d'
+            buf.extend_frame(self.fetcher.get_stock_data(symbol, range=fetch_range, interval=interval))
+            self.intraday.fetched[(symbol, interval)] = datetime.now()
+        return buf.to_frame() if len(buf) else None
 
     def _calculate_performance(self, df):
         if df is None or len(df) < 2: return {}
@@ -431,32 +592,96 @@ class StockAnalysisSystem:
             return {k: v for k, v in results.items() if v}
         except: return {}
 
-    def _prepare_chart_data(self, df):
+    def multi_timeframe(self, candles):
+        """מגמה ומומנטום ביומי/שבועי/חודשי מאותה סדרה יומית שמורה, והאם טווחי הזמן מסכימים"""
+        if candles is None:
+            return None
+        timeframes = {}
+        for name, period in self.TIMEFRAMES:
+            bars = candles if period is None else candles.resample(period)
+            df = bars.to_frame(('sma_20', 'sma_50', 'rsi'))
+            rsi = df['rsi'].iloc[-1] if len(df) else None
+            timeframes[name] = {
+                "trend": self.technical.get_trend_signal(df),
+                "momentum": self.technical.get_momentum_signal(df),
+                "rsi": float(rsi) if rsi is not None and not pd.isna(rsi) else None,
+                "bars": len(df)
+            }
+
+        directions = [1 if 'Uptrend' in t["trend"] else -1 if 'Downtrend' in t["trend"] else 0
+                      for t in timeframes.values()]
+        score = sum(directions)
+        if score == len(directions):
+            alignment = "Bullish"
+        elif score == -len(directions):
+            alignment = "Bearish"
+        elif score > 0:
+            alignment = "Leaning Bullish"
+        elif score < 0:
+            alignment = "Leaning Bearish"
+        else:
+            alignment = "Mixed"
+        return {
+            "timeframes": timeframes,
+            "alignment": alignment,
+            "score": score,
+            "aligned": max(directions.count(1), directions.count(-1))
+        }
+
+    def chart_data(self, symbol, range='5y', interval='1d', max_points=None):
+        """נתוני גרף לטווח: חיתוך של הסדרה השמורה (עם אינדיקטורים מחושבים על כל ההיסטוריה),
+        ומשיכה נפרדת רק לטווח שהסדרה השמורה לא מכסה"""
+        candles = self.candles.get(symbol, interval=interval)
+        start = range_start(candles.index, range) if candles is not None else None
+        if start is not None:
+            df = candles.to_frame(self.ANALYSIS_INDICATORS).iloc[start:]
+        else:
+            df = self.candles.get_frame(symbol, range=range, interval=interval)
+            if df is None or df.empty:
+                return None
+            df = self.technical.calculate_indicators(df, self.ANALYSIS_INDICATORS)
+        return self._prepare_chart_data(df, interval, max_points)
+
+    def _prepare_chart_data(self, df, interval='1d', max_points=None):
+        """נתוני הגרף; עם max_points סדרה ארוכה מדוללת (LTTB לקו, נר מצטבר לכל דלי) -
+        הגרף מצייר בערך נקודה לפיקסל, אז מעבר לזה הנקודות רק מגדילות את התשובה ואת זמן הציור"""
         if df is None or df.empty: return {"dates": [], "prices": [], "sma_20": [], "sma_50": []}
         try:
             # הבטחת פורמט תאריכים תקין
             if not isinstance(df.index, pd.DatetimeIndex):
                 df.index = pd.to_datetime(df.index)
-                
+            # בנרות תוך-יומיים צריך גם את השעה
+            date_fmt = '%Y-%m-%dT%H:%M' if is_intraday(interval) else '%Y-%m-%d'
+
+            o, h, l, c = (df[col].to_numpy(dtype=np.float64) for col in ('open', 'high', 'low', 'close'))
+            # points: הברים שמוצגים בקו (ותאריכי הגרף); הנרות מצטברים מהדליים שלהם
+            points = np.arange(len(df))
+            candle_close = c
+            if max_points and len(df) > max_points:
+                points, starts = downsample.lttb(c, max_points)
+                o, h, l, candle_close = downsample.ohlc(o, h, l, c, starts)
+            dates = df.index[points].strftime(date_fmt).tolist()
+
+            def line(name):
+                if name not in df.columns:
+                    return []
+                values = df[name].to_numpy(dtype=np.float64)[points]
+                return np.where(np.isnan(values), None, values).tolist()
+
             return {
-                "dates": df.index.strftime('%Y-%m-%d').tolist(),
-                "prices": df['close'].tolist(),
-                "sma_20": [float(x) if not pd.isna(x) else None for x in df['sma_20']] if 'sma_20' in df.columns else [],
-                "sma_50": [float(x) if not pd.isna(x) else None for x in df['sma_50']] if 'sma_50' in df.columns else [],
+                "dates": dates,
+                "prices": c[points].tolist(),
+                "sma_20": line('sma_20'),
+                "sma_50": line('sma_50'),
                 "resistance": float(df['resistance_level'].iloc[-1]) if 'resistance_level' in df.columns else None,
                 "support": float(df['support_level'].iloc[-1]) if 'support_level' in df.columns else None,
                 "candles": [
-                    {
-                        "t": idx.strftime('%Y-%m-%d'),
-                        "o": float(row.open),
-                        "h": float(row.high),
-                        "l": float(row.low),
-                        "c": float(row.close)
-                    } for idx, row in df.iterrows()
+                    {"t": t, "o": o_, "h": h_, "l": l_, "c": c_}
+                    for t, o_, h_, l_, c_ in zip(dates, o.tolist(), h.tolist(), l.tolist(), candle_close.tolist())
                 ]
             }
         except Exception as e:
-            print(f"Error preparing chart data: {e}")
+            logger.exception("Error preparing chart data: %s", e)
             return {"dates": [], "prices": [], "sma_20": [], "sma_50": []}
 
     def _clean_data(self, data):
@@ -471,183 +696,207 @@ class StockAnalysisSystem:
             return float(data)
         return data
 
-    def analyze_stock(self, symbol):
-        """ניתוח מקיף של מניה - הכל דרך finance-query API"""
-        print(f"🚀 Starting analysis for {symbol}...")
+    def analyze_stock(self, symbol, interval='1d', lang='he', max_points=None):
+        """ניתוח מקיף של מניה - הכל דרך finance-query API (max_points - דילול הגרף)"""
+        logger.debug("🚀 Starting analysis for %s (%s)...", symbol, interval)
+        if interval not in SUPPORTED_INTERVALS:
+            return {"error": f"Unsupported interval: {interval}"}
         
         try:
-            # 1. איסוף נתונים
-            df = self.fetcher.get_stock_data(symbol)
+            # 1. איסוף נתונים (I/O - תמיד ב-thread של הבקשה)
+            with span('analyze.fetch_chart'):
+                if is_intraday(interval):
+                    daily = None
+                    df = self._get_intraday_data(symbol, interval)
+                else:
+                    # שבועי/חודשי נגזרים מהסדרה היומית השמורה
+                    daily = self.candles.get(symbol)
+                    df = daily.for_interval(interval).to_frame() if daily is not None else None
             if df is None or df.empty:
                 return {"error": f"Could not fetch data for {symbol}. Symbol might be invalid."}
-                
-            overview = self.fetcher.get_company_overview(symbol)
 
-            # 2. חישוב אינדיקטורים
-            df = self.technical.calculate_indicators(df)
+            with span('analyze.fetch_quote'):
+                overview, fundamental_analysis = self.fundamentals.get(symbol)
+            # חדשות מהאינדקס המקומי בלבד - המשיכה עצמה רצה ברקע (רק מניה שנמצאה נכנסת למעקב)
+            with span('analyze.fetch_news'):
+                self.news.watch(symbol)
+                news = self.news.latest(symbol)
+
+            # 2. שלב החישוב (CPU) - בתהליך נפרד אם הוגדר compute pool
+            if self.compute_pool is not None and daily is not None:
+                with span('analyze.compute_pool'):
+                    result = self.compute_pool.analyze(daily, symbol, interval, overview, fundamental_analysis,
+                                                       news, lang, max_points)
+            else:
+                result = self._analyze_frame(symbol, df, daily, interval, overview, fundamental_analysis, news, lang,
+                                             max_points)
+            logger.debug("✅ Analysis complete for %s", symbol)
+            return result
             
+        except Exception as e:
+            logger.exception("❌ CRITICAL ERROR in analyze_stock for %s: %s", symbol, e)
+            return {"error": str(e)}
+
+    def _analyze_frame(self, symbol, df, daily, interval, overview, fundamental_analysis, news, lang='he',
+                       max_points=None):
+        """שלב החישוב של analyze_stock: אינדיקטורים, סיכון, טקסט וגרף - בלי I/O,
+        כך שהוא רץ זהה ב-thread של הבקשה ובתהליך של ה-compute pool"""
+        # חישוב אינדיקטורים (רק מה שהניתוח צורך)
+        with span('analyze.indicators'):
+            df = self.technical.calculate_indicators(df, self.ANALYSIS_INDICATORS)
+
             # 3. ניתוח רכיבים
             technical_signals = {
                 "trend": self.technical.get_trend_signal(df),
                 "momentum": self.technical.get_momentum_signal(df)
             }
-            fundamental_analysis = self.fundamental.analyze_fundamentals(overview)
-            risk_assessment = self.risk.assess_risk(df, overview)
+        with span('analyze.risk'):
+            risk_assessment = self.risk.assess_risk(df, overview, interval)
             performance = self._calculate_performance(df)
-            news = self.fetcher.get_stock_news(symbol)
-            investment_strategy = self.risk.analyze_investment_strategy(df, risk_assessment)
+            investment_strategy = self.risk.analyze_investment_strategy(df, risk_assessment, interval, lang)
 
+        with span('analyze.text'):
             # 4. המלצה סופית
             recommendation = self.recommender.generate_recommendation(
                 symbol, df, overview, technical_signals, risk_assessment, fundamental_analysis
             )
-            
+
             # 5. ניתוח מפורט
             detailed_explanation = self.recommender._generate_detailed_analysis(
-                symbol, df, technical_signals, risk_assessment, fundamental_analysis, overview
+                symbol, df, technical_signals, risk_assessment, fundamental_analysis, overview, lang
             )
+            # detailed_analysis_he נשאר עברית לתאימות לאחור; הטקסט בשפה המבוקשת ב-detailed_analysis
+            detailed_he = detailed_explanation if lang == DEFAULT_LANGUAGE else \
+                self.recommender._generate_detailed_analysis(
+                    symbol, df, technical_signals, risk_assessment, fundamental_analysis, overview, DEFAULT_LANGUAGE
+                )
+
+        # 6. בניית התוצאה הסופית
+        current_price = float(df['close'].iloc[-1])
+        prev_close = float(df['close'].iloc[-2]) if len(df) > 1 else current_price
+        change_percent = ((current_price / prev_close) - 1) * 100
+        with span('analyze.chart_data'):
+            chart_data = self._prepare_chart_data(df, interval, max_points)
+
+        result = {
+            "recommendation": {
+                "symbol": symbol,
+                "company_name": overview.get('name', symbol),
+                "current_price": current_price,
+                "short_term": recommendation.get('short_term', 'Hold'),
+                "long_term": recommendation.get('long_term', 'Hold'),
+                "short_term_confidence": recommendation.get('short_term_confidence', 'Medium'),
+                "explanation": detailed_explanation,
+                "detailed_analysis": detailed_explanation,
+                "detailed_analysis_he": detailed_he,
+                "risk_level": risk_assessment.get('level', 'Unknown')
+            },
+            "risk": risk_assessment,
+            "technical": technical_signals,
+            "fundamental": fundamental_analysis,
+            "overview": overview,
+            "price_data": {
+                "current_price": current_price,
+                "change_percent": change_percent,
+                "high_52w": float(df['high'].max()),
+                "low_52w": float(df['low'].min()),
+                "volume": int(df['volume'].iloc[-1])
+            },
+            "performance": performance,
+            "news": news,
+            "investment_strategy": investment_strategy,
+            "interval": interval,
+            "lang": lang,
+            "chart_data": chart_data
+        }
+        if daily is not None:
+            with span('analyze.multi_timeframe'):
+                result["multi_timeframe"] = self.multi_timeframe(daily)
 
-            # 6. בניית התוצאה הסופית
-            current_price = float(df['close'].iloc[-1])
-            prev_close = float(df['close'].iloc[-2]) if len(df) > 1 else current_price
-            change_percent = ((current_price / prev_close) - 1) * 100
-            
-            result = {
-                "recommendation": {
-                    "symbol": symbol,
-                    "company_name": overview.get('name', symbol),
-                    "current_price": current_price,
-                    "short_term": recommendation.get('short_term', 'Hold'),
-                    "long_term": recommendation.get('long_term', 'Hold'),
-                    "short_term_confidence": recommendation.get('short_term_confidence', 'Medium'),
-                    "explanation": detailed_explanation,
-                    "detailed_analysis_he": detailed_explanation,
-                    "risk_level": risk_assessment.get('level', 'Unknown')
-                },
-                "risk": risk_assessment,
-                "technical": technical_signals,
-                "fundamental": fundamental_analysis,
-                "overview": overview,
-                "price_data": {
-                    "current_price": current_price,
-                    "change_percent": change_percent,
-                    "high_52w": float(df['high'].max()),
-                    "low_52w": float(df['low'].min()),
-                    "volume": int(df['volume'].iloc[-1])
-                },
-                "performance": performance,
-                "news": news,
-                "investment_strategy": investment_strategy,
-                "chart_data": self._prepare_chart_data(df)
-            }
-            
-            print(f"✅ Analysis complete for {symbol}")
+        with span('analyze.serialize'):
             return self._clean_data(result)
-            
-        except Exception as e:
-            print(f"❌ CRITICAL ERROR in analyze_stock for {symbol}: {e}")
-            import traceback
-            traceback.print_exc()
-            return {"error": str(e)}
 
     def scan_market_cached(self, limit=40):
         """סריקת שוק עמוקה עם ניתוח רב-ממדי (פונדמנטלי + טכני)"""
         cache_file = "scan_cache.json"
         
-        # 1. ניסיון קריאה מהמטמון (תוקף ל-15 דקות לנתוני שוק חיים)
+        # 1. ניסיון קריאה מהמטמון (SCAN_TTL בזמן מסחר, עד הפתיחה הבאה כשהשוק סגור) - קודם בזיכרון, אחר כך מהקובץ
+        if self.scan_results is not None and NYSE.is_fresh(self.scan_timestamp, SCAN_TTL):
+            cache_hit('scan')
+            return self.scan_results
         try:
             if os.path.exists(cache_file):
                 with open(cache_file, 'r', encoding='utf-8') as f:
                     cache_data = json.load(f)
                     timestamp = datetime.fromisoformat(cache_data["timestamp"])
-                    if datetime.now() - timestamp < timedelta(minutes=15):
-                        print("🚀 Returning cached market scan results")
+                    if NYSE.is_fresh(timestamp, SCAN_TTL):
+                        logger.debug("🚀 Returning cached market scan results")
+                        cache_hit('scan')
+                        self.scan_timestamp, self.scan_results = timestamp, cache_data["results"]
                         return cache_data["results"]
         except: pass
 
         # 2. רשימת מניות גלובלית מורחבת
-        symbols = [
-            "AAPL", "MSFT", "GOOGL", "AMZN", "META", "NVDA", "TSLA", "AVGO", "ADBE", "NFLX", # US Tech
-            "TSM", "ASML", "SAP", "BABA", "NVO", "SNY", "TM", "HMC", "SONY", "TTE", # Global
-            "JPM", "V", "MA", "WMT", "COST", "PG", "JNJ", "HD", "DIS", "PYPL", # US Traditional
-            "LLY", "UNH", "XOM", "CVX", "ABBV", "PEP", "KO", "BAC", "VZ", "T" # More US
-        ][:limit]
+        symbols = SCAN_UNIVERSE[:limit]
         
-        print(f"🔍 Performing DEEP market scan for {len(symbols)} stocks...")
-        quotes = self.fetcher.get_batch_quotes(symbols)
-        recommendations = []
+        cache_miss('scan')
+        with span('scan.total'):
+            return self._scan_market(symbols, cache_file)
+
+    def _scan_market(self, symbols, cache_file):
+        """הסריקה עצמה (כשאין תוצאות תקפות במטמון)"""
+        logger.info("🔍 Performing DEEP market scan for %d stocks...", len(symbols))
+        with span('scan.fetch_quotes'):
+            quotes = self.fetcher.get_batch_quotes(symbols)
+        # ה-batch מרענן גם את המדדים הפונדמנטליים במטמון (בלי בקשה נוספת)
+        self.fundamentals.update_from_quotes(quotes)
+        # מניות שנסרקו (ונמצאו) נכנסות למעקב חדשות ברקע
+        self.news.watch(*[q['symbol'] for q in quotes if q.get('symbol')])
+        with span('scan.score'):
+            recommendations = []
         
-        for q in quotes:
-            symbol = q.get('symbol', 'Unknown')
-            price = q.get('regularMarketPrice', 0)
-            change_pct = q.get('regularMarketChangePercent', 0)
-            sma_50 = q.get('fiftyDayAverage', 0)
-            sma_200 = q.get('twoHundredDayAverage', 0)
-            low_52w = q.get('fiftyTwoWeekLow', price)
-            high_52w = q.get('fiftyTwoWeekHigh', price)
-            pe = q.get('trailingPE', 0)
-            yield_val = q.get('trailingAnnualDividendYield', 0)
-            
-            # --- Deep Technical Analysis ---
-            # מחיר מעל ממוצע 200 זה סימן שורי לטווח ארוך
-            is_bullish_long = price > sma_200 if sma_200 else False
-            trend = "Uptrend" if price > sma_50 else "Downtrend"
-            if price > sma_50 * 1.05: trend = "Strong Uptrend"
-            if price < sma_50 * 0.95: trend = "Strong Downtrend"
-            
-            # RSI Proxy (0-100) based on 52w high/low
-            range_52w = high_52w - low_52w
-            rsi_proxy = ((price - low_52w) / range_52w * 100) if range_52w > 0 else 50
-            
-            # --- Advanced Scoring System (-5 to +5) ---
-            score = 0
-            
-            # Momentum Factors
-            if change_pct > 0: score += 1
-            if change_pct > 2: score += 1
-            if trend == "Strong Uptrend": score += 1
-            if is_bullish_long: score += 1
+            for q in quotes:
+                symbol = q.get('symbol', 'Unknown')
+                price = q.get('regularMarketPrice', 0)
+                change_pct = q.get('regularMarketChangePercent', 0)
+                pe = q.get('trailingPE', 0)
+                yield_val = q.get('trailingAnnualDividendYield', 0)
             
-            # Value Factors
-            if 0 < pe < 18: score += 2 # Strong Value
-            elif 18 <= pe < 30: score += 1 # Fair Value
-            elif pe > 45: score -= 2 # Very Overvalued
+                signals = scan_signals(
+                    price, change_pct,
+                    q.get('fiftyDayAverage', 0), q.get('twoHundredDayAverage', 0),
+                    q.get('fiftyTwoWeekLow', price), q.get('fiftyTwoWeekHigh', price),
+                    pe, yield_val
+                )
+                score = int(signals["score"])
+                trend = str(signals["trend"])
+                rsi_proxy = float(signals["rsi_proxy"])
+                is_bullish_long = bool(signals["is_bullish_long"])
             
-            # Contrarian Factor (BUY the dip)
-            if rsi_proxy < 25: score += 2 # Oversold - opportunity
-            if rsi_proxy > 85: score -= 1 # Overbought - risky
-            
-            # Dividend / Stability
-            if yield_val and yield_val > 0.02: score += 1
-            
-            # Final Recommendation Mapping
-            short_term = "Hold"
-            if score >= 4: short_term = "Strong Buy"
-            elif score >= 1: short_term = "Buy"
-            elif score <= -2: short_term = "Strong Sell"
-            elif score <= -1: short_term = "Sell"
-            
-            recommendations.append({
-                "symbol": symbol,
-                "name": q.get('longName', q.get('shortName', symbol)),
-                "price": price,
-                "change": change_pct,
-                "trend": trend,
-                "rsi": rsi_proxy,
-                "pe": pe if pe else "N/A",
-                "yield": (yield_val * 100) if yield_val else 0,
-                "score": score,
-                "short_term": short_term,
-                "long_term": "Buy" if (score >= 2 or (is_bullish_long and score >= 0)) else "Hold",
-                "risk": "High" if abs(change_pct) > 3 or rsi_proxy > 80 else "Low" if (not is_bullish_long and rsi_proxy < 30) else "Moderate"
-            })
+                recommendations.append({
+                    "symbol": symbol,
+                    "name": q.get('longName', q.get('shortName', symbol)),
+                    # הסקטור מה-batch, או מהפרופיל השמור כשה-batch לא כולל אותו (למפת הסקטורים)
+                    "sector": q.get('sector') or self.fundamentals.profile(symbol).get('sector'),
+                    "price": price,
+                    "change": change_pct,
+                    "trend": trend,
+                    "rsi": rsi_proxy,
+                    "pe": pe if pe else "N/A",
+                    "yield": (yield_val * 100) if yield_val else 0,
+                    "score": score,
+                    "short_term": score_to_recommendation(score, strong_buy=4),
+                    "long_term": "Buy" if (score >= 2 or (is_bullish_long and score >= 0)) else "Hold",
+                    "risk": "High" if abs(change_pct) > 3 or rsi_proxy > 80 else "Low" if (not is_bullish_long and rsi_proxy < 30) else "Moderate"
+                })
             
-        # מיון לפי ציון
-        recommendations.sort(key=lambda x: x["score"], reverse=True)
+            # מיון לפי ציון
+            recommendations.sort(key=lambda x: x["score"], reverse=True)
 
         # 3. שמירה למטמון
+        self.scan_timestamp, self.scan_results = datetime.now(), recommendations
         try:
-            with open(cache_file, 'w', encoding='utf-8') as f:
+            with span('scan.write_cache'), open(cache_file, 'w', encoding='utf-8') as f:
                 json.dump({
                     "timestamp": datetime.now().isoformat(),
                     "results": recommendations
@@ -657,6 +906,7 @@ class StockAnalysisSystem:
         return recommendations
 
 if __name__ == "__main__":
+    setup_logging()
     system = StockAnalysisSystem()
     import sys
     symbol = sys.argv[1] if len(sys.argv) > 1 else "AAPL"
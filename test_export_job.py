@@ -0,0 +1,81 @@
+"""בדיקה ש-export_job.compute_batch (החישוב הווקטורי של הייצוא) נותן לכל מניה את אותן שורות
+ש-analyze_stock נותן לה - על היסטוריות באורכים שונים (מתחת ל-20 ברים, מתחת ל-50, מתחת ל-200 ומעל).
+
+הנתונים סינתטיים (mock_finance_query) - בלי רשת.
+
+שימוש:
+    python test_export_job.py
+    python -m pytest -q test_export_job.py
+"""
+import os
+import sys
+
+import mock_finance_query
+from export_job import compute_batch
+from stock_analyzer import FundamentalAnalyzer, StockAnalysisSystem, StockDataFetcher
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CONFIG = os.path.join(HERE, 'config.json')
+# מניה -> כמה ברים יומיים בהיסטוריה שלה
+LENGTHS = {'AAPL': 10, 'MSFT': 30, 'NVDA': 60, 'TSLA': 150, 'META': 300, 'GOOGL': 1260}
+
+
+class SyntheticFetcher(StockDataFetcher):
+    """StockDataFetcher שעונה מ-mock_finance_query במקום מה-API"""
+
+    def _get(self, endpoint, params=None):
+        kind, _, symbol = endpoint.partition('/')
+        if kind == 'chart':
+            return mock_finance_query.synthetic_chart(symbol, LENGTHS[symbol])
+        if kind == 'quotes':
+            return {'quotes': {s: self._get(f'quote/{s}') for s in params['symbols'].split(',')}}
+        if kind == 'quote':
+            return mock_finance_query.synthetic_quote(symbol, mock_finance_query.synthetic_chart(symbol, LENGTHS[symbol]))
+        return None
+
+
+def compare():
+    """הפרשים בין שורת הייצוא לתוצאת analyze_stock: רשימת (מניה, שדה, ייצוא, analyze_stock)"""
+    fetcher = SyntheticFetcher(CONFIG)
+    frames = {s: fetcher.get_stock_data(s) for s in LENGTHS}
+    quotes = {q['symbol']: q for q in fetcher.get_batch_quotes(list(LENGTHS))}
+    system = StockAnalysisSystem.compute_only(CONFIG)
+    table = compute_batch(frames, quotes, system.technical.params, system.risk.thresholds).set_index('symbol')
+
+    mismatches = []
+    for symbol, df in frames.items():
+        overview = fetcher.overview_from_quote(quotes[symbol], symbol)
+        fundamental = FundamentalAnalyzer().analyze_fundamentals(overview)
+        result = system._analyze_frame(symbol, df.copy(), None, '1d', overview, fundamental, [])
+        row = table.loc[symbol]
+        expected = {
+            'trend': (row['trend'], result['technical']['trend']),
+            'momentum': (row['momentum'], result['technical']['momentum']),
+            'short_term': (row['short_term'], result['recommendation']['short_term']),
+            'long_term': (row['long_term'], result['recommendation']['long_term']),
+            'confidence': (row['confidence'], result['recommendation']['short_term_confidence']),
+            'risk_level': (row['risk_level'], result['risk']['level']),
+            'volatility': (f"{row['volatility'] * 100:.1f}%", result['risk']['volatility']),
+            'strategy': (row['strategy'], result['investment_strategy']['strategy']),
+            'price': (round(row['price'], 4), round(result['price_data']['current_price'], 4)),
+            'high_52w': (round(row['high_52w'], 4), round(result['price_data']['high_52w'], 4)),
+            'low_52w': (round(row['low_52w'], 4), round(result['price_data']['low_52w'], 4)),
+        }
+        for period, values in result['performance'].items():
+            expected[f'perf_{period.lower()}'] = (round(row[f'perf_{period.lower()}'], 6), round(values['change'], 6))
+        mismatches += [(symbol, field, ours, theirs) for field, (ours, theirs) in expected.items() if ours != theirs]
+    return mismatches
+
+
+def test_compute_batch_matches_analyze_stock():
+    mismatches = compare()
+    assert not mismatches, "\n".join(f"{s} {field}: export={a!r} analyze_stock={b!r}" for s, field, a, b in mismatches)
+
+
+if __name__ == "__main__":
+    mismatches = compare()
+    for symbol, field, ours, theirs in mismatches:
+        print(f"❌ {symbol} {field}: export={ours!r} analyze_stock={theirs!r}")
+    if mismatches:
+        sys.exit(1)
+    print(f"✅ compute_batch matches analyze_stock for {len(LENGTHS)} symbols")
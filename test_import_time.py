@@ -0,0 +1,61 @@
+"""בדיקת תקציב זמן ה-import של api_server (cold start של worker).
+
+רץ בתהליך נפרד כדי למדוד import נקי, ומוודא שה-import לא בונה שירותים, לא פותח threads
+ולא טוען את ספריית ta (נטענת רק כשמבקשים אינדיקטור שלה).
+
+שימוש:
+    python test_import_time.py                 (תקציב ברירת מחדל)
+    IMPORT_BUDGET_MS=800 python test_import_time.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+BUDGET_MS = float(os.environ.get('IMPORT_BUDGET_MS', 1500))
+
+PROBE = """
+import json, sys, threading, time
+start = time.perf_counter()
+import api_server
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({
+    "ms": elapsed,
+    "ta_loaded": any(m == 'ta' or m.startswith('ta.') for m in sys.modules),
+    "services_built": [type(s.get()).__name__ for s in api_server.SERVICES if s._instance is not None],
+    "threads": [t.name for t in threading.enumerate() if t is not threading.main_thread()]
+}))
+"""
+
+
+def measure(runs=3):
+    """הזמן הטוב מבין כמה ריצות (הראשונה כוללת גם קומפילציה ל-__pycache__)"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', PROBE], cwd=here, capture_output=True, text=True, check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return min(results, key=lambda r: r["ms"])
+
+
+def check():
+    """מדידה + כל הבדיקות; מחזיר את תוצאת המדידה (AssertionError אם משהו חורג)"""
+    result = measure()
+    assert not result["ta_loaded"], "ta should only be imported when one of its indicators is computed"
+    assert not result["services_built"], f"services built at import time: {result['services_built']}"
+    assert not result["threads"], f"threads started at import time: {result['threads']}"
+    assert result["ms"] <= BUDGET_MS, f"import api_server took {result['ms']:.0f}ms (budget {BUDGET_MS:.0f}ms)"
+    return result
+
+
+def test_import_time():
+    check()
+
+
+if __name__ == "__main__":
+    try:
+        result = check()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"✅ import api_server: {result['ms']:.0f}ms (budget {BUDGET_MS:.0f}ms)")
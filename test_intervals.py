@@ -0,0 +1,53 @@
+"""בדיקה שאינטרוולים שאין להם מקור נרות אמיתי (30m, 1h...) נדחים, במקום להחזיר בשקט את
+הסדרה היומית ולחשב עליה תנודתיות כאילו היא תוך-יומית.
+
+שימוש:
+    python test_intervals.py
+    python -m pytest -q test_intervals.py
+"""
+import sys
+
+import api_server
+from candles import CompactCandles
+from stock_analyzer import BARS_PER_YEAR, SUPPORTED_INTERVALS, StockAnalysisSystem
+from test_export_job import CONFIG, SyntheticFetcher
+
+UNSUPPORTED = ('30m', '1h', '2d', 'bogus')
+
+
+def check():
+    """כל הבדיקות; מחזיר את רשימת האינטרוולים שנבדקו (AssertionError אם משהו לא נדחה)"""
+    assert set(BARS_PER_YEAR) == set(SUPPORTED_INTERVALS), "BARS_PER_YEAR and SUPPORTED_INTERVALS disagree"
+
+    client = api_server.app.test_client()
+    for interval in UNSUPPORTED:
+        for url in (f'/api/analyze/AAPL?interval={interval}', f'/api/chart/AAPL?interval={interval}'):
+            response = client.get(url)
+            assert response.status_code == 400, f"{url} returned {response.status_code}, expected 400"
+    # /api/chart חותך מהסדרה היומית - תוך-יומי לא נתמך בו
+    assert client.get('/api/chart/AAPL?interval=5m').status_code == 400
+
+    system = StockAnalysisSystem.compute_only(CONFIG)
+    daily = CompactCandles.from_frame(SyntheticFetcher(CONFIG).get_stock_data('AAPL'))
+    for interval in UNSUPPORTED:
+        assert "error" in system.analyze_stock('AAPL', interval=interval), f"analyze_stock accepted {interval}"
+        try:
+            daily.for_interval(interval)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"for_interval({interval!r}) returned the daily series")
+    return UNSUPPORTED
+
+
+def test_unsupported_intervals_rejected():
+    check()
+
+
+if __name__ == "__main__":
+    try:
+        checked = check()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"✅ rejected intervals: {', '.join(checked)}")
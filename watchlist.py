@@ -0,0 +1,150 @@
+import secrets
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import indicators
+from market_calendar import NYSE
+from metrics import cache_hit, cache_miss
+from stock_analyzer import TechnicalAnalyzer
+
+
+class WatchlistStore:
+    """שמירת רשימות מעקב ב-SQLite מקומי"""
+
+    def __init__(self, path='watchlists.db'):
+        self.path = path
+        with self._connect() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS watchlists (
+                id TEXT PRIMARY KEY, name TEXT NOT NULL, created TEXT NOT NULL)""")
+            db.execute("""CREATE TABLE IF NOT EXISTS watchlist_symbols (
+                watchlist_id TEXT NOT NULL REFERENCES watchlists(id) ON DELETE CASCADE,
+                symbol TEXT NOT NULL, position INTEGER NOT NULL,
+                PRIMARY KEY (watchlist_id, symbol))""")
+
+    @contextmanager
+    def _connect(self):
+        """חיבור קצר לכל פעולה (בטוח בין threads); commit בסיום וסגירה תמיד"""
+        db = sqlite3.connect(self.path)
+        try:
+            db.execute("PRAGMA foreign_keys = ON")
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def create(self, name, symbols):
+        watchlist_id = secrets.token_urlsafe(6)
+        with self._connect() as db:
+            db.execute("INSERT INTO watchlists VALUES (?, ?, ?)", (watchlist_id, name, datetime.now().isoformat()))
+            self._set_symbols(db, watchlist_id, symbols)
+        return self.get(watchlist_id)
+
+    def get(self, watchlist_id):
+        with self._connect() as db:
+            row = db.execute("SELECT id, name, created FROM watchlists WHERE id = ?", (watchlist_id,)).fetchone()
+            if row is None:
+                return None
+            symbols = [s for (s,) in db.execute(
+                "SELECT symbol FROM watchlist_symbols WHERE watchlist_id = ? ORDER BY position", (watchlist_id,))]
+        return {"id": row[0], "name": row[1], "created": row[2], "symbols": symbols}
+
+    def all(self):
+        with self._connect() as db:
+            ids = [i for (i,) in db.execute("SELECT id FROM watchlists ORDER BY created")]
+        return [self.get(i) for i in ids]
+
+    def update(self, watchlist_id, name=None, symbols=None):
+        with self._connect() as db:
+            if db.execute("SELECT 1 FROM watchlists WHERE id = ?", (watchlist_id,)).fetchone() is None:
+                return None
+            if name:
+                db.execute("UPDATE watchlists SET name = ? WHERE id = ?", (name, watchlist_id))
+            if symbols is not None:
+                self._set_symbols(db, watchlist_id, symbols)
+        return self.get(watchlist_id)
+
+    def delete(self, watchlist_id):
+        with self._connect() as db:
+            return db.execute("DELETE FROM watchlists WHERE id = ?", (watchlist_id,)).rowcount > 0
+
+    @staticmethod
+    def _set_symbols(db, watchlist_id, symbols):
+        db.execute("DELETE FROM watchlist_symbols WHERE watchlist_id = ?", (watchlist_id,))
+        unique = list(dict.fromkeys(s.strip().upper() for s in symbols if s and s.strip()))
+        db.executemany("INSERT INTO watchlist_symbols VALUES (?, ?, ?)",
+                       [(watchlist_id, s, i) for i, s in enumerate(unique)])
+
+
+class WatchlistService:
+    """רשימות מעקב: ציטוטים לכל החברים בקריאת batch אחת, ואינדיקטורים קלים ממטמון הנרות.
+    מטמון הציטוטים משותף לכל הרשימות - מניה שמופיעה בכמה רשימות מתרעננת פעם אחת"""
+
+    def __init__(self, fetcher, candles, store, quote_ttl=timedelta(seconds=15)):
+        self.fetcher = fetcher
+        self.candles = candles
+        self.store = store
+        self.quote_ttl = quote_ttl
+        self._quotes = {}  # symbol -> (datetime, quote)
+        self._refresh_lock = threading.Lock()
+
+    def _stale(self, symbols):
+        return [s for s in symbols if s not in self._quotes or not NYSE.is_fresh(self._quotes[s][0], self.quote_ttl)]
+
+    def quotes(self, symbols):
+        """ציטוטים עדכניים; רק המניות שפג תוקפן נמשכות, בקריאה מרוכזת אחת"""
+        stale = self._stale(symbols)
+        cache_hit('quotes', len(symbols) - len(stale))
+        if stale:
+            with self._refresh_lock:
+                # רשימה אחרת אולי כבר רעננה את המניות המשותפות בזמן שחיכינו
+                stale = self._stale(symbols)
+                if stale:
+                    cache_miss('quotes', len(stale))
+                    now = datetime.now()
+                    for q in self.fetcher.get_batch_quotes(stale):
+                        self._quotes[q.get('symbol', '').upper()] = (now, q)
+        return {s: self._quotes[s] for s in symbols if s in self._quotes}
+
+    def _indicators(self, candles, price):
+        """SMA/RSI מהנרות השמורים (indicators.compute דרך CompactCandles.column), ומגמה/מומנטום
+        מהכללים של TechnicalAnalyzer עצמו - מול המחיר החי"""
+        last = {name: float(candles.column(name)[-1]) for name in ('sma_20', 'sma_50', 'rsi')}
+        price = price or float(candles.close[-1])
+        trend = TechnicalAnalyzer.trend_signals(price, last['sma_20'], last['sma_50'], len(candles))[()]
+        # כמו get_momentum_signal: מתחת ל-MIN_BARS ברים calculate_indicators לא מחשב RSI
+        if len(candles) < TechnicalAnalyzer.MIN_BARS:
+            momentum = "Unknown"
+        else:
+            momentum = TechnicalAnalyzer.momentum_signals(last['rsi'], indicators.parameters(candles.params))[()]
+        return {**last, "trend": trend, "momentum": momentum}
+
+    def snapshot(self, watchlist_id):
+        watchlist = self.store.get(watchlist_id)
+        if watchlist is None:
+            return None
+        symbols = watchlist["symbols"]
+        quotes = self.quotes(symbols)
+        history = self.candles.get_many(symbols)
+
+        members = []
+        for symbol in symbols:
+            updated, quote = quotes.get(symbol, (None, {}))
+            price = quote.get('regularMarketPrice', quote.get('price'))
+            prev_close = quote.get('regularMarketPreviousClose', price)
+            member = {
+                "symbol": symbol,
+                "name": quote.get('longName', quote.get('shortName', symbol)),
+                "price": price,
+                "change": price - prev_close if price and prev_close else None,
+                "change_percent": quote.get('regularMarketChangePercent'),
+                "high_52w": quote.get('fiftyTwoWeekHigh'),
+                "low_52w": quote.get('fiftyTwoWeekLow'),
+                "quote_time": updated.isoformat() if updated else None
+            }
+            if symbol in history:
+                member.update(self._indicators(history[symbol], price))
+            members.append(member)
+
+        return {**watchlist, "members": members}